@@ -0,0 +1,149 @@
+"""
+Local verification of Supabase access tokens.
+
+Supabase access tokens are JWTs signed either with the project's shared JWT
+secret (HS256) or with an asymmetric key published in the project's JWKS
+document. Verifying them in-process avoids a round trip to the auth server on
+every request.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+import jwt
+from pydantic import BaseModel
+
+from .config import (
+    SUPABASE_JWT_SECRET,
+    SUPABASE_JWT_AUDIENCE,
+    SUPABASE_JWKS_URL,
+    JWKS_REFRESH_SECONDS,
+)
+
+ALLOWED_ALGORITHMS = ("HS256", "RS256", "ES256")
+
+
+class LocalVerificationUnavailable(Exception):
+    """Raised when a token cannot be checked locally, e.g. no matching signing key."""
+
+
+class AuthenticatedUser(BaseModel):
+    """Lightweight user built from the claims of a verified access token."""
+    id: str
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    role: Optional[str] = None
+    aud: Optional[str] = None
+    session_id: Optional[str] = None
+    expires_at: Optional[int] = None
+    app_metadata: Dict[str, Any] = {}
+    user_metadata: Dict[str, Any] = {}
+
+    @classmethod
+    def from_claims(cls, claims: Dict[str, Any]) -> "AuthenticatedUser":
+        """Build a user from decoded JWT claims."""
+        return cls(
+            id=claims["sub"],
+            email=claims.get("email"),
+            phone=claims.get("phone"),
+            role=claims.get("role"),
+            aud=claims.get("aud"),
+            session_id=claims.get("session_id"),
+            expires_at=claims.get("exp"),
+            app_metadata=claims.get("app_metadata") or {},
+            user_metadata=claims.get("user_metadata") or {},
+        )
+
+
+class SigningKeyCache:
+    """JWKS signing keys fetched from the auth server and refreshed on a timer."""
+
+    def __init__(self, jwks_url: str, refresh_seconds: int = 600, min_refresh_seconds: int = 30):
+        self.jwks_url = jwks_url
+        self.refresh_seconds = refresh_seconds
+        self.min_refresh_seconds = min_refresh_seconds
+        self._keys: Dict[str, jwt.PyJWK] = {}
+        self._fetched_at: Optional[float] = None
+        self._attempted_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def get_key(self, kid: Optional[str]) -> jwt.PyJWK:
+        """Return the signing key for `kid`, refreshing the key set when it is stale or the kid is unknown."""
+        now = time.monotonic()
+        stale = self._fetched_at is None or now - self._fetched_at >= self.refresh_seconds
+        unknown = kid not in self._keys
+        if stale or unknown:
+            self._refresh(now)
+
+        key = self._keys.get(kid)
+        if key is None:
+            raise LocalVerificationUnavailable(f"No signing key found for kid {kid!r}")
+        return key
+
+    def _refresh(self, now: float) -> None:
+        with self._lock:
+            # Another thread may have refreshed while we waited, and an unknown
+            # kid must not turn every request into a JWKS download.
+            if self._attempted_at is not None and now - self._attempted_at < self.min_refresh_seconds:
+                return
+            self._attempted_at = now
+            try:
+                response = httpx.get(self.jwks_url, timeout=5.0)
+                response.raise_for_status()
+                jwk_set = jwt.PyJWKSet.from_dict(response.json())
+            except (httpx.HTTPError, ValueError, jwt.PyJWKError, jwt.PyJWKSetError):
+                # Keep serving the last known keys if the endpoint is unreachable.
+                return
+            self._keys = {key.key_id: key for key in jwk_set.keys if key.key_id}
+            self._fetched_at = now
+
+
+class LocalTokenVerifier:
+    """Checks signature, `exp`, `aud` and `sub` of Supabase access tokens in-process."""
+
+    def __init__(self, secret: Optional[str], audience: Optional[str], key_cache: Optional[SigningKeyCache] = None):
+        self.secret = secret
+        self.audience = audience
+        self.key_cache = key_cache
+
+    def verify(self, token: str) -> AuthenticatedUser:
+        """
+        Verify `token` and return the user it was issued to.
+
+        Raises:
+            jwt.InvalidTokenError: If the token is malformed, expired or badly signed.
+            LocalVerificationUnavailable: If no key is available to check the signature.
+        """
+        header = jwt.get_unverified_header(token)
+        algorithm = header.get("alg")
+        if algorithm not in ALLOWED_ALGORITHMS:
+            raise jwt.InvalidAlgorithmError(f"Unsupported signing algorithm: {algorithm}")
+
+        if algorithm == "HS256" and self.secret:
+            key = self.secret
+        elif self.key_cache is not None:
+            signing_key = self.key_cache.get_key(header.get("kid"))
+            # The header is chosen by the caller: only accept the algorithm the key is for.
+            if signing_key.algorithm_name != algorithm:
+                raise jwt.InvalidAlgorithmError(f"Signing key {header.get('kid')!r} is not a {algorithm} key")
+            key = signing_key.key
+        else:
+            raise LocalVerificationUnavailable("No signing key configured")
+
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=[algorithm],
+            audience=self.audience,
+            options={"require": ["exp", "sub"]},
+        )
+        return AuthenticatedUser.from_claims(claims)
+
+
+local_verifier = LocalTokenVerifier(
+    secret=SUPABASE_JWT_SECRET,
+    audience=SUPABASE_JWT_AUDIENCE,
+    key_cache=SigningKeyCache(SUPABASE_JWKS_URL, JWKS_REFRESH_SECONDS) if SUPABASE_JWKS_URL else None,
+)
@@ -0,0 +1,217 @@
+"""
+Response compression negotiated through Accept-Encoding.
+
+Supports zstd, brotli and gzip; zstd and brotli are only offered when the
+`zstandard` and `brotli` packages are installed. Bodies smaller than the
+threshold, already encoded bodies and formats that are compressed anyway
+(xlsx, Parquet, Arrow) are sent as they are. Streaming responses are
+compressed chunk by chunk and flushed after each one, so clients still
+receive rows as they are produced.
+"""
+
+import zlib
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli is only offered with the brotli package installed
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstd is only offered with the zstandard package installed
+    zstandard = None
+
+# Levels chosen for speed on small JSON bodies rather than the best ratio.
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+
+# Bodies at least this large are compressed in the threadpool instead of on the event loop.
+THREADPOOL_MIN_SIZE = 256 * 1024
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/problem+json",
+    "application/javascript",
+    "application/xml",
+)
+
+
+class Encoder(ABC):
+    """Incremental compressor of one response body."""
+
+    @abstractmethod
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        """Compress `data`; with `flush`, also emit everything buffered so far."""
+
+    @abstractmethod
+    def finish(self) -> bytes:
+        """Return the end of the compressed stream."""
+
+
+class GzipEncoder(Encoder):
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data, flush=False):
+        output = self._compressor.compress(data)
+        return output + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else output
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliEncoder(Encoder):
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data, flush=False):
+        output = self._compressor.process(data)
+        return output + self._compressor.flush() if flush else output
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class ZstdEncoder(Encoder):
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data, flush=False):
+        output = self._compressor.compress(data)
+        return output + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK) if flush else output
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+ENCODERS: Dict[str, Callable[[], Encoder]] = {"gzip": GzipEncoder}
+if brotli is not None:
+    ENCODERS["br"] = BrotliEncoder
+if zstandard is not None:
+    ENCODERS["zstd"] = ZstdEncoder
+
+
+def choose_encoding(accept_encoding: Optional[str], preference: Iterable[str]) -> Optional[str]:
+    """
+    Pick the content coding for a request.
+
+    Returns the acceptable coding with the highest q-value, ties going to the
+    first in `preference`, or None if the client accepts none of them.
+    """
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            weights[coding.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for coding in preference:
+        quality = weights.get(coding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with the best coding the client accepts."""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, encodings: Iterable[str] = ("zstd", "br", "gzip")):
+        self.app = app
+        self.minimum_size = minimum_size
+        # Codings whose package is missing are dropped silently.
+        self.encodings: List[str] = [encoding for encoding in encodings if encoding in ENCODERS]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"), self.encodings)
+            if encoding is not None:
+                await _Responder(self.app, encoding, self.minimum_size)(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+class _Responder:
+    """Compresses one response, deciding from its headers and first body message."""
+
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send: Send = None
+        self.start_message: Optional[Message] = None
+        self.encoder: Optional[Encoder] = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Held back until the first body message shows whether to compress.
+            self.start_message = message
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            self.passthrough = (
+                "content-encoding" in headers
+                or message["status"] in (204, 304)
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            )
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            if self.passthrough or (not more_body and len(body) < self.minimum_size):
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            self.encoder = ENCODERS[self.encoding]()
+            headers = MutableHeaders(raw=start["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["Content-Length"]
+                message["body"] = await self._compress(body, flush=True)
+            else:
+                message["body"] = await self._compress(body) + self.encoder.finish()
+                headers["Content-Length"] = str(len(message["body"]))
+            await self.send(start)
+            await self.send(message)
+            return
+
+        if self.passthrough:
+            await self.send(message)
+            return
+        compressed = await self._compress(body, flush=more_body)
+        message["body"] = compressed if more_body else compressed + self.encoder.finish()
+        await self.send(message)
+
+    async def _compress(self, data: bytes, flush: bool = False) -> bytes:
+        if len(data) >= THREADPOOL_MIN_SIZE:
+            return await run_in_threadpool(self.encoder.compress, data, flush)
+        return self.encoder.compress(data, flush)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -8,3 +9,100 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 SERVICE_ROLE_KEY = os.getenv("SERVICE_ROLE_KEY")
+
+# Authentication
+# "remote" asks the Supabase auth server about every token; "local" verifies
+# the JWT signature and claims in-process against the cached signing keys.
+AUTH_MODE = os.getenv("AUTH_MODE", "remote").lower()
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+SUPABASE_JWKS_URL = os.getenv(
+    "SUPABASE_JWKS_URL",
+    f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json" if SUPABASE_URL else None,
+)
+JWKS_REFRESH_SECONDS = int(os.getenv("JWKS_REFRESH_SECONDS", "600"))
+# Fall back to the remote auth server when a token cannot be checked locally
+# (no secret configured, unknown key id, JWKS endpoint unreachable).
+AUTH_REMOTE_FALLBACK = os.getenv("AUTH_REMOTE_FALLBACK", "true").lower() == "true"
+# Verified tokens are cached in-process for at most this many seconds (never
+# past the token's own expiry). Set either value to 0 to disable the cache.
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_SIZE = int(os.getenv("AUTH_CACHE_MAX_SIZE", "10000"))
+
+# Async PostgREST connection pool shared by all services
+SUPABASE_HTTP2 = os.getenv("SUPABASE_HTTP2", "true").lower() == "true"
+SUPABASE_HTTP_TIMEOUT = float(os.getenv("SUPABASE_HTTP_TIMEOUT", "10"))
+SUPABASE_POOL_MAX_CONNECTIONS = int(os.getenv("SUPABASE_POOL_MAX_CONNECTIONS", "100"))
+SUPABASE_POOL_MAX_KEEPALIVE = int(os.getenv("SUPABASE_POOL_MAX_KEEPALIVE", "20"))
+SUPABASE_POOL_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_POOL_KEEPALIVE_EXPIRY", "30"))
+
+# Data backend: "supabase" sends queries through PostgREST, "postgres" runs
+# them on a direct asyncpg pool against DATABASE_URL.
+DATA_BACKEND = os.getenv("DATA_BACKEND", "supabase").lower()
+DATABASE_URL = os.getenv("DATABASE_URL")
+PG_POOL_MIN_SIZE = int(os.getenv("PG_POOL_MIN_SIZE", "1"))
+PG_POOL_MAX_SIZE = int(os.getenv("PG_POOL_MAX_SIZE", "10"))
+# Prepared statement cache per connection; use 0 behind PgBouncer in transaction mode.
+PG_STATEMENT_CACHE_SIZE = int(os.getenv("PG_STATEMENT_CACHE_SIZE", "100"))
+
+# Serve blood pressure summaries and the latest reading from the trigger-maintained
+# daily rollup table (see schema.sql). Enable once the table has been backfilled.
+BP_ROLLUPS_ENABLED = os.getenv("BP_ROLLUPS_ENABLED", "false").lower() == "true"
+
+# Blood pressure histories kept in memory as numpy arrays for summaries and
+# chart series, up to this many bytes in total. 0 disables the cache.
+BP_HISTORY_CACHE_MAX_BYTES = int(os.getenv("BP_HISTORY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Medication intake times are wall-clock times in MEDICATION_TIMEZONE. The
+# reminder worker keeps an in-memory index of the upcoming doses of all users'
+# active medications; it reads medication changes every DOSE_SCHEDULE_SYNC_SECONDS,
+# re-reading DOSE_SCHEDULE_SYNC_OVERLAP_SECONDS before the previous read, and
+# reconciles the whole index every DOSE_SCHEDULE_RECONCILE_SECONDS.
+MEDICATION_TIMEZONE = os.getenv("MEDICATION_TIMEZONE", "Asia/Bangkok")
+DOSE_SCHEDULE_SYNC_SECONDS = float(os.getenv("DOSE_SCHEDULE_SYNC_SECONDS", "5"))
+DOSE_SCHEDULE_SYNC_OVERLAP_SECONDS = float(os.getenv("DOSE_SCHEDULE_SYNC_OVERLAP_SECONDS", "120"))
+DOSE_SCHEDULE_RECONCILE_SECONDS = float(os.getenv("DOSE_SCHEDULE_RECONCILE_SECONDS", "3600"))
+
+# Medication reminders are taken off the dose scheduler and delivered through
+# REMINDER_SINK ("log" or "memory") in batches, at most REMINDER_RATE_PER_SECOND
+# per second overall, with up to REMINDER_MAX_ATTEMPTS tries per reminder.
+# The dispatcher runs in a process of its own, started with
+# `python -m bpl_web_backend.modules.reminders.worker` (run exactly one); its
+# metrics are served on REMINDER_METRICS_HOST:REMINDER_METRICS_PORT.
+REMINDER_METRICS_HOST = os.getenv("REMINDER_METRICS_HOST", "127.0.0.1")
+REMINDER_METRICS_PORT = int(os.getenv("REMINDER_METRICS_PORT", "8001"))
+REMINDER_SINK = os.getenv("REMINDER_SINK", "log").lower()
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "500"))
+REMINDER_RATE_PER_SECOND = float(os.getenv("REMINDER_RATE_PER_SECOND", "1000"))
+REMINDER_MAX_ATTEMPTS = int(os.getenv("REMINDER_MAX_ATTEMPTS", "5"))
+REMINDER_RETRY_BASE_SECONDS = float(os.getenv("REMINDER_RETRY_BASE_SECONDS", "2"))
+REMINDER_POLL_SECONDS = float(os.getenv("REMINDER_POLL_SECONDS", "1"))
+REMINDER_MAX_QUEUE = int(os.getenv("REMINDER_MAX_QUEUE", "50000"))
+
+# Generated exports are cached on disk by (user, data revision, format) up to
+# this many bytes in total, least recently used first out. 0 disables the cache.
+# Each worker process keeps its files in its own subdirectory of the directory
+# and is bounded on its own, so the directory holds up to EXPORT_CACHE_MAX_BYTES
+# times the number of workers; subdirectories of exited workers are swept.
+EXPORT_CACHE_DIR = os.getenv("EXPORT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "bpl-export-cache"))
+EXPORT_CACHE_MAX_BYTES = int(os.getenv("EXPORT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Background export jobs: their state and files are kept in EXPORT_JOB_DIR,
+# which every API worker and the export worker must share. The export worker
+# builds at most EXPORT_JOB_WORKERS at once, looks for queued jobs and saves
+# progress every EXPORT_JOB_POLL_SECONDS. Each user may have
+# EXPORT_JOB_MAX_PER_USER queued or running, and finished files are deleted
+# after EXPORT_JOB_TTL_SECONDS.
+EXPORT_JOB_DIR = os.getenv("EXPORT_JOB_DIR", os.path.join(tempfile.gettempdir(), "bpl-export-jobs"))
+EXPORT_JOB_WORKERS = int(os.getenv("EXPORT_JOB_WORKERS", "2"))
+EXPORT_JOB_POLL_SECONDS = float(os.getenv("EXPORT_JOB_POLL_SECONDS", "1"))
+EXPORT_JOB_MAX_PER_USER = int(os.getenv("EXPORT_JOB_MAX_PER_USER", "3"))
+EXPORT_JOB_TTL_SECONDS = int(os.getenv("EXPORT_JOB_TTL_SECONDS", "3600"))
+
+# Delta sync returns at most this many changes per table in one response.
+SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "500"))
+
+# Responses of at least COMPRESSION_MIN_SIZE bytes are compressed with the first
+# of COMPRESSION_ENCODINGS the client accepts (zstd and br need their packages).
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_ENCODINGS = [encoding.strip() for encoding in os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",") if encoding.strip()]
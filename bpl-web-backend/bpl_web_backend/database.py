@@ -1,4 +1,159 @@
+import json
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Union
+
+import asyncpg
+import httpx
+from postgrest import AsyncPostgrestClient
+from postgrest.exceptions import APIError
 from supabase import create_client, Client
-from .config import SUPABASE_URL, SUPABASE_KEY
+from .config import (
+    DATABASE_URL,
+    PG_POOL_MIN_SIZE,
+    PG_POOL_MAX_SIZE,
+    PG_STATEMENT_CACHE_SIZE,
+    SUPABASE_URL,
+    SUPABASE_KEY,
+    SUPABASE_HTTP2,
+    SUPABASE_HTTP_TIMEOUT,
+    SUPABASE_POOL_MAX_CONNECTIONS,
+    SUPABASE_POOL_MAX_KEEPALIVE,
+    SUPABASE_POOL_KEEPALIVE_EXPIRY,
+)
 
+# Synchronous client, used for auth server calls and scripts.
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+
+class PooledPostgrestClient(AsyncPostgrestClient):
+    """PostgREST client whose HTTP session is a tuned keep-alive connection pool."""
+
+    def create_session(
+        self,
+        base_url: str,
+        headers: Dict[str, str],
+        timeout: Union[int, float, httpx.Timeout],
+        verify: bool = True,
+    ) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            verify=verify,
+            follow_redirects=True,
+            http2=SUPABASE_HTTP2,
+            limits=httpx.Limits(
+                max_connections=SUPABASE_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=SUPABASE_POOL_MAX_KEEPALIVE,
+                keepalive_expiry=SUPABASE_POOL_KEEPALIVE_EXPIRY,
+            ),
+        )
+
+
+class AsyncSupabase:
+    """
+    Async PostgREST access shared by all services.
+
+    The underlying client and its connection pool are opened once in the app
+    lifespan and reused by every request.
+    """
+
+    def __init__(self):
+        self._client: Optional[PooledPostgrestClient] = None
+
+    async def open(self) -> None:
+        if self._client is None:
+            self._client = PooledPostgrestClient(
+                f"{SUPABASE_URL}/rest/v1",
+                headers={"apiKey": SUPABASE_KEY, "Authorization": f"Bearer {SUPABASE_KEY}"},
+                timeout=SUPABASE_HTTP_TIMEOUT,
+            )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> PooledPostgrestClient:
+        if self._client is None:
+            raise RuntimeError("Async Supabase client is not open; it is created in the app lifespan")
+        return self._client
+
+    def table(self, table_name: str):
+        """Start a query on `table_name`."""
+        return self.client.from_(table_name)
+
+    def rpc(self, fn: str, params: Optional[dict] = None):
+        """Call a stored procedure."""
+        return self.client.rpc(fn, params or {})
+
+
+async_supabase = AsyncSupabase()
+
+
+class PostgresPool:
+    """
+    Direct asyncpg connection pool used by the `postgres` data backend.
+
+    asyncpg prepares every statement it runs and keeps it in a per-connection
+    cache, so repeated queries skip parsing and planning. Set
+    PG_STATEMENT_CACHE_SIZE to 0 when connecting through a transaction-mode
+    pooler such as PgBouncer.
+    """
+
+    # Runs the transaction as the `authenticated` role with the caller's JWT
+    # claims, so auth.uid() and the row level security policies apply.
+    SET_USER_CONTEXT = (
+        "SELECT set_config('role', 'authenticated', true), "
+        "set_config('request.jwt.claims', $1, true)"
+    )
+
+    def __init__(self):
+        self._pool: Optional[asyncpg.Pool] = None
+
+    async def open(self) -> None:
+        if self._pool is None:
+            self._pool = await asyncpg.create_pool(
+                DATABASE_URL,
+                min_size=PG_POOL_MIN_SIZE,
+                max_size=PG_POOL_MAX_SIZE,
+                statement_cache_size=PG_STATEMENT_CACHE_SIZE,
+            )
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    @property
+    def pool(self) -> asyncpg.Pool:
+        if self._pool is None:
+            raise RuntimeError("Postgres pool is not open; it is created in the app lifespan")
+        return self._pool
+
+    @asynccontextmanager
+    async def transaction(self, user_id: Optional[str]) -> AsyncIterator[asyncpg.Connection]:
+        """
+        Run a transaction on a pooled connection with the RLS user context set.
+
+        Database errors are raised as postgrest APIErrors so services handle
+        both backends the same way.
+        """
+        async with self.pool.acquire() as connection:
+            try:
+                async with connection.transaction():
+                    if user_id is not None:
+                        claims = json.dumps({"sub": str(user_id), "role": "authenticated"})
+                        await connection.execute(self.SET_USER_CONTEXT, claims)
+                    yield connection
+            except asyncpg.PostgresError as e:
+                raise APIError({
+                    "message": getattr(e, "message", None) or str(e),
+                    "code": e.sqlstate,
+                    "details": getattr(e, "detail", None),
+                    "hint": getattr(e, "hint", None),
+                }) from e
+
+
+pg_pool = PostgresPool()
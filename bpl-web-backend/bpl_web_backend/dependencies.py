@@ -1,21 +1,54 @@
+import jwt
 from fastapi import Request, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from .auth import local_verifier, LocalVerificationUnavailable
+from .config import AUTH_MODE, AUTH_REMOTE_FALLBACK
 from .database import supabase
+from .token_cache import token_cache
 
 # Define a security scheme
 security = HTTPBearer()
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """
     Dependency function to get the current user from a JWT token.
 
-    This function validates the token provided in the Authorization header
-    and returns the corresponding user object from Supabase.
+    In "local" auth mode the token is verified in-process and a lightweight
+    user object is built from its claims. Tokens that cannot be checked
+    locally are sent to Supabase when the remote fallback is enabled; in
+    "remote" mode every token is sent to Supabase. Verified tokens are kept in
+    the token cache so repeat requests of a session skip both checks; only a
+    cache miss is handed to the threadpool, since the auth server client and
+    JWKS refresh are blocking.
 
     Raises:
         HTTPException: If the token is invalid or the user is not found.
     """
     token = credentials.credentials
+    user = token_cache.get(token)
+    if user is None:
+        user = await run_in_threadpool(verify_token, token)
+        token_cache.put(token, user, get_token_expiry(token))
+    return user
+
+
+def verify_token(token: str):
+    """Verify `token` according to the configured auth mode and return its user."""
+    if AUTH_MODE == "local":
+        try:
+            return local_verifier.verify(token)
+        except (jwt.PyJWTError, TypeError, ValueError):
+            # PyJWT raises TypeError or ValueError for keys that do not fit the token.
+            raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+        except LocalVerificationUnavailable:
+            if not AUTH_REMOTE_FALLBACK:
+                raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+    return get_remote_user(token)
+
+
+def get_remote_user(token: str):
+    """Look up the user for `token` on the Supabase auth server."""
     try:
         user_response = supabase.auth.get_user(token)
         if user_response.user is None:
@@ -23,3 +56,16 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
         return user_response.user
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+
+
+def get_token_expiry(token: str):
+    """
+    Read the `exp` claim of a token that has already been verified.
+
+    The signature is not checked again here; the value only bounds how long the
+    token may stay in the cache.
+    """
+    try:
+        return jwt.decode(token, options={"verify_signature": False}).get("exp")
+    except jwt.InvalidTokenError:
+        return None
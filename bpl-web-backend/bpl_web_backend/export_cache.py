@@ -0,0 +1,176 @@
+"""
+On-disk cache of generated export files.
+
+Files are keyed by (user id, data revision, format): a user's data cannot
+change without its revision changing, so a cached file stays valid until it
+is evicted. The cache is bounded by total size and evicts least recently
+used files first.
+
+The index lives in memory, so every process keeps its files in its own
+subdirectory, `<EXPORT_CACHE_DIR>/<pid>`, and only ever removes files there,
+apart from the subdirectories of processes that are gone, which it sweeps on
+first use. `max_bytes` bounds each process, so the directory as a whole holds
+up to `max_bytes` times the number of worker processes.
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import AsyncIterator, NamedTuple, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from .config import EXPORT_CACHE_DIR, EXPORT_CACHE_MAX_BYTES
+
+CacheKey = Tuple[str, int, str]
+
+
+def _process_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Alive, but owned by another user.
+        pass
+    return True
+
+
+class _Entry(NamedTuple):
+    path: str
+    size: int
+
+
+class ExportCache:
+    """Size-bounded LRU cache of export files in one directory."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._process_directory: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _prepare(self) -> str:
+        # Workers fork after import, so the pid is only read on first use. Files
+        # in the directory were left by an earlier process with the same pid and
+        # are unknown to this index: remove them. Other processes' files are left alone.
+        pid = str(os.getpid())
+        if self._process_directory is None or os.path.basename(self._process_directory) != pid:
+            directory = os.path.join(self.directory, pid)
+            shutil.rmtree(directory, ignore_errors=True)
+            os.makedirs(directory)
+            self._sweep(pid)
+            self._process_directory = directory
+        return self._process_directory
+
+    def _sweep(self, pid: str) -> None:
+        # Directories of exited or restarted workers are never used again.
+        for name in os.listdir(self.directory):
+            if name.isdigit() and name != pid and not _process_exists(int(name)):
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def _path(self, directory: str, key: CacheKey) -> str:
+        digest = hashlib.sha256(repr(key).encode()).hexdigest()
+        return os.path.join(directory, f"{digest}.export")
+
+    def get(self, key: CacheKey) -> Optional[str]:
+        """Return the path of the cached file for `key`, or None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not os.path.exists(entry.path):
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.path
+
+    async def store(self, key: CacheKey, stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """
+        Pass `stream` through while writing it to the cache.
+
+        The file only enters the cache once the stream has been sent completely;
+        an interrupted download leaves nothing behind.
+        """
+        if not self.enabled:
+            async for block in stream:
+                yield block
+            return
+
+        with self._lock:
+            directory = self._prepare()
+        path = self._path(directory, key)
+        partial = f"{path}.{id(stream)}.part"
+        complete = False
+        output = open(partial, "wb")
+        try:
+            async for block in stream:
+                await run_in_threadpool(output.write, block)
+                yield block
+            complete = True
+        finally:
+            output.close()
+            if complete:
+                os.replace(partial, path)
+                self._add(key, path, os.path.getsize(path))
+            else:
+                os.unlink(partial)
+
+    def _add(self, key: CacheKey, path: str, size: int) -> None:
+        user_id, revision, export_format = key
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key).size
+            # Files of older revisions can never be served again.
+            for stale in [k for k in self._entries if k[0] == user_id and k[2] == export_format and k[1] < revision]:
+                self._remove(stale, delete=True)
+            self._entries[key] = _Entry(path, size)
+            self._size += size
+            while self._size > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest, delete=True)
+                self.evictions += 1
+
+    def _remove(self, key: CacheKey, delete: bool = False) -> None:
+        entry = self._entries.pop(key)
+        self._size -= entry.size
+        if delete:
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def clear(self) -> None:
+        """Drop every cached file."""
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key, delete=True)
+
+    def stats(self) -> dict:
+        """Return counters for monitoring."""
+        with self._lock:
+            return {
+                "files": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+export_cache = ExportCache(directory=EXPORT_CACHE_DIR, max_bytes=EXPORT_CACHE_MAX_BYTES)
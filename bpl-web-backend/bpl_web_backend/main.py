@@ -1,15 +1,41 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from .compression import CompressionMiddleware
+from .config import COMPRESSION_ENCODINGS, COMPRESSION_MIN_SIZE, DATA_BACKEND
+from .database import async_supabase, pg_pool
+from .modules.auth import router as auth_router
 from .modules.profile import router as profile_router
 from .modules.medications import router as medications_router
 from .modules.blood_pressure_log import router as blood_pressure_log_router
+from .modules.exports import router as exports_router
+from .modules.sync import router as sync_router
+from .modules.adherence import router as adherence_router
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the connection pool of the configured data backend once for the whole process
+    database = pg_pool if DATA_BACKEND == "postgres" else async_supabase
+    await database.open()
+    yield
+    await database.close()
+
 
 app = FastAPI(
     title="BPL Web Backend API",
     description="Blood Pressure Log Web Application Backend",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # orjson serializes the validated response data several times faster than the stdlib encoder
+    default_response_class=ORJSONResponse,
 )
 
+# Compress JSON and CSV bodies with the best coding the client accepts
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE, encodings=COMPRESSION_ENCODINGS)
+
 # Configure CORS middleware with improved settings
 app.add_middleware(
     CORSMiddleware,
@@ -29,8 +55,10 @@ app.add_middleware(
         "Keep-Alive",
         "X-Requested-With",
         "If-Modified-Since",
+        "If-None-Match",
     ],
-    expose_headers=["*"],
+    # "*" is not honoured for credentialed requests, so list custom headers explicitly
+    expose_headers=["*", "X-Next-Cursor", "X-Total-Count", "ETag", "Last-Modified"],
     max_age=86400,  # Cache preflight requests for 24 hours
 )
 
@@ -41,9 +69,13 @@ async def options_handler(request: Request, path: str):
     return response
 
 # Include module routers
+app.include_router(auth_router)
 app.include_router(profile_router)
 app.include_router(medications_router)
 app.include_router(blood_pressure_log_router)
+app.include_router(exports_router)
+app.include_router(sync_router)
+app.include_router(adherence_router)
 
 @app.get("/")
 def read_root():
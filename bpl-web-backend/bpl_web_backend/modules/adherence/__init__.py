@@ -0,0 +1,8 @@
+"""
+Adherence module for taken/missed dose marks stored as day bitmaps.
+"""
+
+from .routes import router
+from .models import AdherenceWindow, DoseMark, MedicationAdherence
+
+__all__ = ["router", "AdherenceWindow", "DoseMark", "MedicationAdherence"]
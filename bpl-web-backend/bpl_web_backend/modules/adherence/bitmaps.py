@@ -0,0 +1,70 @@
+"""
+Adherence module day bitmaps.
+
+Each (medication, intake slot, year) row holds a `taken` and a `missed`
+bitmap of `BITMAP_BYTES` bytes, bit d standing for day d of the year in the
+numbering of PostgreSQL's set_bit(): byte d // 8, bit d % 8 from the lowest.
+Read as a little-endian integer, bit d of the bytes is bit d of the integer,
+so counting the marked days of a window is a shift, a mask and a popcount.
+"""
+
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Sequence, Tuple, Union
+
+# 366 days, rounded up to whole bytes.
+BITMAP_BYTES = 46
+
+
+def day_index(day: date) -> int:
+    """Bit of `day` in its year's bitmap."""
+    return day.timetuple().tm_yday - 1
+
+
+def to_bytes(value: Union[bytes, str, memoryview]) -> bytes:
+    """A bitmap as bytes; PostgREST sends bytea as a `\\x` hex string."""
+    if isinstance(value, str):
+        return bytes.fromhex(value[2:] if value.startswith("\\x") else value)
+    return bytes(value)
+
+
+def count_days(bitmap: int, first: int, last: int) -> int:
+    """Number of set bits from `first` to `last`, both included."""
+    return ((bitmap >> first) & ((1 << (last - first + 1)) - 1)).bit_count()
+
+
+def year_ranges(start: date, end: date) -> Iterable[Tuple[int, int, int]]:
+    """Split the days from `start` to `end`, both included, into (year, first bit, last bit)."""
+    while start <= end:
+        year_end = min(end, date(start.year, 12, 31))
+        yield start.year, day_index(start), day_index(year_end)
+        start = year_end + timedelta(days=1)
+
+
+def summarize_adherence(rows: Iterable[Dict[str, Any]], today: date, windows: Sequence[int]) -> List[Dict[str, Any]]:
+    """
+    Taken and missed doses per medication over the last `windows` days, today included.
+
+    `rows` are bitmap rows (`medication_id`, `year`, `taken`, `missed`), one
+    per intake slot and year; every slot counts as its own dose.
+    """
+    ranges = {days: list(year_ranges(today - timedelta(days=days - 1), today)) for days in windows}
+    totals: Dict[int, Dict[int, List[int]]] = {}
+    for row in rows:
+        taken = int.from_bytes(to_bytes(row["taken"]), "little")
+        missed = int.from_bytes(to_bytes(row["missed"]), "little")
+        counts = totals.setdefault(row["medication_id"], {days: [0, 0] for days in windows})
+        for days, spans in ranges.items():
+            for year, first, last in spans:
+                if year == row["year"]:
+                    counts[days][0] += count_days(taken, first, last)
+                    counts[days][1] += count_days(missed, first, last)
+    return [
+        {
+            "medication_id": medication_id,
+            "windows": [
+                {"days": days, "taken": taken, "missed": missed, "adherence": round(taken / (taken + missed), 4) if taken + missed else None}
+                for days, (taken, missed) in counts.items()
+            ],
+        }
+        for medication_id, counts in sorted(totals.items())
+    ]
@@ -0,0 +1,28 @@
+"""
+Adherence module models for dose marks and adherence statistics.
+"""
+
+from pydantic import BaseModel
+from typing import List, Literal, Optional
+from datetime import date
+
+
+class DoseMark(BaseModel):
+    """A scheduled dose marked as taken or missed; `slot` is an intake time such as "08:00" or "Morning"."""
+    date: date
+    slot: str
+    status: Literal["taken", "missed"]
+
+
+class AdherenceWindow(BaseModel):
+    """Marked doses of the last `days` days, today included, and the share taken."""
+    days: int
+    taken: int
+    missed: int
+    adherence: Optional[float] = None
+
+
+class MedicationAdherence(BaseModel):
+    """Adherence of one medication over each window."""
+    medication_id: int
+    windows: List[AdherenceWindow]
@@ -0,0 +1,80 @@
+"""
+Adherence module repository for data access.
+"""
+
+from abc import ABC, abstractmethod
+from datetime import date, time
+from typing import Any, Dict, List, Optional, Sequence
+
+from ...config import DATA_BACKEND
+from ...database import async_supabase, pg_pool
+from ...repository import record_to_dict
+
+TABLE = "medication_adherence"
+
+# Marks one dose in the bitmaps; see schema.sql.
+MARK_FUNCTION = "mark_medication_dose"
+
+BITMAP_COLUMNS = ("medication_id", "year", "taken", "missed")
+
+
+class AdherenceRepository(ABC):
+    """Data access for dose adherence bitmaps."""
+
+    @abstractmethod
+    async def mark_dose(self, user_id: str, medication_id: int, slot: time, day: date, taken: bool) -> bool:
+        """Mark a dose as taken or missed; return False if the user has no such medication."""
+
+    @abstractmethod
+    async def list_bitmaps(self, user_id: str, years: Sequence[int], medication_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return the `BITMAP_COLUMNS` of the user's rows of `years`, optionally of one medication."""
+
+
+class SupabaseAdherenceRepository(AdherenceRepository):
+    """Adherence bitmaps through PostgREST."""
+
+    async def mark_dose(self, user_id, medication_id, slot, day, taken):
+        response = await async_supabase.rpc(MARK_FUNCTION, {
+            "p_user_id": str(user_id),
+            "p_medication_id": medication_id,
+            "p_slot": slot.isoformat(),
+            "p_day": day.isoformat(),
+            "p_taken": taken,
+        }).execute()
+        return bool(response.data)
+
+    async def list_bitmaps(self, user_id, years, medication_id=None):
+        query = async_supabase.table(TABLE).select(",".join(BITMAP_COLUMNS)).eq("user_id", user_id).in_("year", list(years))
+        if medication_id is not None:
+            query = query.eq("medication_id", medication_id)
+        response = await query.execute()
+        return response.data
+
+
+class PostgresAdherenceRepository(AdherenceRepository):
+    """Adherence bitmaps on the direct Postgres pool."""
+
+    async def mark_dose(self, user_id, medication_id, slot, day, taken):
+        async with pg_pool.transaction(user_id) as conn:
+            row = await conn.fetchrow(f"SELECT 1 FROM {MARK_FUNCTION}($1, $2, $3, $4, $5)", user_id, medication_id, slot, day, taken)
+        return row is not None
+
+    async def list_bitmaps(self, user_id, years, medication_id=None):
+        sql = f"SELECT {', '.join(BITMAP_COLUMNS)} FROM {TABLE} WHERE user_id = $1 AND year = ANY($2::smallint[])"
+        params: List[Any] = [user_id, list(years)]
+        if medication_id is not None:
+            sql += " AND medication_id = $3"
+            params.append(medication_id)
+        async with pg_pool.transaction(user_id) as conn:
+            rows = await conn.fetch(sql, *params)
+        return [record_to_dict(row) for row in rows]
+
+
+def create_repository() -> AdherenceRepository:
+    """Return the repository for the configured data backend."""
+    if DATA_BACKEND == "postgres":
+        return PostgresAdherenceRepository()
+    return SupabaseAdherenceRepository()
+
+
+repository = create_repository()
@@ -0,0 +1,31 @@
+"""
+Adherence module routes for API endpoints.
+"""
+
+from fastapi import APIRouter, Depends, status
+from gotrue.types import User
+from typing import List
+
+from ...dependencies import get_current_user
+from .models import DoseMark, MedicationAdherence
+from .services import AdherenceService
+
+router = APIRouter(prefix="/api", tags=["Adherence"])
+
+
+@router.post("/medications/{medication_id}/doses", status_code=status.HTTP_204_NO_CONTENT)
+async def mark_dose(medication_id: int, mark: DoseMark, current_user: User = Depends(get_current_user)):
+    """Mark the dose of a medication at an intake time on a day as taken or missed."""
+    await AdherenceService.mark_dose(medication_id, mark, current_user)
+
+
+@router.get("/adherence", response_model=List[MedicationAdherence])
+async def get_adherence(current_user: User = Depends(get_current_user)):
+    """Get, per medication, the doses taken and missed over the last 7, 30 and 90 days."""
+    return await AdherenceService.get_adherence(current_user)
+
+
+@router.get("/medications/{medication_id}/adherence", response_model=MedicationAdherence)
+async def get_medication_adherence(medication_id: int, current_user: User = Depends(get_current_user)):
+    """Get the doses of one medication taken and missed over the last 7, 30 and 90 days."""
+    return await AdherenceService.get_medication_adherence(medication_id, current_user)
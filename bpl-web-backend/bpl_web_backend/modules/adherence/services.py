@@ -0,0 +1,87 @@
+"""
+Adherence module services for business logic.
+"""
+
+from fastapi import HTTPException, status
+from gotrue.types import User
+from postgrest.exceptions import APIError
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+from zoneinfo import ZoneInfo
+
+from ...config import MEDICATION_TIMEZONE
+from ..medications.repository import repository as medication_repository
+from ..medications.scheduler import parse_intake_time
+from .bitmaps import summarize_adherence
+from .models import AdherenceWindow, DoseMark, MedicationAdherence
+from .repository import repository
+
+# Adherence is reported over the last 7, 30 and 90 days.
+ADHERENCE_WINDOWS = (7, 30, 90)
+
+
+def _today() -> date:
+    """Today in the timezone intake times are read in."""
+    return datetime.now(ZoneInfo(MEDICATION_TIMEZONE)).date()
+
+
+class AdherenceService:
+    """Service class for dose adherence operations."""
+
+    @staticmethod
+    async def mark_dose(medication_id: int, mark: DoseMark, current_user: User) -> None:
+        """Mark a dose of the current user's medication as taken or missed, replacing an earlier mark."""
+        slot = parse_intake_time(mark.slot)
+        if slot is None:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Unrecognised intake time: {mark.slot}")
+        if mark.date > _today():
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Doses cannot be marked before their day")
+
+        try:
+            marked = await repository.mark_dose(current_user.id, medication_id, slot, mark.date, mark.status == "taken")
+            if not marked:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Medication not found")
+        except APIError as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e.message}")
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {str(e)}")
+
+    @staticmethod
+    async def get_adherence(current_user: User, medication_id: Optional[int] = None) -> List[MedicationAdherence]:
+        """
+        Get the share of marked doses taken over each of `ADHERENCE_WINDOWS`, per medication.
+
+        Only the bitmap rows of the years the longest window touches are read,
+        so the cost does not grow with the length of the history.
+        """
+        try:
+            today = _today()
+            first_day = today - timedelta(days=max(ADHERENCE_WINDOWS) - 1)
+            rows = await repository.list_bitmaps(current_user.id, range(first_day.year, today.year + 1), medication_id)
+            return [MedicationAdherence(**item) for item in summarize_adherence(rows, today, ADHERENCE_WINDOWS)]
+        except APIError as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e.message}")
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {str(e)}")
+
+    @staticmethod
+    async def get_medication_adherence(medication_id: int, current_user: User) -> MedicationAdherence:
+        """Get the adherence of one of the current user's medications; a medication without marks has empty windows."""
+        adherence = await AdherenceService.get_adherence(current_user, medication_id)
+        if adherence:
+            return adherence[0]
+        # Without marks, tell a medication that was never marked from one that is not the user's.
+        try:
+            medication = await medication_repository.get_medication(current_user.id, medication_id)
+        except APIError as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e.message}")
+        if medication is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Medication not found")
+        return MedicationAdherence(
+            medication_id=medication_id,
+            windows=[AdherenceWindow(days=days, taken=0, missed=0) for days in ADHERENCE_WINDOWS],
+        )
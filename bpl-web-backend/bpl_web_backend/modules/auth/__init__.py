@@ -0,0 +1,7 @@
+"""
+Auth module for session management on the API side.
+"""
+
+from .routes import router
+
+__all__ = ["router"]
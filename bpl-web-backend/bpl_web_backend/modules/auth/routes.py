@@ -0,0 +1,23 @@
+"""
+Auth module routes for API endpoints.
+"""
+
+from fastapi import APIRouter, Depends, status
+from fastapi.security import HTTPAuthorizationCredentials
+from gotrue.types import User
+from typing import Literal
+
+from ...dependencies import get_current_user, security
+from .services import AuthService
+
+router = APIRouter(prefix="/api", tags=["Auth"])
+
+
+@router.post("/auth/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    scope: Literal["local", "global"] = "local",
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: User = Depends(get_current_user),
+):
+    """Invalidate the cached session of the current token, or of all the user's tokens."""
+    AuthService.logout(credentials.credentials, current_user, scope)
@@ -0,0 +1,24 @@
+"""
+Auth module services for business logic.
+"""
+
+from gotrue.types import User
+
+from ...token_cache import token_cache
+
+
+class AuthService:
+    """Service class for session operations."""
+
+    @staticmethod
+    def logout(token: str, current_user: User, scope: str = "local") -> None:
+        """
+        Forget cached verification results on logout.
+
+        `local` drops only the presented token; `global` drops every cached token
+        of the user and should also be used after a password change.
+        """
+        if scope == "global":
+            token_cache.invalidate_user(current_user.id)
+        else:
+            token_cache.invalidate_token(token)
@@ -0,0 +1,138 @@
+"""
+Blood Pressure Log module reading classification and rolling statistics.
+
+Every reading is labelled with its ACC/AHA 2017 category and, for each
+measurement, the mean, standard deviation (SD) and average real variability
+(ARV, the mean absolute difference between successive readings) of the
+readings taken in the `ROLLING_WINDOW` ending at it. A reading is flagged as a
+jump when systolic or diastolic moved by at least `JUMP_THRESHOLDS` since the
+previous reading.
+
+All columns are computed over whole histories with NumPy: window bounds come
+from one `searchsorted` over the timestamps and window sums from prefix sums,
+so no Python code runs per reading. A reading's results only depend on the
+readings before it, which lets `analyze` recompute just the tail of a history
+after a new reading arrives.
+"""
+
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .summary import METRICS
+
+CATEGORIES = ("normal", "elevated", "stage_1", "stage_2", "crisis")
+
+ROLLING_WINDOW = timedelta(days=7)
+
+# Change from the previous reading, in mmHg, that counts as a sudden jump.
+JUMP_THRESHOLDS = {"systolic": 20, "diastolic": 10}
+
+STATISTICS = ("mean", "sd", "arv")
+
+
+def classify(systolic: np.ndarray, diastolic: np.ndarray) -> np.ndarray:
+    """Return the index into `CATEGORIES` of each reading; the higher of the two pressures decides."""
+    conditions = [
+        (systolic > 180) | (diastolic > 120),
+        (systolic >= 140) | (diastolic >= 90),
+        (systolic >= 130) | (diastolic >= 80),
+        systolic >= 120,
+    ]
+    return np.select(conditions, [4, 3, 2, 1], default=0).astype(np.int8)
+
+
+def _prefix_sums(values: np.ndarray) -> np.ndarray:
+    return np.concatenate(([0], np.cumsum(values)))
+
+
+def rolling_statistics(times: np.ndarray, values: np.ndarray, window: int) -> Dict[str, np.ndarray]:
+    """
+    Mean, SD and ARV of the readings in `(times[i] - window, times[i]]` for every reading `i`.
+
+    `times` must be ascending and in the same unit as `window`. SD is NaN for a
+    single reading and ARV is NaN without a pair of successive readings.
+    """
+    positions = np.arange(len(times))
+    starts = np.searchsorted(times, times - window, side="right")
+    counts = positions - starts + 1
+
+    # Integer sums stay exact; only the final divisions are floating point.
+    values = values.astype(np.int64)
+    sums = _prefix_sums(values)
+    squares = _prefix_sums(values * values)
+    window_sums = sums[positions + 1] - sums[starts]
+    window_squares = squares[positions + 1] - squares[starts]
+
+    # changes[j] is the change from reading j - 1 to j; a window holds the pairs (starts, i].
+    changes = _prefix_sums(np.abs(np.diff(values, prepend=values[:1])))
+    pairs = positions - starts
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "mean": (window_sums / counts).astype(np.float32),
+            "sd": np.sqrt((counts * window_squares - window_sums * window_sums) / (counts * (counts - 1))).astype(np.float32),
+            "arv": ((changes[positions + 1] - changes[starts + 1]) / pairs).astype(np.float32),
+        }
+
+
+def analyze(times: np.ndarray, metrics: Dict[str, np.ndarray], previous: Optional[Dict[str, np.ndarray]] = None, start: int = 0) -> Dict[str, np.ndarray]:
+    """
+    Return the analytics columns of a history given as µs `times` and metric arrays sorted by time.
+
+    With `previous`, the columns of the same history before a change at
+    position `start`, results before `start` are kept and only the readings
+    from `start` on are recomputed, using the window of readings before them.
+    """
+    if previous is None or start <= 0:
+        start = 0
+    window = ROLLING_WINDOW // timedelta(microseconds=1)
+    # Readings from `context` on cover the windows and previous readings of the recomputed ones.
+    context = int(np.searchsorted(times, times[start] - window, side="right")) if start < len(times) else start
+    context = max(min(context, start - 1), 0)
+    skip = start - context
+
+    times = times[context:]
+    values = {metric: metrics[metric][context:] for metric in METRICS}
+    columns = {"category": classify(values["systolic"], values["diastolic"])[skip:]}
+
+    jump = np.zeros(len(times), dtype=bool)
+    for metric, threshold in JUMP_THRESHOLDS.items():
+        jump[1:] |= np.abs(np.diff(values[metric].astype(np.int64))) >= threshold
+    columns["jump"] = jump[skip:]
+
+    for metric in METRICS:
+        for statistic, column in rolling_statistics(times, values[metric], window).items():
+            columns[f"{metric}_{statistic}"] = column[skip:]
+
+    if start:
+        columns = {name: np.concatenate((previous[name][:start], column)) for name, column in columns.items()}
+    return columns
+
+
+def _optional_floats(column: np.ndarray) -> List[Optional[float]]:
+    """Values rounded to two decimals, NaN as None."""
+    values = np.round(column.astype(np.float64), 2).astype(object)
+    values[np.isnan(column)] = None
+    return values.tolist()
+
+
+def report(ids: np.ndarray, times: np.ndarray, columns: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """Shape analytics columns of the readings `ids` at µs `times` as `BloodPressureAnalytics` fields."""
+    labels = np.array(CATEGORIES, dtype=object)
+    counts = np.bincount(columns["category"], minlength=len(CATEGORIES))
+    return {
+        "total": len(ids),
+        "window_days": ROLLING_WINDOW.days,
+        "categories": dict(zip(CATEGORIES, counts.tolist())),
+        "id": ids.tolist(),
+        "record_datetime": pd.to_datetime(times, unit="us", utc=True).to_pydatetime().tolist(),
+        "category": labels[columns["category"]].tolist(),
+        "jump": columns["jump"].tolist(),
+        **{
+            metric: {statistic: _optional_floats(columns[f"{metric}_{statistic}"]) for statistic in STATISTICS}
+            for metric in METRICS
+        },
+    }
@@ -0,0 +1,87 @@
+"""
+Blood Pressure Log module chart series downsampling.
+
+Long histories are reduced with Largest-Triangle-Three-Buckets (LTTB): the
+readings between the first and the last are split into equal buckets and each
+bucket keeps the reading that forms the largest triangle with the reading kept
+from the previous bucket and the mean of the next one. Peaks and dips survive,
+which plain averaging would flatten. Each metric is reduced on its own, so the
+kept timestamps differ between metrics.
+"""
+
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from .summary import METRICS
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Return the indices of the `threshold` points LTTB keeps of the series (`x`, `y`).
+
+    `x` must be ascending. Every point is kept when there are no more than
+    `threshold` of them.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Bucket b spans [edges[b], edges[b + 1]) of the points between the first and the last.
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    # Mean of each following bucket from prefix sums; the last bucket looks at the last point.
+    x_sums = np.concatenate(([0.0], np.cumsum(x)))
+    y_sums = np.concatenate(([0.0], np.cumsum(y)))
+    next_starts = np.append(edges[1:-1], n - 1)
+    next_ends = np.append(edges[2:], n)
+    counts = next_ends - next_starts
+    next_x = (x_sums[next_ends] - x_sums[next_starts]) / counts
+    next_y = (y_sums[next_ends] - y_sums[next_starts]) / counts
+
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        ax, ay = x[previous], y[previous]
+        # Twice the triangle area; the factor does not change the argmax.
+        areas = np.abs((ax - next_x[bucket]) * (y[start:end] - ay) - (ax - x[start:end]) * (next_y[bucket] - ay))
+        previous = start + int(np.argmax(areas))
+        kept[bucket + 1] = previous
+    return kept
+
+
+def downsample_records(records: List[Dict[str, Any]], points: int) -> Dict[str, Dict[str, list]]:
+    """
+    Reduce each metric of `records` to at most `points` readings with LTTB.
+
+    `records` need `record_datetime` and the metric columns, in any order.
+    Returns, per metric, the kept `record_datetime`s (UTC, oldest first) and
+    their `value`s.
+    """
+    df = pd.DataFrame.from_records(records, columns=["record_datetime", *METRICS])
+    df["record_datetime"] = pd.to_datetime(df["record_datetime"], utc=True, format="ISO8601")
+    return downsample_frame(df.sort_values("record_datetime", kind="stable", ignore_index=True), points)
+
+
+def downsample_frame(df: pd.DataFrame, points: int) -> Dict[str, Dict[str, list]]:
+    """Like `downsample_records`, for a DataFrame sorted by its UTC `record_datetime` column."""
+    if df.empty:
+        return {metric: {"record_datetime": [], "value": []} for metric in METRICS}
+    times = df["record_datetime"]
+    nanoseconds = times.to_numpy(dtype="datetime64[ns]").view(np.int64)
+    # Seconds from the first reading keep the triangle areas well within float precision.
+    x = (nanoseconds - nanoseconds[0]) / 1e9
+
+    series = {}
+    for metric in METRICS:
+        values = df[metric].to_numpy()
+        kept = lttb_indices(x, values.astype(np.float64), points)
+        series[metric] = {
+            "record_datetime": list(times.iloc[kept].dt.to_pydatetime()),
+            "value": values[kept].tolist(),
+        }
+    return series
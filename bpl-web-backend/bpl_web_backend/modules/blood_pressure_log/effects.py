@@ -0,0 +1,108 @@
+"""
+Blood Pressure Log module medication effect analytics.
+
+Each medication change (see `medication_changes`) is lined up with the
+readings in the `window` before it, `[at - window, at)`, and after it,
+`[at, at + window)`. For each measurement and window the mean, SD and ARV
+are reported together with the change of the mean from before to after.
+
+Changes and readings are both sorted by time, so all window bounds come from
+one `searchsorted` of the change times into the reading times, and window
+sums from prefix sums over the readings; no Python code runs per change or
+per reading. Windows of changes close together overlap and share readings.
+"""
+
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+
+from .analytics import STATISTICS, _optional_floats, _prefix_sums
+from .summary import METRICS
+
+DEFAULT_WINDOW_DAYS = 14
+MAX_WINDOW_DAYS = 90
+
+WINDOWS = ("before", "after")
+
+
+def window_statistics(values: np.ndarray, lows: np.ndarray, highs: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Mean, SD and ARV of `values[lows[i]:highs[i]]` for every window `i`.
+
+    Mean is NaN for an empty window, SD for fewer than two readings and ARV
+    without a pair of successive readings.
+    """
+    values = values.astype(np.int64)
+    sums = _prefix_sums(values)
+    squares = _prefix_sums(values * values)
+    # changes[j] is the change from reading j - 1 to j; a window holds the pairs (lows, highs).
+    changes = _prefix_sums(np.abs(np.diff(values, prepend=values[:1])))
+
+    counts = highs - lows
+    window_sums = sums[highs] - sums[lows]
+    window_squares = squares[highs] - squares[lows]
+    pairs = np.maximum(counts - 1, 0)
+    variation = changes[highs] - changes[np.minimum(lows + 1, highs)]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "mean": window_sums / counts,
+            "sd": np.sqrt((counts * window_squares - window_sums * window_sums) / (counts * (counts - 1))),
+            "arv": variation / pairs,
+        }
+
+
+def medication_effects(times: np.ndarray, metrics: Dict[str, np.ndarray], changes: np.ndarray, window: int) -> Dict[str, Any]:
+    """
+    Window bounds, counts and statistics around each of the µs `changes`.
+
+    `times` and `changes` must be ascending and in the same unit as `window`;
+    `metrics` holds the measurement arrays in step with `times`.
+    """
+    # One search places every window edge: [at - window, at, at + window).
+    edges = np.searchsorted(times, np.concatenate((changes - window, changes, changes + window)), side="left")
+    before, at, after = np.split(edges, 3)
+    bounds = {"before": (before, at), "after": (at, after)}
+
+    effects: Dict[str, Any] = {f"{name}_count": highs - lows for name, (lows, highs) in bounds.items()}
+    for metric in METRICS:
+        for name, (lows, highs) in bounds.items():
+            for statistic, column in window_statistics(metrics[metric], lows, highs).items():
+                effects[f"{metric}_{name}_{statistic}"] = column
+        effects[f"{metric}_difference"] = effects[f"{metric}_after_mean"] - effects[f"{metric}_before_mean"]
+    return effects
+
+
+def report_effects(changes: Dict[str, np.ndarray], effects: Dict[str, Any], window_days: int) -> Dict[str, Any]:
+    """Shape medication changes (see `medication_changes`) and their effects as `MedicationEffects` fields."""
+    columns = {name: _optional_floats(column) for name, column in effects.items() if not name.endswith("_count")}
+    records = {
+        "medication_id": changes["medication_id"].tolist(),
+        "medicine_name": changes["medicine_name"].tolist(),
+        "change": changes["change"].tolist(),
+        "changed_at": pd.to_datetime(changes["at"], unit="us", utc=True).to_pydatetime().tolist(),
+        "dosage_before": changes["dosage_before"].tolist(),
+        "dosage_after": changes["dosage_after"].tolist(),
+        "readings_before": effects["before_count"].tolist(),
+        "readings_after": effects["after_count"].tolist(),
+    }
+    return {
+        "window_days": window_days,
+        "effects": [
+            {
+                **{field: values[i] for field, values in records.items()},
+                **{
+                    metric: {
+                        **{
+                            name: {statistic: columns[f"{metric}_{name}_{statistic}"][i] for statistic in STATISTICS}
+                            for name in WINDOWS
+                        },
+                        "mean_difference": columns[f"{metric}_difference"][i],
+                    }
+                    for metric in METRICS
+                },
+            }
+            for i in range(len(changes["at"]))
+        ],
+    }
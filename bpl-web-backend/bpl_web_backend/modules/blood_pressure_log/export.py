@@ -0,0 +1,229 @@
+"""
+Blood Pressure Log module export formats.
+
+Exporters consume the user's records as an async stream of row chunks (see
+`BloodPressureLogRepository.iter_logs`) and produce the file as an async stream
+of bytes, so memory stays bounded by one chunk whatever the size of the history.
+Parquet and Arrow IPC are registered only when pyarrow is installed.
+"""
+
+import csv
+import io
+import json
+import tempfile
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List
+
+import xlsxwriter
+from fastapi.concurrency import run_in_threadpool
+
+from ...repository import parse_timestamp
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet and Arrow exports are only offered with pyarrow installed
+    pa = None
+
+# Columns written to every export, in order.
+EXPORT_COLUMNS = ("id", "record_datetime", "systolic", "diastolic", "heart_rate", "notes")
+
+# Size of the blocks a finished file is sent in.
+READ_BLOCK_SIZE = 64 * 1024
+
+Chunks = AsyncIterator[List[Dict[str, Any]]]
+
+
+class Exporter(ABC):
+    """One export file format."""
+
+    media_type: str
+    extension: str
+
+    @property
+    def filename(self) -> str:
+        return f"blood_pressure_logs.{self.extension}"
+
+    @abstractmethod
+    def stream(self, chunks: Chunks) -> AsyncIterator[bytes]:
+        """Turn chunks of records into the bytes of the file."""
+
+
+class CsvExporter(Exporter):
+    """CSV, sent to the client chunk by chunk as the records are read."""
+
+    media_type = "text/csv; charset=utf-8"
+    extension = "csv"
+
+    async def stream(self, chunks):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        # The byte order mark makes Excel open the file as UTF-8.
+        buffer.write("\ufeff")
+        writer.writerow(EXPORT_COLUMNS)
+        async for chunk in chunks:
+            writer.writerows([row.get(column) for column in EXPORT_COLUMNS] for row in chunk)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+
+
+class XlsxExporter(Exporter):
+    """
+    Excel workbook written row by row in xlsxwriter's constant-memory mode.
+
+    An .xlsx file is a zip archive that is only complete once closed, so the
+    workbook is built in a temporary file and sent once it is finished.
+    """
+
+    media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    extension = "xlsx"
+
+    async def stream(self, chunks):
+        with tempfile.TemporaryFile() as output:
+            workbook = xlsxwriter.Workbook(output, {"constant_memory": True, "remove_timezone": True})
+            worksheet = workbook.add_worksheet("Blood Pressure Logs")
+            date_format = workbook.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"})
+            worksheet.write_row(0, 0, EXPORT_COLUMNS)
+            worksheet.set_column(1, 1, 20)
+
+            row_number = 1
+            async for chunk in chunks:
+                await run_in_threadpool(self._write_rows, worksheet, row_number, chunk, date_format)
+                row_number += len(chunk)
+            await run_in_threadpool(workbook.close)
+
+            output.seek(0)
+            while block := await run_in_threadpool(output.read, READ_BLOCK_SIZE):
+                yield block
+
+    @staticmethod
+    def _write_rows(worksheet, first_row: int, rows: List[Dict[str, Any]], date_format) -> None:
+        # Cells must be written in row order in constant-memory mode.
+        for row_number, row in enumerate(rows, start=first_row):
+            worksheet.write(row_number, 0, row.get("id"))
+            worksheet.write_datetime(row_number, 1, parse_timestamp(row.get("record_datetime")), date_format)
+            worksheet.write_row(row_number, 2, [row.get(column) for column in EXPORT_COLUMNS[2:]])
+
+
+class NdjsonExporter(Exporter):
+    """Newline-delimited JSON, one record per line, streamed like CSV."""
+
+    media_type = "application/x-ndjson"
+    extension = "ndjson"
+
+    async def stream(self, chunks):
+        async for chunk in chunks:
+            lines = [
+                json.dumps({column: row.get(column) for column in EXPORT_COLUMNS}, default=_json_default, ensure_ascii=False)
+                for row in chunk
+            ]
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if pa is not None:
+    # Typed columns: timestamps stay timestamps and vitals stay integers for analytics readers.
+    ARROW_SCHEMA = pa.schema([
+        ("id", pa.int64()),
+        ("record_datetime", pa.timestamp("us", tz="UTC")),
+        ("systolic", pa.int32()),
+        ("diastolic", pa.int32()),
+        ("heart_rate", pa.int32()),
+        ("notes", pa.string()),
+    ])
+
+
+def _record_batch(rows: List[Dict[str, Any]]):
+    columns = {column: [row.get(column) for row in rows] for column in EXPORT_COLUMNS}
+    columns["record_datetime"] = [parse_timestamp(value) for value in columns["record_datetime"]]
+    return pa.RecordBatch.from_pydict(columns, schema=ARROW_SCHEMA)
+
+
+class ParquetExporter(Exporter):
+    """
+    zstd-compressed Parquet, built in a temporary file like the workbook.
+
+    Chunks are buffered up to `ROW_GROUP_SIZE` rows so row groups are large
+    enough to compress and scan well.
+    """
+
+    media_type = "application/vnd.apache.parquet"
+    extension = "parquet"
+    ROW_GROUP_SIZE = 64 * 1024
+
+    async def stream(self, chunks):
+        with tempfile.TemporaryFile() as output:
+            writer = pq.ParquetWriter(output, ARROW_SCHEMA, compression="zstd")
+            pending, pending_rows = [], 0
+            async for chunk in chunks:
+                pending.append(await run_in_threadpool(_record_batch, chunk))
+                pending_rows += len(chunk)
+                if pending_rows >= self.ROW_GROUP_SIZE:
+                    await run_in_threadpool(writer.write_table, pa.Table.from_batches(pending))
+                    pending, pending_rows = [], 0
+            if pending:
+                await run_in_threadpool(writer.write_table, pa.Table.from_batches(pending))
+            await run_in_threadpool(writer.close)
+
+            output.seek(0)
+            while block := await run_in_threadpool(output.read, READ_BLOCK_SIZE):
+                yield block
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file whose contents are taken out as they are produced."""
+
+    def __init__(self):
+        self._blocks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._blocks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data, self._blocks = b"".join(self._blocks), []
+        return data
+
+
+class ArrowExporter(Exporter):
+    """Arrow IPC stream format, zstd-compressed, sent one record batch per chunk."""
+
+    media_type = "application/vnd.apache.arrow.stream"
+    extension = "arrows"
+
+    async def stream(self, chunks):
+        sink = _DrainableSink()
+        writer = pa.ipc.new_stream(pa.PythonFile(sink, mode="w"), ARROW_SCHEMA, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+        async for chunk in chunks:
+            await run_in_threadpool(writer.write_batch, _record_batch(chunk))
+            yield sink.drain()
+        writer.close()
+        yield sink.drain()
+
+
+EXPORTERS: Dict[str, Exporter] = {
+    "xlsx": XlsxExporter(),
+    "csv": CsvExporter(),
+    "ndjson": NdjsonExporter(),
+}
+# Formats that need pyarrow.
+ARROW_FORMATS = ("parquet", "arrow")
+if pa is not None:
+    EXPORTERS.update({"parquet": ParquetExporter(), "arrow": ArrowExporter()})
@@ -0,0 +1,244 @@
+"""
+Blood Pressure Log module in-memory columnar histories.
+
+Summaries and chart series of a user are computed from the same readings, so
+each user's history is kept once as contiguous numpy arrays (ids, UTC
+timestamps and the three measurements) sorted by time. Entries carry the data
+revision they were built at and are only served while the user's revision is
+unchanged; writes made through `BloodPressureLogService` are applied to the
+entry, advancing its revision, instead of dropping it. The cache is bounded by
+the total size of its arrays and evicts least recently used histories first.
+
+Each history also carries its analytics columns (see analytics.py). They are
+computed once when the history is built; writes applied to a cached history
+only recompute the readings from the earliest changed one on.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ...config import BP_HISTORY_CACHE_MAX_BYTES
+from .analytics import analyze
+from .summary import METRICS
+
+# Columns read to build a history.
+HISTORY_COLUMNS = ("id", "record_datetime", *METRICS)
+
+
+def _microseconds(values: Iterable[Any]) -> np.ndarray:
+    """Timestamps (ISO strings or datetimes) as int64 microseconds since the epoch, UTC."""
+    times = pd.to_datetime(pd.Series(list(values), dtype=object), utc=True, format="ISO8601")
+    return times.to_numpy(dtype="datetime64[us]").view(np.int64)
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _epoch_microseconds(value: datetime) -> int:
+    """One timestamp as microseconds since the epoch; naive datetimes are taken as UTC."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+class History:
+    """One user's readings as parallel arrays sorted by (record_datetime, id)."""
+
+    __slots__ = ("revision", "ids", "times", "systolic", "diastolic", "heart_rate", "analytics")
+
+    def __init__(
+        self,
+        revision: int,
+        ids: np.ndarray,
+        times: np.ndarray,
+        systolic: np.ndarray,
+        diastolic: np.ndarray,
+        heart_rate: np.ndarray,
+        analytics: Optional[Dict[str, np.ndarray]] = None,
+    ):
+        self.revision = revision
+        self.ids = ids
+        self.times = times
+        self.systolic = systolic
+        self.diastolic = diastolic
+        self.heart_rate = heart_rate
+        self.analytics = analytics if analytics is not None else analyze(times, self.metrics)
+
+    @property
+    def metrics(self) -> Dict[str, np.ndarray]:
+        """The measurement arrays by name."""
+        return {metric: getattr(self, metric) for metric in METRICS}
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]], revision: int) -> "History":
+        """Build a history from rows with `HISTORY_COLUMNS`, in any order."""
+        ids = np.fromiter((row["id"] for row in records), dtype=np.int64, count=len(records))
+        times = _microseconds(row["record_datetime"] for row in records)
+        metrics = [np.fromiter((row[metric] for row in records), dtype=np.int32, count=len(records)) for metric in METRICS]
+        order = np.lexsort((ids, times))
+        return cls(revision, ids[order], times[order], *(values[order] for values in metrics))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = sum(getattr(self, name).nbytes for name in ("ids", "times", *METRICS))
+        return arrays + sum(column.nbytes for column in self.analytics.values())
+
+    def window(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> "History":
+        """Readings with `start <= record_datetime < end`, as views of the arrays."""
+        low = 0 if start is None else int(np.searchsorted(self.times, _epoch_microseconds(start), side="left"))
+        high = len(self) if end is None else int(np.searchsorted(self.times, _epoch_microseconds(end), side="left"))
+        return History(
+            self.revision,
+            *(getattr(self, name)[low:high] for name in ("ids", "times", *METRICS)),
+            analytics={name: column[low:high] for name, column in self.analytics.items()},
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """The readings as a DataFrame with a UTC `record_datetime` column, oldest first."""
+        return pd.DataFrame({
+            "id": self.ids,
+            "record_datetime": pd.to_datetime(self.times, unit="us", utc=True),
+            **{metric: getattr(self, metric) for metric in METRICS},
+        })
+
+    def with_upserts(self, rows: List[Dict[str, Any]], revision: int) -> "History":
+        """Return the history with `rows` inserted, replacing readings with the same ids."""
+        upserted = History.from_records(rows, revision)
+        keep = ~np.isin(self.ids, upserted.ids)
+        ids = np.concatenate((self.ids[keep], upserted.ids))
+        times = np.concatenate((self.times[keep], upserted.times))
+        order = np.lexsort((ids, times))
+        times = times[order]
+        metrics = {metric: np.concatenate((getattr(self, metric)[keep], getattr(upserted, metric)))[order] for metric in METRICS}
+        # Readings before the earliest inserted, moved or replaced one keep their analytics.
+        changed = np.concatenate((upserted.times, self.times[~keep])).min()
+        start = int(np.searchsorted(times, changed, side="left"))
+        return History(revision, ids[order], times, **metrics, analytics=analyze(times, metrics, self.analytics, start))
+
+    def without(self, log_id: int, revision: int) -> "History":
+        """Return the history without the reading `log_id`."""
+        keep = self.ids != log_id
+        removed = np.flatnonzero(~keep)
+        times = self.times[keep]
+        metrics = {metric: getattr(self, metric)[keep] for metric in METRICS}
+        start = int(removed[0]) if len(removed) else len(times)
+        return History(revision, self.ids[keep], times, **metrics, analytics=analyze(times, metrics, self.analytics, start))
+
+
+class HistoryCache:
+    """Size-bounded LRU cache of user histories, validated by data revision."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, History]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, user_id: str, revision: int) -> Optional[History]:
+        """Return the user's history if it was built at `revision`, the user's current one."""
+        if not self.enabled:
+            return None
+        user_id = str(user_id)
+        with self._lock:
+            history = self._entries.get(user_id)
+            if history is None or history.revision != revision:
+                if history is not None:
+                    self._remove(user_id)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return history
+
+    def put(self, user_id: str, history: History) -> None:
+        """Cache `history`, evicting least recently used histories beyond `max_bytes`."""
+        if not self.enabled or history.nbytes > self.max_bytes:
+            return
+        user_id = str(user_id)
+        with self._lock:
+            if user_id in self._entries:
+                self._remove(user_id)
+            self._entries[user_id] = history
+            self._size += history.nbytes
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def apply_upserts(self, user_id: str, rows: List[Dict[str, Any]]) -> None:
+        """
+        Apply inserted or updated rows, as returned by the database, to the cached history.
+
+        Each written row carries the revision it was stamped with. The entry is
+        only advanced when those revisions directly follow its own; if another
+        write came in between, the entry is dropped and rebuilt on the next read.
+        Call it in the threadpool: a back-dated write recomputes the analytics
+        of every later reading, which may be most of the history.
+        """
+        if not rows:
+            return
+        self._apply(user_id, len(rows), lambda history, revision: history.with_upserts(rows, revision), [row.get("revision") for row in rows])
+
+    def apply_delete(self, user_id: str, log_id: int) -> None:
+        """
+        Remove a deleted reading from the cached history; the deletion advanced the revision by one.
+
+        Call it in the threadpool, as `apply_upserts`.
+        """
+        self._apply(user_id, 1, lambda history, revision: history.without(log_id, revision), None)
+
+    def _apply(self, user_id: str, changes: int, change, revisions: Optional[List[Any]]) -> None:
+        user_id = str(user_id)
+        with self._lock:
+            history = self._entries.get(user_id)
+            if history is None:
+                return
+            expected = list(range(history.revision + 1, history.revision + changes + 1))
+            if revisions is not None and sorted(revisions, key=lambda value: value or 0) != expected:
+                self._remove(user_id)
+                return
+            self._remove(user_id)
+        self.put(user_id, change(history, expected[-1]))
+
+    def invalidate(self, user_id: str) -> None:
+        """Drop a user's history."""
+        with self._lock:
+            if str(user_id) in self._entries:
+                self._remove(str(user_id))
+
+    def _remove(self, user_id: str) -> None:
+        self._size -= self._entries.pop(user_id).nbytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return size and hit/miss/eviction counters."""
+        with self._lock:
+            return {
+                "users": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+history_cache = HistoryCache(max_bytes=BP_HISTORY_CACHE_MAX_BYTES)
@@ -2,8 +2,8 @@
 Blood Pressure Log module models for blood pressure record management.
 """
 
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, TypeAdapter
+from typing import Any, Dict, List, Literal, Optional, Union
 from datetime import datetime
 
 
@@ -16,6 +16,22 @@ class BloodPressureRecord(BaseModel):
     notes: Optional[str] = None
 
 
+class BloodPressureBatchItemResult(BaseModel):
+    """Outcome of one reading of a bulk create request, by position in the request."""
+    index: int
+    status: Literal["created", "duplicate", "invalid"]
+    id: Optional[int] = None
+    errors: Optional[List[Dict[str, Any]]] = None
+
+
+class BloodPressureBatchResult(BaseModel):
+    """Outcome of a bulk create request."""
+    created: int
+    duplicates: int
+    invalid: int
+    items: List[BloodPressureBatchItemResult]
+
+
 class BloodPressureRecordUpdate(BaseModel):
     """Blood pressure record update model."""
     record_datetime: Optional[datetime] = None
@@ -28,3 +44,118 @@ class BloodPressureRecordUpdate(BaseModel):
 class BloodPressureRecordResponse(BloodPressureRecord):
     """Blood pressure record response model with ID."""
     id: int
+
+
+# Columns a client may request through `fields`; id and record_datetime are
+# always included because they identify a record and form the page cursor.
+BLOOD_PRESSURE_RECORD_FIELDS = ("id", "record_datetime", "systolic", "diastolic", "heart_rate", "notes")
+
+
+class BloodPressureRecordProjection(BaseModel):
+    """Blood pressure record limited to the requested fields."""
+    id: int
+    record_datetime: Optional[datetime] = None
+    systolic: Optional[int] = None
+    diastolic: Optional[int] = None
+    heart_rate: Optional[int] = None
+    notes: Optional[str] = None
+
+
+# Lists of records are validated, and pages serialized, in one pass through
+# pydantic-core instead of one model call per row (see serialization.py).
+BLOOD_PRESSURE_RECORD_LIST = TypeAdapter(List[BloodPressureRecordResponse])
+BLOOD_PRESSURE_PROJECTION_LIST = TypeAdapter(List[BloodPressureRecordProjection])
+BLOOD_PRESSURE_LOG_ITEMS = TypeAdapter(List[Union[BloodPressureRecordResponse, BloodPressureRecordProjection]])
+
+
+class BloodPressureLogPage(BaseModel):
+    """One page of blood pressure records with the cursor of the next page."""
+    items: List[Union[BloodPressureRecordResponse, BloodPressureRecordProjection]]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+
+class MetricSummary(BaseModel):
+    """Mean, minimum and maximum of one measurement within a bucket."""
+    mean: float
+    min: int
+    max: int
+
+
+class BloodPressureSummaryBucket(BaseModel):
+    """Aggregated blood pressure readings for one day, week or month."""
+    bucket_start: datetime
+    count: int
+    systolic: MetricSummary
+    diastolic: MetricSummary
+    heart_rate: MetricSummary
+
+
+class MetricSeries(BaseModel):
+    """Readings of one measurement kept for a chart: timestamps and values in step, oldest first."""
+    record_datetime: List[datetime]
+    value: List[int]
+
+
+class BloodPressureSeries(BaseModel):
+    """Downsampled chart series of each measurement."""
+    total: int
+    systolic: MetricSeries
+    diastolic: MetricSeries
+    heart_rate: MetricSeries
+
+
+class RollingStatistics(BaseModel):
+    """Mean, standard deviation and average real variability of one measurement over the window ending at each reading."""
+    mean: List[float]
+    sd: List[Optional[float]]
+    arv: List[Optional[float]]
+
+
+class BloodPressureAnalytics(BaseModel):
+    """Guideline category, jump flag and rolling statistics of each reading, in step and oldest first."""
+    total: int
+    window_days: int
+    categories: Dict[str, int]
+    id: List[int]
+    record_datetime: List[datetime]
+    category: List[Literal["normal", "elevated", "stage_1", "stage_2", "crisis"]]
+    jump: List[bool]
+    systolic: RollingStatistics
+    diastolic: RollingStatistics
+    heart_rate: RollingStatistics
+
+
+class WindowStatistics(BaseModel):
+    """Mean, standard deviation and average real variability of one measurement in a window."""
+    mean: Optional[float] = None
+    sd: Optional[float] = None
+    arv: Optional[float] = None
+
+
+class MeasurementEffect(BaseModel):
+    """One measurement before and after a medication change; `mean_difference` is after minus before."""
+    before: WindowStatistics
+    after: WindowStatistics
+    mean_difference: Optional[float] = None
+
+
+class MedicationEffect(BaseModel):
+    """A medication start, stop or dose change and the readings in the windows around it."""
+    medication_id: int
+    medicine_name: str
+    change: Literal["start", "stop", "dose_change"]
+    changed_at: datetime
+    dosage_before: Optional[int] = None
+    dosage_after: Optional[int] = None
+    readings_before: int
+    readings_after: int
+    systolic: MeasurementEffect
+    diastolic: MeasurementEffect
+    heart_rate: MeasurementEffect
+
+
+class MedicationEffects(BaseModel):
+    """Medication changes of a user, oldest first, with blood pressure before and after each."""
+    window_days: int
+    effects: List[MedicationEffect]
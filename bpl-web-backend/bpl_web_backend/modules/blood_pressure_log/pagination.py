@@ -0,0 +1,37 @@
+"""
+Blood Pressure Log module keyset pagination cursors.
+
+A cursor is the `(record_datetime, id)` of the last row of a page, encoded as
+opaque URL-safe base64 so clients never build or parse it themselves.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Tuple, Union
+
+Cursor = Tuple[datetime, int]
+
+
+def encode_cursor(record: Dict[str, Any]) -> str:
+    """Build the cursor that points just past `record`."""
+    record_datetime: Union[str, datetime] = record["record_datetime"]
+    if isinstance(record_datetime, datetime):
+        record_datetime = record_datetime.isoformat()
+    payload = json.dumps([record_datetime, record["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """
+    Decode a cursor produced by `encode_cursor`.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        record_datetime, record_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(record_datetime), int(record_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
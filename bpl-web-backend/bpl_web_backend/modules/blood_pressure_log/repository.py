@@ -0,0 +1,390 @@
+"""
+Blood Pressure Log module repository for data access.
+"""
+
+from abc import ABC, abstractmethod
+from datetime import date, datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from postgrest.exceptions import APIError
+
+from ...config import DATA_BACKEND
+from ...database import async_supabase, pg_pool
+from ...repository import DuplicateRecordError, is_unique_violation, parse_timestamp, quote_ident, record_to_dict
+from .pagination import Cursor
+from .summary import METRICS, summarize_records, summarize_rollups
+
+TABLE = "blood_pressure_records"
+ROLLUP_TABLE = "blood_pressure_daily_rollups"
+
+# Rows per request when reading a whole window through PostgREST, which caps
+# the size of a single response.
+FETCH_CHUNK_SIZE = 1000
+# Rows per INSERT statement in bulk creates.
+INSERT_CHUNK_SIZE = 500
+
+
+def _utc_day(value: datetime) -> date:
+    # Naive datetimes are taken as UTC, as Postgres does for timestamptz parameters.
+    return value.astimezone(timezone.utc).date() if value.tzinfo else value.date()
+
+
+def _bucket_from_row(row: Any) -> Dict[str, Any]:
+    # Flat `<metric>_<stat>` aggregate columns into the nested summary shape.
+    return {
+        "bucket_start": row["bucket_start"],
+        "count": row["count"],
+        **{
+            metric: {stat: row[f"{metric}_{stat}"] for stat in ("mean", "min", "max")}
+            for metric in METRICS
+        },
+    }
+
+
+def _latest_from_rollup(row: Any) -> Dict[str, Any]:
+    return {
+        "id": row["latest_record_id"],
+        "record_datetime": row["latest_record_datetime"],
+        **{metric: row[f"latest_{metric}"] for metric in METRICS},
+    }
+
+
+class BloodPressureLogRepository(ABC):
+    """Data access for blood pressure records."""
+
+    @abstractmethod
+    async def list_logs(
+        self,
+        user_id: str,
+        limit: int,
+        *,
+        offset: int = 0,
+        after: Optional[Cursor] = None,
+        include_count: bool = False,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Return one page of the user's records ordered by `(record_datetime, id)` descending.
+
+        `after` continues from a keyset cursor, so the page costs the same at
+        any depth. `start` (inclusive) and `end` (exclusive) bound
+        `record_datetime`, and `columns` limits the selected columns. The total
+        row count, of the whole `start`/`end` window whatever `after` and
+        `offset` are, is only computed when `include_count` is set; otherwise
+        None is returned in its place.
+        """
+
+    async def iter_logs(
+        self,
+        user_id: str,
+        *,
+        chunk_size: Optional[int] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Yield all of the user's records, newest first, in chunks of at most
+        `chunk_size` (`FETCH_CHUNK_SIZE` by default).
+
+        Chunks are read one keyset page at a time, so only one is held in memory.
+        `columns` must include `id` and `record_datetime`.
+        """
+        chunk_size = chunk_size or FETCH_CHUNK_SIZE
+        after = None
+        while True:
+            chunk, _ = await self.list_logs(user_id, chunk_size, after=after, start=start, end=end, columns=columns)
+            if chunk:
+                yield chunk
+            if len(chunk) < chunk_size:
+                return
+            last = chunk[-1]
+            after = (parse_timestamp(last["record_datetime"]), last["id"])
+
+    @abstractmethod
+    async def summarize_logs(
+        self,
+        user_id: str,
+        bucket: str,
+        tz: str,
+        *,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Return per-bucket count, mean, min and max of each metric, oldest bucket first.
+
+        `bucket` is one of `summary.BUCKETS`; buckets are aligned to local time in `tz`.
+        """
+
+    @abstractmethod
+    async def summarize_rollups(
+        self,
+        user_id: str,
+        bucket: str,
+        *,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Same result as `summarize_logs` in UTC, read from the daily rollup table.
+
+        `start` and `end` must fall on UTC midnight (see `summary.rollups_cover`).
+        """
+
+    @abstractmethod
+    async def get_latest_log(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the id, record_datetime and metrics of the user's newest record from
+        the daily rollup table, or None if the user has no records.
+        """
+
+    @abstractmethod
+    async def create_log(self, user_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Insert a record and return it.
+
+        Raises:
+            DuplicateRecordError: If the user already has a record at that record_datetime.
+        """
+
+    @abstractmethod
+    async def create_logs(self, user_id: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Insert many records, one statement per `INSERT_CHUNK_SIZE` rows, and return the inserted ones.
+
+        Rows whose `(user_id, record_datetime)` already exists are skipped and
+        left out of the result.
+        """
+
+    @abstractmethod
+    async def update_log(self, user_id: str, log_id: int, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Update a record and return it, or None if the user has no such record."""
+
+    @abstractmethod
+    async def delete_log(self, user_id: str, log_id: int) -> bool:
+        """Delete a record; return False if the user has no such record."""
+
+
+class SupabaseBloodPressureLogRepository(BloodPressureLogRepository):
+    """Blood pressure records through PostgREST."""
+
+    @staticmethod
+    def _window(query, start: Optional[datetime], end: Optional[datetime]):
+        if start is not None:
+            query = query.gte("record_datetime", start.isoformat())
+        if end is not None:
+            query = query.lt("record_datetime", end.isoformat())
+        return query
+
+    async def list_logs(self, user_id, limit, *, offset=0, after=None, include_count=False, start=None, end=None, columns=None):
+        # The count of a page read after a cursor would stop at the cursor, so
+        # the window is then counted by a query of its own.
+        count_page = include_count and after is None
+        query = async_supabase.table(TABLE).select(",".join(columns) if columns else "*", count='exact' if count_page else None).eq("user_id", user_id)
+        query = self._window(query, start, end)
+        if after is not None:
+            record_datetime, record_id = after[0].isoformat(), after[1]
+            query = query.or_(f'record_datetime.lt."{record_datetime}",and(record_datetime.eq."{record_datetime}",id.lt.{record_id})')
+        response = await query.order("record_datetime", desc=True).order("id", desc=True).range(offset, offset + limit - 1).execute()
+        total = response.count if count_page else None
+        if include_count and after is not None:
+            query = async_supabase.table(TABLE).select("id", count='exact').eq("user_id", user_id)
+            total = (await self._window(query, start, end).limit(0).execute()).count
+        return response.data, total
+
+    async def summarize_logs(self, user_id, bucket, tz, *, start=None, end=None):
+        # PostgREST cannot group, so read the window's readings (only the columns
+        # needed) once, in keyset chunks, and aggregate them in one pass.
+        records: List[Dict[str, Any]] = []
+        async for chunk in self.iter_logs(user_id, start=start, end=end, columns=["id", "record_datetime", *METRICS]):
+            records.extend(chunk)
+        return await run_in_threadpool(summarize_records, records, bucket, tz)
+
+    async def summarize_rollups(self, user_id, bucket, *, start=None, end=None):
+        query = async_supabase.table(ROLLUP_TABLE).select("*").eq("user_id", user_id)
+        if start is not None:
+            query = query.gte("day", _utc_day(start).isoformat())
+        if end is not None:
+            query = query.lt("day", _utc_day(end).isoformat())
+        rows: List[Dict[str, Any]] = []
+        while True:
+            response = await query.order("day").range(len(rows), len(rows) + FETCH_CHUNK_SIZE - 1).execute()
+            rows.extend(response.data)
+            if len(response.data) < FETCH_CHUNK_SIZE:
+                break
+        return await run_in_threadpool(summarize_rollups, rows, bucket)
+
+    async def get_latest_log(self, user_id):
+        response = await async_supabase.table(ROLLUP_TABLE).select(
+            "latest_record_id,latest_record_datetime,latest_systolic,latest_diastolic,latest_heart_rate"
+        ).eq("user_id", user_id).order("day", desc=True).limit(1).execute()
+        return _latest_from_rollup(response.data[0]) if response.data else None
+
+    async def create_log(self, user_id, data):
+        try:
+            response = await async_supabase.table(TABLE).insert({**data, "user_id": str(user_id)}).execute()
+        except APIError as e:
+            if is_unique_violation(e):
+                raise DuplicateRecordError("A blood pressure log already exists at this time.") from e
+            raise
+        return response.data[0] if response.data else None
+
+    async def create_logs(self, user_id, rows):
+        created: List[Dict[str, Any]] = []
+        for i in range(0, len(rows), INSERT_CHUNK_SIZE):
+            chunk = jsonable_encoder([{**row, "user_id": str(user_id)} for row in rows[i:i + INSERT_CHUNK_SIZE]])
+            # ignore_duplicates maps to ON CONFLICT DO NOTHING; only inserted rows come back.
+            response = await async_supabase.table(TABLE).upsert(
+                chunk, on_conflict="user_id,record_datetime", ignore_duplicates=True
+            ).execute()
+            created.extend(response.data)
+        return created
+
+    async def update_log(self, user_id, log_id, data):
+        response = await async_supabase.table(TABLE).update(data).eq("id", log_id).eq("user_id", user_id).execute()
+        return response.data[0] if response.data else None
+
+    async def delete_log(self, user_id, log_id):
+        response = await async_supabase.table(TABLE).delete().eq("id", log_id).eq("user_id", user_id).execute()
+        return bool(response.data)
+
+
+class PostgresBloodPressureLogRepository(BloodPressureLogRepository):
+    """Blood pressure records on the direct Postgres pool."""
+
+    @staticmethod
+    def _filters(params: List[Any], start: Optional[datetime], end: Optional[datetime]) -> str:
+        # params[0] is the user id; the window bounds are appended as further parameters.
+        conditions = ["user_id = $1"]
+        if start is not None:
+            params.append(start)
+            conditions.append(f"record_datetime >= ${len(params)}")
+        if end is not None:
+            params.append(end)
+            conditions.append(f"record_datetime < ${len(params)}")
+        return " AND ".join(conditions)
+
+    async def list_logs(self, user_id, limit, *, offset=0, after=None, include_count=False, start=None, end=None, columns=None):
+        params: List[Any] = [user_id]
+        filters = self._filters(params, start, end)
+        keyset = ""
+        if after is not None:
+            # Row comparison walks the (user_id, record_datetime, id) index directly.
+            keyset = f" AND (record_datetime, id) < (${len(params) + 1}, ${len(params) + 2})"
+        select_list = ", ".join(map(quote_ident, columns)) if columns else "*"
+        paging = [*after] if after is not None else []
+        sql = (
+            f"SELECT {select_list} FROM {TABLE} WHERE {filters}{keyset} "
+            f"ORDER BY record_datetime DESC, id DESC "
+            f"OFFSET ${len(params) + len(paging) + 1} LIMIT ${len(params) + len(paging) + 2}"
+        )
+        total = None
+        async with pg_pool.transaction(user_id) as conn:
+            rows = await conn.fetch(sql, *params, *paging, offset, limit)
+            if include_count:
+                total = await conn.fetchval(f"SELECT count(*) FROM {TABLE} WHERE {filters}", *params)
+        return [record_to_dict(row) for row in rows], total
+
+    async def summarize_logs(self, user_id, bucket, tz, *, start=None, end=None):
+        params: List[Any] = [user_id, bucket, tz]
+        filters = self._filters(params, start, end)
+        aggregates = ", ".join(
+            f"avg({metric})::float8 AS {metric}_mean, min({metric}) AS {metric}_min, max({metric}) AS {metric}_max"
+            for metric in METRICS
+        )
+        # Truncate in local wall time, then turn the bucket start back into a timestamptz.
+        sql = (
+            f"SELECT date_trunc($2, record_datetime AT TIME ZONE $3) AT TIME ZONE $3 AS bucket_start, "
+            f"count(*) AS count, {aggregates} "
+            f"FROM {TABLE} WHERE {filters} GROUP BY 1 ORDER BY 1"
+        )
+        async with pg_pool.transaction(user_id) as conn:
+            rows = await conn.fetch(sql, *params)
+        return [_bucket_from_row(row) for row in rows]
+
+    async def summarize_rollups(self, user_id, bucket, *, start=None, end=None):
+        params: List[Any] = [user_id, bucket]
+        conditions = ["user_id = $1"]
+        if start is not None:
+            params.append(_utc_day(start))
+            conditions.append(f"day >= ${len(params)}")
+        if end is not None:
+            params.append(_utc_day(end))
+            conditions.append(f"day < ${len(params)}")
+        aggregates = ", ".join(
+            f"sum({metric}_sum)::float8 / sum(record_count) AS {metric}_mean, "
+            f"min({metric}_min) AS {metric}_min, max({metric}_max) AS {metric}_max"
+            for metric in METRICS
+        )
+        sql = (
+            f"SELECT date_trunc($2, day::timestamp) AT TIME ZONE 'UTC' AS bucket_start, "
+            f"sum(record_count)::int AS count, {aggregates} "
+            f"FROM {ROLLUP_TABLE} WHERE {' AND '.join(conditions)} GROUP BY 1 ORDER BY 1"
+        )
+        async with pg_pool.transaction(user_id) as conn:
+            rows = await conn.fetch(sql, *params)
+        return [_bucket_from_row(row) for row in rows]
+
+    async def get_latest_log(self, user_id):
+        sql = (
+            f"SELECT latest_record_id, latest_record_datetime, latest_systolic, latest_diastolic, latest_heart_rate "
+            f"FROM {ROLLUP_TABLE} WHERE user_id = $1 ORDER BY day DESC LIMIT 1"
+        )
+        async with pg_pool.transaction(user_id) as conn:
+            row = await conn.fetchrow(sql, user_id)
+        return _latest_from_rollup(row) if row else None
+
+    async def create_log(self, user_id, data):
+        columns = list(data)
+        placeholders = ", ".join(f"${i}" for i in range(2, len(columns) + 2))
+        sql = f"INSERT INTO {TABLE} (user_id, {', '.join(map(quote_ident, columns))}) VALUES ($1, {placeholders}) RETURNING *"
+        try:
+            async with pg_pool.transaction(user_id) as conn:
+                row = await conn.fetchrow(sql, user_id, *data.values())
+        except APIError as e:
+            if is_unique_violation(e):
+                raise DuplicateRecordError("A blood pressure log already exists at this time.") from e
+            raise
+        return record_to_dict(row) if row else None
+
+    async def create_logs(self, user_id, rows):
+        # One array parameter per column, unnested server-side into rows.
+        sql = (
+            f"INSERT INTO {TABLE} (user_id, record_datetime, systolic, diastolic, heart_rate, notes) "
+            f"SELECT $1::uuid, * FROM unnest($2::timestamptz[], $3::int[], $4::int[], $5::int[], $6::text[]) "
+            f"ON CONFLICT (user_id, record_datetime) DO NOTHING RETURNING *"
+        )
+        created: List[Dict[str, Any]] = []
+        async with pg_pool.transaction(user_id) as conn:
+            for i in range(0, len(rows), INSERT_CHUNK_SIZE):
+                chunk = rows[i:i + INSERT_CHUNK_SIZE]
+                columns = [[row.get(column) for row in chunk] for column in ("record_datetime", *METRICS, "notes")]
+                created.extend(record_to_dict(row) for row in await conn.fetch(sql, user_id, *columns))
+        return created
+
+    async def update_log(self, user_id, log_id, data):
+        assignments = ", ".join(f"{quote_ident(column)} = ${i}" for i, column in enumerate(data, start=3))
+        sql = f"UPDATE {TABLE} SET {assignments} WHERE id = $1 AND user_id = $2 RETURNING *"
+        async with pg_pool.transaction(user_id) as conn:
+            row = await conn.fetchrow(sql, log_id, user_id, *data.values())
+        return record_to_dict(row) if row else None
+
+    async def delete_log(self, user_id, log_id):
+        async with pg_pool.transaction(user_id) as conn:
+            row = await conn.fetchrow(f"DELETE FROM {TABLE} WHERE id = $1 AND user_id = $2 RETURNING id", log_id, user_id)
+        return row is not None
+
+
+def create_repository() -> BloodPressureLogRepository:
+    """Return the repository for the configured data backend."""
+    if DATA_BACKEND == "postgres":
+        return PostgresBloodPressureLogRepository()
+    return SupabaseBloodPressureLogRepository()
+
+
+repository = create_repository()
@@ -2,43 +2,171 @@
 Blood Pressure Log module routes for API endpoints.
 """
 
-from fastapi import APIRouter, Depends, status
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Body, Depends, Header, Query, Response, status
 from gotrue.types import User
-from typing import List
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
 
 from ...dependencies import get_current_user
-from .models import BloodPressureRecord, BloodPressureRecordUpdate, BloodPressureRecordResponse
+from ...revisions import ConditionalRequest
+from ...serialization import json_response
+from .models import BLOOD_PRESSURE_LOG_ITEMS, BloodPressureRecord, BloodPressureRecordUpdate, BloodPressureRecordResponse, BloodPressureRecordProjection, BloodPressureSummaryBucket, BloodPressureBatchResult, BloodPressureSeries, BloodPressureAnalytics, MedicationEffects
+from .effects import DEFAULT_WINDOW_DAYS, MAX_WINDOW_DAYS
 from .services import BloodPressureLogService
 
 router = APIRouter(prefix="/api", tags=["Blood Pressure Logs"])
 
 
-@router.get("/blood-pressure-logs", response_model=List[BloodPressureRecordResponse])
-def get_blood_pressure_logs(current_user: User = Depends(get_current_user), page: int = 1, per_page: int = 25):
-    """Get blood pressure logs for the current user with pagination."""
-    return BloodPressureLogService.get_blood_pressure_logs(current_user, page, per_page)
+@router.get(
+    "/blood-pressure-logs",
+    response_model=List[BloodPressureRecordProjection],
+    response_model_exclude_unset=True,
+)
+async def get_blood_pressure_logs(
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    conditional: ConditionalRequest = Depends(),
+    page: int = Query(1, ge=1),
+    per_page: int = Query(25, ge=1),
+    cursor: Optional[str] = None,
+    include_count: bool = False,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    fields: Optional[str] = None,
+):
+    """
+    Get blood pressure logs for the current user with pagination.
+
+    `from` (inclusive) and `to` (exclusive) limit the logs to a time window, and
+    `fields` is a comma-separated list of the columns to return (`id` and
+    `record_datetime` are always included). The cursor of the next page is
+    returned in the `X-Next-Cursor` header and the total number of logs in the
+    window, on every page, when `include_count` is set, in `X-Total-Count`. Responses carry an
+    `ETag` and `Last-Modified`; a matching `If-None-Match` or `If-Modified-Since`
+    gets 304 Not Modified.
+    """
+    result = await BloodPressureLogService.get_blood_pressure_logs(
+        current_user, page, per_page, cursor, include_count, start=from_, end=to, fields=fields, conditional=conditional,
+    )
+    if isinstance(result, Response):
+        return result
+    if result.next_cursor:
+        response.headers["X-Next-Cursor"] = result.next_cursor
+    if result.total is not None:
+        response.headers["X-Total-Count"] = str(result.total)
+    return json_response(BLOOD_PRESSURE_LOG_ITEMS, result.items, response, exclude_unset=True)
+
+
+@router.get("/blood-pressure-logs/summary", response_model=List[BloodPressureSummaryBucket])
+async def get_blood_pressure_summary(
+    current_user: User = Depends(get_current_user),
+    bucket: Literal["day", "week", "month"] = "day",
+    tz: str = "UTC",
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+):
+    """
+    Get count, mean, min and max of systolic, diastolic and heart rate per bucket.
+
+    Buckets are calendar days, weeks (starting Monday) or months in the IANA
+    timezone `tz`, oldest first.
+    """
+    return await BloodPressureLogService.get_blood_pressure_summary(current_user, bucket, tz, start=from_, end=to)
+
+
+@router.get("/blood-pressure-logs/series", response_model=BloodPressureSeries)
+async def get_blood_pressure_series(
+    current_user: User = Depends(get_current_user),
+    points: int = Query(500, ge=3, le=5000),
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+):
+    """
+    Get chart series of systolic, diastolic and heart rate with at most `points` readings each.
+
+    Readings are picked with Largest-Triangle-Three-Buckets, which keeps the
+    shape of the curve, including peaks, however long the history is.
+    """
+    return await BloodPressureLogService.get_blood_pressure_series(current_user, points, start=from_, end=to)
+
+
+@router.get("/blood-pressure-logs/analytics", response_model=BloodPressureAnalytics)
+async def get_blood_pressure_analytics(
+    current_user: User = Depends(get_current_user),
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+):
+    """
+    Get each reading's blood pressure category and rolling statistics, oldest first.
+
+    Categories follow the ACC/AHA 2017 guideline. Mean, SD and average real
+    variability cover the 7 days up to each reading; `jump` marks readings whose
+    systolic or diastolic changed sharply from the previous one.
+    """
+    return await BloodPressureLogService.get_blood_pressure_analytics(current_user, start=from_, end=to)
+
+
+@router.get("/blood-pressure-logs/medication-effects", response_model=MedicationEffects)
+async def get_medication_effects(
+    current_user: User = Depends(get_current_user),
+    window_days: int = Query(DEFAULT_WINDOW_DAYS, ge=1, le=MAX_WINDOW_DAYS),
+):
+    """
+    Get blood pressure before and after each start, stop and dose change of the user's medications.
+
+    For each change, mean, SD and average real variability of every
+    measurement cover the `window_days` before and after it, along with the
+    difference of the means.
+    """
+    return await BloodPressureLogService.get_medication_effects(current_user, window_days)
+
+
+@router.get("/blood-pressure-logs/latest", response_model=BloodPressureRecordProjection, response_model_exclude_unset=True)
+async def get_latest_blood_pressure_log(current_user: User = Depends(get_current_user)):
+    """Get the most recent blood pressure log of the current user."""
+    return await BloodPressureLogService.get_latest_blood_pressure_log(current_user)
 
 
 @router.post("/blood-pressure-logs", response_model=BloodPressureRecordResponse, status_code=status.HTTP_201_CREATED)
-def create_blood_pressure_log(record: BloodPressureRecord, current_user: User = Depends(get_current_user)):
+async def create_blood_pressure_log(record: BloodPressureRecord, current_user: User = Depends(get_current_user)):
     """Create a new blood pressure log."""
-    return BloodPressureLogService.create_blood_pressure_log(record, current_user)
+    return await BloodPressureLogService.create_blood_pressure_log(record, current_user)
+
+
+@router.post("/blood-pressure-logs/batch", response_model=BloodPressureBatchResult)
+async def create_blood_pressure_logs(items: List[Dict[str, Any]] = Body(...), current_user: User = Depends(get_current_user)):
+    """
+    Create many blood pressure logs at once, e.g. when a home monitor syncs its memory.
+
+    Each reading is reported by position as created, duplicate (same
+    record_datetime as an existing or earlier reading) or invalid.
+    """
+    return await BloodPressureLogService.create_blood_pressure_logs(items, current_user)
 
 
 @router.put("/blood-pressure-logs/{log_id}", response_model=BloodPressureRecordResponse)
-def update_blood_pressure_log(log_id: int, record: BloodPressureRecordUpdate, current_user: User = Depends(get_current_user)):
+async def update_blood_pressure_log(log_id: int, record: BloodPressureRecordUpdate, current_user: User = Depends(get_current_user)):
     """Update an existing blood pressure log."""
-    return BloodPressureLogService.update_blood_pressure_log(log_id, record, current_user)
+    return await BloodPressureLogService.update_blood_pressure_log(log_id, record, current_user)
 
 
 @router.delete("/blood-pressure-logs/{log_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_blood_pressure_log(log_id: int, current_user: User = Depends(get_current_user)):
+async def delete_blood_pressure_log(log_id: int, current_user: User = Depends(get_current_user)):
     """Delete a blood pressure log."""
-    return BloodPressureLogService.delete_blood_pressure_log(log_id, current_user)
+    return await BloodPressureLogService.delete_blood_pressure_log(log_id, current_user)
 
 
 @router.get("/blood-pressure-logs/export")
-def export_blood_pressure_logs(current_user: User = Depends(get_current_user)):
-    """Export blood pressure logs to Excel file."""
-    return BloodPressureLogService.export_blood_pressure_logs(current_user)
+async def export_blood_pressure_logs(
+    current_user: User = Depends(get_current_user),
+    format: Literal["xlsx", "csv", "ndjson", "parquet", "arrow"] = "xlsx",
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Export blood pressure logs as Excel (default), CSV, NDJSON, Parquet or an Arrow IPC stream.
+
+    Parquet and Arrow keep typed columns (UTC timestamps, integer vitals) for analytics tools.
+    The response carries an ETag of the user's data revision; sending it back in
+    If-None-Match returns 304 while the data is unchanged.
+    """
+    return await BloodPressureLogService.export_blood_pressure_logs(current_user, format, if_none_match)
@@ -2,28 +2,110 @@
 Blood Pressure Log module services for business logic.
 """
 
-from fastapi import HTTPException, status
-from fastapi.responses import StreamingResponse
+from fastapi import HTTPException, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
 from gotrue.types import User
 from postgrest.exceptions import APIError
-from typing import List
-import pandas as pd
-import io
+from pydantic import ValidationError
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Union
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
-from ...database import supabase
-from .models import BloodPressureRecord, BloodPressureRecordUpdate, BloodPressureRecordResponse
+from ...config import BP_ROLLUPS_ENABLED
+from ...export_cache import export_cache
+from ...repository import DuplicateRecordError
+from ...revisions import ConditionalRequest, etag_matches, revision_repository, validator_headers
+from .models import (
+    BLOOD_PRESSURE_PROJECTION_LIST,
+    BLOOD_PRESSURE_RECORD_FIELDS,
+    BLOOD_PRESSURE_RECORD_LIST,
+    BloodPressureAnalytics,
+    BloodPressureRecord,
+    BloodPressureBatchItemResult,
+    BloodPressureBatchResult,
+    BloodPressureRecordUpdate,
+    BloodPressureRecordResponse,
+    BloodPressureRecordProjection,
+    BloodPressureLogPage,
+    BloodPressureSeries,
+    BloodPressureSummaryBucket,
+    MedicationEffects,
+)
+from .export import ARROW_FORMATS, EXPORT_COLUMNS, EXPORTERS
+from .pagination import decode_cursor, encode_cursor
+from ..medications.periods import medication_changes
+from ..medications.repository import repository as medication_repository
+from .repository import TABLE as RESOURCE, repository
+from .analytics import report
+from .downsample import downsample_frame
+from .effects import medication_effects, report_effects
+from .history import HISTORY_COLUMNS, History, history_cache
+from .summary import rollups_cover, summarize_frame
+
+# Largest number of readings accepted by one bulk create request.
+MAX_BATCH_SIZE = 1000
+
+
+
+def _reading_key(record_datetime: datetime) -> datetime:
+    """Identify a reading by its instant; naive datetimes are stored as UTC."""
+    return record_datetime if record_datetime.tzinfo else record_datetime.replace(tzinfo=timezone.utc)
 
 
 class BloodPressureLogService:
     """Service class for blood pressure log operations."""
     
     @staticmethod
-    def get_blood_pressure_logs(current_user: User, page: int = 1, per_page: int = 25) -> List[BloodPressureRecordResponse]:
-        """Get blood pressure logs for the current user with pagination."""
+    async def get_blood_pressure_logs(
+        current_user: User,
+        page: int = 1,
+        per_page: int = 25,
+        cursor: Optional[str] = None,
+        include_count: bool = False,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        fields: Optional[str] = None,
+        conditional: Optional[ConditionalRequest] = None,
+    ) -> Union[BloodPressureLogPage, Response]:
+        """
+        Get one page of blood pressure logs for the current user.
+
+        Pages are addressed by an opaque keyset `cursor`; `page` is still honoured
+        (as an offset) when no cursor is given. The total count is only queried
+        when `include_count` is set. `start`/`end` restrict the time window and
+        `fields` (comma-separated) the returned columns; both are applied in the
+        database query. With `conditional`, a client whose copy is still current
+        gets a 304 response before any record is read.
+        """
         try:
-            offset = (page - 1) * per_page
-            response = supabase.table("blood_pressure_records").select("*", count='exact').eq("user_id", current_user.id).order("record_datetime", desc=True).range(offset, offset + per_page - 1).execute()
-            return [BloodPressureRecordResponse(**record) for record in response.data]
+            try:
+                after = decode_cursor(cursor) if cursor else None
+            except ValueError:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+            if start is not None and end is not None and start >= end:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'from' must be earlier than 'to'")
+            columns = BloodPressureLogService._parse_fields(fields)
+            offset = 0 if after is not None else (page - 1) * per_page
+            if conditional is not None:
+                not_modified = conditional.check(await revision_repository.get(current_user.id, RESOURCE), "logs")
+                if not_modified is not None:
+                    return not_modified
+
+            # Fetch one extra row to learn whether another page follows.
+            records, total = await repository.list_logs(
+                current_user.id, per_page + 1, offset=offset, after=after, include_count=include_count,
+                start=start, end=end, columns=columns,
+            )
+            has_more = len(records) > per_page
+            records = records[:per_page]
+            adapter = BLOOD_PRESSURE_PROJECTION_LIST if columns else BLOOD_PRESSURE_RECORD_LIST
+            # The items are validated in bulk here; construct the page without a second pass.
+            return BloodPressureLogPage.model_construct(
+                items=adapter.validate_python(records),
+                next_cursor=encode_cursor(records[-1]) if has_more else None,
+                total=total,
+            )
         except APIError as e:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e.message}")
         except HTTPException:
@@ -32,15 +114,236 @@ class BloodPressureLogService:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {str(e)}")
     
     @staticmethod
-    def create_blood_pressure_log(record: BloodPressureRecord, current_user: User) -> BloodPressureRecordResponse:
+    def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+        """Turn a comma-separated `fields` value into the list of columns to select."""
+        if not fields:
+            return None
+        requested = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = requested.difference(BLOOD_PRESSURE_RECORD_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+        requested.update(("id", "record_datetime"))
+        return [field for field in BLOOD_PRESSURE_RECORD_FIELDS if field in requested]
+
+    @staticmethod
+    async def _get_history(user_id: str) -> History:
+        """
+        Return the user's readings as columnar arrays, from the history cache when current.
+
+        The revision is read before the readings: a history built from newer
+        data than its revision says is only rebuilt once too often.
+        """
+        revision = await revision_repository.get(user_id, RESOURCE)
+        history = history_cache.get(user_id, revision.revision)
+        if history is None:
+            records = [record async for chunk in repository.iter_logs(user_id, columns=HISTORY_COLUMNS) for record in chunk]
+            history = await run_in_threadpool(History.from_records, records, revision.revision)
+            history_cache.put(user_id, history)
+        return history
+
+    @staticmethod
+    async def get_blood_pressure_summary(
+        current_user: User,
+        bucket: str = "day",
+        tz: str = "UTC",
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> List[BloodPressureSummaryBucket]:
+        """Get per-day, -week or -month statistics of the current user's logs in their timezone."""
+        try:
+            try:
+                ZoneInfo(tz)
+            except (ZoneInfoNotFoundError, ValueError):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown timezone: {tz}")
+            if start is not None and end is not None and start >= end:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'from' must be earlier than 'to'")
+
+            if BP_ROLLUPS_ENABLED and rollups_cover(tz, start, end):
+                buckets = await repository.summarize_rollups(current_user.id, bucket, start=start, end=end)
+            elif history_cache.enabled:
+                history = await BloodPressureLogService._get_history(current_user.id)
+                buckets = await run_in_threadpool(summarize_frame, history.window(start, end).to_frame(), bucket, tz)
+            else:
+                buckets = await repository.summarize_logs(current_user.id, bucket, tz, start=start, end=end)
+            return [BloodPressureSummaryBucket(**b) for b in buckets]
+        except APIError as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e.message}")
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {str(e)}")
+
+    @staticmethod
+    async def get_blood_pressure_series(
+        current_user: User,
+        points: int = 500,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> BloodPressureSeries:
+        """
+        Get the current user's readings reduced to at most `points` per measurement.
+
+        The window is cut from the user's cached history and reduced with LTTB
+        (see downsample.py), so the response size does not grow with the history.
+        """
+        try:
+            if start is not None and end is not None and start >= end:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'from' must be earlier than 'to'")
+            history = (await BloodPressureLogService._get_history(current_user.id)).window(start, end)
+            series = await run_in_threadpool(downsample_frame, history.to_frame(), points)
+            return BloodPressureSeries(total=len(history), **series)
+        except APIError as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e.message}")
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {str(e)}")
+
+    @staticmethod
+    async def get_blood_pressure_analytics(
+        current_user: User,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> BloodPressureAnalytics:
+        """
+        Get the guideline category, jump flag and rolling statistics of each of the current user's readings.
+
+        The analytics are kept with the user's cached history (see
+        analytics.py), so a request only cuts out the window and shapes it.
+        Rolling statistics of the first readings of the window still include
+        the readings just before it.
+        """
+        try:
+            if start is not None and end is not None and start >= end:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'from' must be earlier than 'to'")
+            history = (await BloodPressureLogService._get_history(current_user.id)).window(start, end)
+            analytics = await run_in_threadpool(report, history.ids, history.times, history.analytics)
+            return BloodPressureAnalytics(**analytics)
+        except APIError as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e.message}")
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {str(e)}")
+
+    @staticmethod
+    async def get_medication_effects(current_user: User, window_days: int) -> MedicationEffects:
+        """
+        Get each start, stop and dose change of the current user's medications
+        with blood pressure in the `window_days` before and after it.
+
+        Readings come from the cached history and changes from the medication
+        periods; both are sorted, so all windows are placed with one search
+        (see effects.py).
+        """
+        try:
+            history = await BloodPressureLogService._get_history(current_user.id)
+            periods = await medication_repository.list_periods(current_user.id)
+
+            def analyze():
+                changes = medication_changes(periods)
+                window = timedelta(days=window_days) // timedelta(microseconds=1)
+                effects = medication_effects(history.times, history.metrics, changes["at"], window)
+                return report_effects(changes, effects, window_days)
+
+            return MedicationEffects(**await run_in_threadpool(analyze))
+        except APIError as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e.message}")
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {str(e)}")
+
+    @staticmethod
+    async def get_latest_blood_pressure_log(current_user: User) -> BloodPressureRecordProjection:
+        """Get the current user's newest reading, from the daily rollups when they are enabled."""
+        try:
+            if BP_ROLLUPS_ENABLED:
+                latest = await repository.get_latest_log(current_user.id)
+            else:
+                records, _ = await repository.list_logs(current_user.id, 1)
+                latest = records[0] if records else None
+            if latest is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No blood pressure logs found")
+            return BloodPressureRecordProjection(**latest)
+        except APIError as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e.message}")
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {str(e)}")
+
+    @staticmethod
+    async def create_blood_pressure_log(record: BloodPressureRecord, current_user: User) -> BloodPressureRecordResponse:
         """Create a new blood pressure log."""
         try:
-            record_data = record.model_dump()
-            record_data['user_id'] = str(current_user.id)
-            response = supabase.table("blood_pressure_records").insert(record_data).execute()
-            if not response.data:
+            created = await repository.create_log(current_user.id, record.model_dump())
+            if not created:
                 raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to create log: No data returned")
-            return BloodPressureRecordResponse(**response.data[0])
+            await run_in_threadpool(history_cache.apply_upserts, current_user.id, [created])
+            return BloodPressureRecordResponse(**created)
+        except DuplicateRecordError:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A blood pressure log already exists at this time.")
+        except APIError as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e.message}")
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {str(e)}")
+
+    @staticmethod
+    async def create_blood_pressure_logs(items: List[Dict[str, Any]], current_user: User) -> BloodPressureBatchResult:
+        """
+        Create many blood pressure logs in one request.
+
+        Every item is validated on its own, so one bad reading does not reject the
+        batch. Valid readings are inserted in bulk; readings whose record_datetime
+        the user already has (in the database or earlier in the batch) are
+        reported as duplicates rather than failing.
+        """
+        try:
+            if len(items) > MAX_BATCH_SIZE:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"A batch may contain at most {MAX_BATCH_SIZE} readings",
+                )
+
+            results: List[BloodPressureBatchItemResult] = []
+            pending: Dict[datetime, int] = {}
+            rows: List[Dict[str, Any]] = []
+            for index, item in enumerate(items):
+                try:
+                    record = BloodPressureRecord.model_validate(item)
+                except ValidationError as e:
+                    results.append(BloodPressureBatchItemResult(
+                        index=index, status="invalid", errors=e.errors(include_url=False, include_context=False, include_input=False),
+                    ))
+                    continue
+                key = _reading_key(record.record_datetime)
+                if key in pending:
+                    results.append(BloodPressureBatchItemResult(index=index, status="duplicate"))
+                    continue
+                pending[key] = index
+                rows.append(record.model_dump())
+
+            created = await repository.create_logs(current_user.id, rows) if rows else []
+            await run_in_threadpool(history_cache.apply_upserts, current_user.id, created)
+            created_ids = {
+                _reading_key(BloodPressureRecordResponse(**row).record_datetime): row["id"] for row in created
+            }
+            for key, index in pending.items():
+                if key in created_ids:
+                    results.append(BloodPressureBatchItemResult(index=index, status="created", id=created_ids[key]))
+                else:
+                    results.append(BloodPressureBatchItemResult(index=index, status="duplicate"))
+
+            results.sort(key=lambda result: result.index)
+            return BloodPressureBatchResult(
+                created=sum(result.status == "created" for result in results),
+                duplicates=sum(result.status == "duplicate" for result in results),
+                invalid=sum(result.status == "invalid" for result in results),
+                items=results,
+            )
         except APIError as e:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e.message}")
         except HTTPException:
@@ -49,19 +352,20 @@ class BloodPressureLogService:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {str(e)}")
     
     @staticmethod
-    def update_blood_pressure_log(log_id: int, record: BloodPressureRecordUpdate, current_user: User) -> BloodPressureRecordResponse:
+    async def update_blood_pressure_log(log_id: int, record: BloodPressureRecordUpdate, current_user: User) -> BloodPressureRecordResponse:
         """Update an existing blood pressure log."""
         try:
             update_data = record.model_dump(exclude_unset=True)
             if not update_data:
                 raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="No fields to update")
 
-            response = supabase.table("blood_pressure_records").update(update_data).eq("id", log_id).eq("user_id", current_user.id).execute()
+            updated = await repository.update_log(current_user.id, log_id, update_data)
             
-            if not response.data:
+            if not updated:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Log not found or no changes made")
-                
-            return BloodPressureRecordResponse(**response.data[0])
+
+            await run_in_threadpool(history_cache.apply_upserts, current_user.id, [updated])
+            return BloodPressureRecordResponse(**updated)
         except APIError as e:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e.message}")
         except HTTPException:
@@ -70,14 +374,15 @@ class BloodPressureLogService:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {str(e)}")
     
     @staticmethod
-    def delete_blood_pressure_log(log_id: int, current_user: User) -> None:
+    async def delete_blood_pressure_log(log_id: int, current_user: User) -> None:
         """Delete a blood pressure log."""
         try:
-            response = supabase.table("blood_pressure_records").delete().eq("id", log_id).eq("user_id", current_user.id).execute()
+            deleted = await repository.delete_log(current_user.id, log_id)
             
-            if not response.data:
+            if not deleted:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Log not found")
-                
+
+            await run_in_threadpool(history_cache.apply_delete, current_user.id, log_id)
         except APIError as e:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e.message}")
         except HTTPException:
@@ -86,25 +391,51 @@ class BloodPressureLogService:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {str(e)}")
     
     @staticmethod
-    def export_blood_pressure_logs(current_user: User) -> StreamingResponse:
-        """Export blood pressure logs to Excel file."""
+    async def export_blood_pressure_logs(current_user: User, format: str = "xlsx", if_none_match: Optional[str] = None) -> Response:
+        """
+        Export blood pressure logs as a file download.
+
+        Exports are identified by the user's data revision: a client that already
+        has the current one gets 304, and a file built earlier for the same
+        revision is served from the export cache. Otherwise records are read in
+        keyset chunks and written incrementally, so memory use does not grow with
+        the history, and the file is cached as it is sent. The first chunk is
+        read before the response starts, so database errors still produce an
+        error status.
+        """
         try:
-            response = supabase.table("blood_pressure_records").select("*").eq("user_id", current_user.id).order("record_datetime", desc=True).execute()
-            if not response.data:
-                # Return an empty Excel file if there's no data
-                output = io.BytesIO()
-                with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                    pd.DataFrame().to_excel(writer, index=False, sheet_name='Blood Pressure Logs')
-                output.seek(0)
-                return StreamingResponse(output, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", headers={"Content-Disposition": "attachment; filename=blood_pressure_logs.xlsx"})
-            
-            df = pd.DataFrame(response.data)
-            output = io.BytesIO()
-            with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-                df.to_excel(writer, index=False, sheet_name='Blood Pressure Logs')
-            
-            output.seek(0)
-            return StreamingResponse(output, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", headers={"Content-Disposition": "attachment; filename=blood_pressure_logs.xlsx"})
+            exporter = EXPORTERS.get(format)
+            if exporter is None:
+                detail = f"Export format '{format}' requires pyarrow, which is not installed" if format in ARROW_FORMATS else f"Unsupported export format: {format}"
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+            # Read the revision before the data: a file built from newer data than
+            # its revision says is harmless, the reverse would be served stale.
+            revision = await revision_repository.get(current_user.id, RESOURCE)
+            validators = validator_headers(revision, format)
+            if etag_matches(if_none_match, validators["ETag"]):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validators)
+            headers = {"Content-Disposition": f"attachment; filename={exporter.filename}", **validators}
+
+            cache_key = (str(current_user.id), revision.revision, format)
+            cached = export_cache.get(cache_key)
+            if cached is not None:
+                return FileResponse(cached, media_type=exporter.media_type, headers=headers)
+
+            chunks = repository.iter_logs(current_user.id, columns=EXPORT_COLUMNS)
+            first = await anext(chunks, None)
+
+            async def all_chunks():
+                if first is not None:
+                    yield first
+                    async for chunk in chunks:
+                        yield chunk
+
+            return StreamingResponse(
+                export_cache.store(cache_key, exporter.stream(all_chunks())),
+                media_type=exporter.media_type,
+                headers=headers,
+            )
         except APIError as e:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e.message}")
         except HTTPException:
@@ -0,0 +1,119 @@
+"""
+Blood Pressure Log module time-bucketed aggregation.
+
+Used when the data backend cannot aggregate in SQL (PostgREST): the readings of
+the window, or their daily rollups, are fetched once and grouped with pandas,
+matching the buckets that `date_trunc` produces in the user's local timezone
+(weeks start on Monday).
+"""
+
+from datetime import datetime, time, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+BUCKETS = ("day", "week", "month")
+METRICS = ("systolic", "diastolic", "heart_rate")
+
+# pandas period aliases equivalent to date_trunc('day' | 'week' | 'month').
+_PERIODS = {"day": "D", "week": "W-SUN", "month": "M"}
+
+
+def _is_utc_midnight(value: Optional[datetime]) -> bool:
+    if value is None:
+        return True
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.time() == time(0)
+
+
+def rollups_cover(tz: str, start: Optional[datetime] = None, end: Optional[datetime] = None) -> bool:
+    """
+    Whether a summary can be built from the UTC-day rollups without changing its result.
+
+    That holds when local days in `tz` are UTC days (checked in winter and
+    summer, to rule out DST zones) and the window starts and ends on UTC midnight.
+    """
+    zone = ZoneInfo(tz)
+    if any(zone.utcoffset(datetime(2024, month, 1)) != timedelta(0) for month in (1, 7)):
+        return False
+    return _is_utc_midnight(start) and _is_utc_midnight(end)
+
+
+def summarize_records(records: List[Dict[str, Any]], bucket: str, tz: str) -> List[Dict[str, Any]]:
+    """
+    Aggregate readings into per-bucket count, mean, min and max of each metric.
+
+    `records` need `record_datetime` and the metric columns. Buckets are returned
+    oldest first, each starting at local midnight in `tz`.
+    """
+    if not records:
+        return []
+    df = pd.DataFrame.from_records(records, columns=["record_datetime", *METRICS])
+    df["record_datetime"] = pd.to_datetime(df["record_datetime"], utc=True, format="ISO8601")
+    return summarize_frame(df, bucket, tz)
+
+
+def summarize_frame(df: pd.DataFrame, bucket: str, tz: str) -> List[Dict[str, Any]]:
+    """Like `summarize_records`, for a DataFrame whose `record_datetime` column is already UTC datetimes."""
+    if df.empty:
+        return []
+    df = df[["record_datetime", *METRICS]].copy()
+    local = df["record_datetime"].dt.tz_convert(tz)
+    # Periods are timezone-naive; drop the zone first so buckets follow local wall time.
+    df["bucket_start"] = local.dt.tz_localize(None).dt.to_period(_PERIODS[bucket]).dt.start_time
+
+    grouped = df.groupby("bucket_start", sort=True)[list(METRICS)]
+    stats = grouped.agg(["count", "mean", "min", "max"])
+    starts = stats.index.tz_localize(tz, ambiguous=False, nonexistent="shift_forward")
+
+    return [
+        {
+            "bucket_start": start.to_pydatetime(),
+            "count": int(row[("systolic", "count")]),
+            **{
+                metric: {
+                    "mean": float(row[(metric, "mean")]),
+                    "min": int(row[(metric, "min")]),
+                    "max": int(row[(metric, "max")]),
+                }
+                for metric in METRICS
+            },
+        }
+        for start, (_, row) in zip(starts, stats.iterrows())
+    ]
+
+
+def summarize_rollups(rows: List[Dict[str, Any]], bucket: str) -> List[Dict[str, Any]]:
+    """
+    Combine daily rollup rows into per-bucket statistics, oldest first.
+
+    Each row carries `day`, `record_count` and the `_sum`/`_min`/`_max` of every
+    metric; buckets start at UTC midnight.
+    """
+    if not rows:
+        return []
+    df = pd.DataFrame.from_records(rows)
+    df["bucket_start"] = pd.to_datetime(df["day"]).dt.to_period(_PERIODS[bucket]).dt.start_time
+
+    aggregations = {"record_count": "sum"}
+    for metric in METRICS:
+        aggregations.update({f"{metric}_sum": "sum", f"{metric}_min": "min", f"{metric}_max": "max"})
+    stats = df.groupby("bucket_start", sort=True).agg(aggregations)
+
+    return [
+        {
+            "bucket_start": start.to_pydatetime().replace(tzinfo=timezone.utc),
+            "count": int(row["record_count"]),
+            **{
+                metric: {
+                    "mean": float(row[f"{metric}_sum"] / row["record_count"]),
+                    "min": int(row[f"{metric}_min"]),
+                    "max": int(row[f"{metric}_max"]),
+                }
+                for metric in METRICS
+            },
+        }
+        for start, row in stats.iterrows()
+    ]
@@ -0,0 +1,8 @@
+"""
+Exports module for background export jobs.
+"""
+
+from .routes import router
+from .models import ExportJobCreate, ExportJobResponse
+
+__all__ = ["router", "ExportJobCreate", "ExportJobResponse"]
@@ -0,0 +1,356 @@
+"""
+Exports module job store and runner.
+
+The state of every job is a JSON sidecar next to its file, in a directory of
+the job's user: `<EXPORT_JOB_DIR>/<user key>/<id>.json`. Any API worker can
+therefore report, serve and cancel any job, and only ever reads the files of
+the user asking. Sidecars are replaced atomically, so they can be read at any
+time, and are only changed while holding an exclusive lock on the user
+directory's `.lock`, which serialises submitting, claiming, progress and
+cancelling across processes. The lock and the files are blocking I/O: call
+the store in the threadpool.
+
+Jobs are built apart from the API workers by the export worker, a process of
+its own (see `worker`), so builds never compete with interactive requests. It
+claims queued jobs, builds up to `workers` at once and saves their progress to
+the sidecar, which is also where it notices that a job was cancelled. It also
+deletes expired jobs; until then the store hides them.
+"""
+
+import asyncio
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, AsyncGenerator, Callable, Dict, Iterator, List, Optional, Set
+
+from fastapi.concurrency import run_in_threadpool
+
+from ...config import EXPORT_JOB_DIR, EXPORT_JOB_MAX_PER_USER, EXPORT_JOB_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# Job ids are uuid4 hex strings; anything else never names a sidecar.
+JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+
+class TooManyJobsError(Exception):
+    """Raised when a user already has the maximum number of active jobs."""
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+@dataclass
+class ExportJob:
+    """State of one export job."""
+    id: str
+    user_id: str
+    format: str
+    status: str = "queued"
+    rows_written: int = 0
+    total_rows: Optional[int] = None
+    error: Optional[str] = None
+    path: Optional[str] = None
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[float] = None
+
+    @property
+    def progress(self) -> float:
+        if self.status == "completed":
+            return 1.0
+        if not self.total_rows:
+            return 0.0
+        return min(self.rows_written / self.total_rows, 1.0)
+
+    def to_json(self) -> Dict[str, Any]:
+        state = asdict(self)
+        for name in ("created_at", "finished_at"):
+            if state[name] is not None:
+                state[name] = state[name].isoformat()
+        return state
+
+    @classmethod
+    def from_json(cls, state: Dict[str, Any]) -> "ExportJob":
+        for name in ("created_at", "finished_at"):
+            if state[name] is not None:
+                state[name] = datetime.fromisoformat(state[name])
+        return cls(**state)
+
+
+# Builds the file of a job: an async stream of bytes that updates the job's counters.
+JobBuilder = Callable[[ExportJob], AsyncGenerator[bytes, None]]
+
+
+class ExportJobStore:
+    """Queue, look up, cancel and expire export jobs kept as sidecar files, one directory per user."""
+
+    def __init__(self, directory: str, max_per_user: int, ttl_seconds: float, clock=time.time):
+        self.directory = directory
+        self.max_per_user = max_per_user
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+
+    def submit(self, user_id: str, export_format: str) -> ExportJob:
+        """
+        Queue a job for the export worker and return it.
+
+        Raises:
+            TooManyJobsError: If the user already has `max_per_user` queued or running jobs.
+        """
+        directory = self._user_directory(user_id)
+        with self._lock(directory):
+            active = sum(1 for job in self._jobs(directory) if job.status in ACTIVE_STATUSES)
+            if active >= self.max_per_user:
+                raise TooManyJobsError(f"At most {self.max_per_user} exports may run at once")
+            job = ExportJob(id=uuid.uuid4().hex, user_id=user_id, format=export_format)
+            self._write(directory, job)
+        return job
+
+    def get(self, user_id: str, job_id: str) -> Optional[ExportJob]:
+        """Return the user's job, or None if it does not exist, belongs to someone else or expired."""
+        job = self._read(self._user_directory(user_id), job_id)
+        return job if job is not None and job.user_id == user_id and not self._expired(job) else None
+
+    def list(self, user_id: str) -> List[ExportJob]:
+        """Return the user's jobs, newest first."""
+        jobs = (job for job in self._jobs(self._user_directory(user_id)) if job.user_id == user_id and not self._expired(job))
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, job: ExportJob) -> None:
+        """Stop a queued or running job; a finished job is deleted with its file."""
+        directory = self._user_directory(job.user_id)
+        with self._lock(directory):
+            current = self._read(directory, job.id)
+            if current is None:
+                return
+            if current.status in ACTIVE_STATUSES:
+                # The worker sees the status at its next progress update and stops.
+                self._finish(current, "cancelled")
+                self._write(directory, current)
+            else:
+                self._discard(directory, current)
+
+    def expire(self) -> None:
+        """Delete finished jobs of every user, and their files, whose time is up; run by the export worker."""
+        for directory in self._user_directories():
+            if any(self._expired(job) for job in self._jobs(directory)):
+                with self._lock(directory):
+                    for job in self._jobs(directory):
+                        if self._expired(job):
+                            self._discard(directory, job)
+
+    def claim(self) -> Optional[ExportJob]:
+        """Mark the oldest queued job of any user running and return it, or None if none is queued."""
+        queued = [job for directory in self._user_directories() for job in self._jobs(directory) if job.status == "queued"]
+        for job in sorted(queued, key=lambda job: job.created_at):
+            directory = self._user_directory(job.user_id)
+            with self._lock(directory):
+                # It may have been cancelled since it was listed.
+                current = self._read(directory, job.id)
+                if current is not None and current.status == "queued":
+                    current.status = "running"
+                    self._write(directory, current)
+                    return current
+        return None
+
+    def save_progress(self, job: ExportJob) -> bool:
+        """Save the counters of a running job; False if it has been cancelled or deleted meanwhile."""
+        directory = self._user_directory(job.user_id)
+        with self._lock(directory):
+            current = self._read(directory, job.id)
+            if current is None or current.status != "running":
+                return False
+            self._write(directory, job)
+        return True
+
+    def finish(self, job: ExportJob, status: str) -> bool:
+        """Record the outcome of a running job; False if it has been cancelled or deleted meanwhile."""
+        directory = self._user_directory(job.user_id)
+        with self._lock(directory):
+            current = self._read(directory, job.id)
+            if current is None or current.status != "running":
+                return False
+            self._finish(job, status)
+            self._write(directory, job)
+        return True
+
+    def requeue_running(self) -> None:
+        """Queue again the jobs a stopped worker left running, dropping their partial files."""
+        for directory in self._user_directories():
+            with self._lock(directory):
+                for job in self._jobs(directory):
+                    if job.status == "running":
+                        _remove_file(self.partial_path(job))
+                        job.status, job.rows_written, job.total_rows = "queued", 0, None
+                        self._write(directory, job)
+
+    def file_path(self, job: ExportJob) -> str:
+        return os.path.join(self._user_directory(job.user_id), f"{job.id}.{job.format}")
+
+    def partial_path(self, job: ExportJob) -> str:
+        return os.path.join(self._user_directory(job.user_id), f"{job.id}.part")
+
+    def _user_directory(self, user_id: str) -> str:
+        # User ids are hashed so that no id, whatever it holds, can name a path outside the directory.
+        return os.path.join(self.directory, hashlib.sha256(user_id.encode()).hexdigest())
+
+    def _user_directories(self) -> List[str]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.directory, name) for name in names if os.path.isdir(os.path.join(self.directory, name))]
+
+    @contextmanager
+    def _lock(self, directory: str) -> Iterator[None]:
+        os.makedirs(directory, exist_ok=True)
+        descriptor = os.open(os.path.join(directory, ".lock"), os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(descriptor, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(descriptor)
+
+    def _expired(self, job: ExportJob) -> bool:
+        return job.expires_at is not None and job.expires_at <= self._clock()
+
+    @staticmethod
+    def _sidecar(directory: str, job_id: str) -> str:
+        return os.path.join(directory, f"{job_id}.json")
+
+    def _read(self, directory: str, job_id: str) -> Optional[ExportJob]:
+        if not JOB_ID.fullmatch(job_id):
+            return None
+        path = self._sidecar(directory, job_id)
+        try:
+            with open(path, encoding="utf-8") as sidecar:
+                return ExportJob.from_json(json.load(sidecar))
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, TypeError):
+            # A truncated or foreign file must not break every request of the user.
+            logger.warning("Skipping unreadable export job file %s", path, exc_info=True)
+            return None
+
+    def _jobs(self, directory: str) -> List[ExportJob]:
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return []
+        jobs = (self._read(directory, name[:-len(".json")]) for name in names if name.endswith(".json"))
+        # A job may be deleted between listing and reading it.
+        return [job for job in jobs if job is not None]
+
+    def _write(self, directory: str, job: ExportJob) -> None:
+        # Written aside and renamed over the sidecar, so readers never see half a file.
+        sidecar = self._sidecar(directory, job.id)
+        with open(f"{sidecar}.tmp", "w", encoding="utf-8") as output:
+            json.dump(job.to_json(), output)
+        os.replace(f"{sidecar}.tmp", sidecar)
+
+    def _finish(self, job: ExportJob, status: str) -> None:
+        job.status = status
+        job.finished_at = datetime.now(timezone.utc)
+        job.expires_at = self._clock() + self.ttl_seconds
+
+    def _discard(self, directory: str, job: ExportJob) -> None:
+        _remove_file(self._sidecar(directory, job.id))
+        if job.path:
+            _remove_file(job.path)
+
+
+class ExportJobRunner:
+    """Build the queued jobs of a store, at most `workers` at once; runs in the export worker."""
+
+    def __init__(self, store: ExportJobStore, build: JobBuilder, workers: int, poll_seconds: float):
+        self.store = store
+        self.build = build
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self._running: Set[asyncio.Task] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_pending(self) -> List[asyncio.Task]:
+        """Start building queued jobs while a worker slot is free; returns the started tasks."""
+        started = []
+        while len(self._running) < self.workers:
+            job = await run_in_threadpool(self.store.claim)
+            if job is None:
+                break
+            task = asyncio.create_task(self._run(job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+            started.append(task)
+        return started
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await run_in_threadpool(self.store.expire)
+                await self.run_pending()
+            except Exception:
+                logger.exception("Polling export jobs failed")
+            await asyncio.sleep(self.poll_seconds)
+
+    async def start(self) -> None:
+        """Requeue jobs left running by an earlier worker and poll for queued jobs in the background."""
+        if self._task is None:
+            await run_in_threadpool(self.store.requeue_running)
+            self._task = asyncio.create_task(self._loop())
+
+    async def close(self) -> None:
+        """Stop polling and cancel running builds; they are queued again by the next `start`."""
+        tasks = [task for task in (self._task, *self._running) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    async def _run(self, job: ExportJob) -> None:
+        partial = self.store.partial_path(job)
+        saved_at = time.monotonic()
+        stream = self.build(job)
+        try:
+            with open(partial, "wb") as output:
+                async for block in stream:
+                    await run_in_threadpool(output.write, block)
+                    if time.monotonic() - saved_at >= self.poll_seconds:
+                        saved_at = time.monotonic()
+                        if not await run_in_threadpool(self.store.save_progress, job):
+                            _remove_file(partial)
+                            return
+            job.path = self.store.file_path(job)
+            os.replace(partial, job.path)
+            if not await run_in_threadpool(self.store.finish, job, "completed"):
+                _remove_file(job.path)
+        except asyncio.CancelledError:
+            _remove_file(partial)
+            raise
+        except Exception as e:
+            _remove_file(partial)
+            job.error = str(e)
+            await run_in_threadpool(self.store.finish, job, "failed")
+        finally:
+            await stream.aclose()
+
+
+export_jobs = ExportJobStore(
+    directory=EXPORT_JOB_DIR,
+    max_per_user=EXPORT_JOB_MAX_PER_USER,
+    ttl_seconds=EXPORT_JOB_TTL_SECONDS,
+)
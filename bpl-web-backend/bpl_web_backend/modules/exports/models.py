@@ -0,0 +1,28 @@
+"""
+Exports module models for background export jobs.
+"""
+
+from pydantic import BaseModel
+from typing import Literal, Optional
+from datetime import datetime
+
+ExportFormat = Literal["xlsx", "csv", "ndjson", "parquet", "arrow"]
+
+
+class ExportJobCreate(BaseModel):
+    """Request to export the current user's blood pressure logs in the background."""
+    format: ExportFormat = "xlsx"
+
+
+class ExportJobResponse(BaseModel):
+    """State of an export job."""
+    id: str
+    format: ExportFormat
+    status: Literal["queued", "running", "completed", "failed", "cancelled"]
+    progress: float
+    rows_written: int
+    total_rows: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    download_url: Optional[str] = None
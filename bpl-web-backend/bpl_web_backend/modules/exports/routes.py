@@ -0,0 +1,43 @@
+"""
+Exports module routes for API endpoints.
+"""
+
+from fastapi import APIRouter, Depends, status
+from gotrue.types import User
+from typing import List
+
+from ...dependencies import get_current_user
+from .models import ExportJobCreate, ExportJobResponse
+from .services import ExportService
+
+router = APIRouter(prefix="/api", tags=["Exports"])
+
+
+@router.post("/exports", response_model=ExportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_export_job(request: ExportJobCreate, current_user: User = Depends(get_current_user)):
+    """Queue a background export of the current user's blood pressure logs."""
+    return await ExportService.create_export_job(request, current_user)
+
+
+@router.get("/exports", response_model=List[ExportJobResponse])
+async def list_export_jobs(current_user: User = Depends(get_current_user)):
+    """List the current user's export jobs."""
+    return await ExportService.list_export_jobs(current_user)
+
+
+@router.get("/exports/{job_id}", response_model=ExportJobResponse)
+async def get_export_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """Get the status and progress of an export job."""
+    return await ExportService.get_export_job(job_id, current_user)
+
+
+@router.get("/exports/{job_id}/download")
+async def download_export(job_id: str, current_user: User = Depends(get_current_user)):
+    """Download the file of a completed export job."""
+    return await ExportService.download_export(job_id, current_user)
+
+
+@router.delete("/exports/{job_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_export_job(job_id: str, current_user: User = Depends(get_current_user)):
+    """Cancel an export job, or delete a finished one and its file."""
+    await ExportService.cancel_export_job(job_id, current_user)
@@ -0,0 +1,95 @@
+"""
+Exports module services for business logic.
+"""
+
+from typing import AsyncIterator, List
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from gotrue.types import User
+from postgrest.exceptions import APIError
+
+from ..blood_pressure_log.export import ARROW_FORMATS, EXPORT_COLUMNS, EXPORTERS
+from ..blood_pressure_log.repository import repository
+from .jobs import ExportJob, TooManyJobsError, export_jobs
+from .models import ExportJobCreate, ExportJobResponse
+
+
+class ExportService:
+    """Service class for background export jobs."""
+
+    @staticmethod
+    def _to_response(job: ExportJob) -> ExportJobResponse:
+        return ExportJobResponse(
+            id=job.id,
+            format=job.format,
+            status=job.status,
+            progress=job.progress,
+            rows_written=job.rows_written,
+            total_rows=job.total_rows,
+            error=job.error,
+            created_at=job.created_at,
+            finished_at=job.finished_at,
+            download_url=f"/api/exports/{job.id}/download" if job.status == "completed" else None,
+        )
+
+    @staticmethod
+    async def _get_job(job_id: str, current_user: User) -> ExportJob:
+        job = await run_in_threadpool(export_jobs.get, str(current_user.id), job_id)
+        if job is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Export job not found")
+        return job
+
+    @staticmethod
+    async def create_export_job(request: ExportJobCreate, current_user: User) -> ExportJobResponse:
+        """Queue an export of the current user's blood pressure logs."""
+        exporter = EXPORTERS.get(request.format)
+        if exporter is None:
+            detail = f"Export format '{request.format}' requires pyarrow, which is not installed" if request.format in ARROW_FORMATS else f"Unsupported export format: {request.format}"
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+        try:
+            job = await run_in_threadpool(export_jobs.submit, str(current_user.id), request.format)
+        except TooManyJobsError as e:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
+        return ExportService._to_response(job)
+
+    @staticmethod
+    async def build_export(job: ExportJob) -> AsyncIterator[bytes]:
+        """Stream the file of a job, counting the rows written into it; run by the export worker."""
+        async def counted_chunks():
+            async for chunk in repository.iter_logs(job.user_id, columns=EXPORT_COLUMNS):
+                yield chunk
+                job.rows_written += len(chunk)
+
+        try:
+            _, job.total_rows = await repository.list_logs(job.user_id, 1, include_count=True)
+            async for block in EXPORTERS[job.format].stream(counted_chunks()):
+                yield block
+        except APIError as e:
+            # Reported as the job's error message.
+            raise RuntimeError(f"Database error: {e.message}") from e
+
+    @staticmethod
+    async def list_export_jobs(current_user: User) -> List[ExportJobResponse]:
+        """List the current user's export jobs, newest first."""
+        return [ExportService._to_response(job) for job in await run_in_threadpool(export_jobs.list, str(current_user.id))]
+
+    @staticmethod
+    async def get_export_job(job_id: str, current_user: User) -> ExportJobResponse:
+        """Get the state and progress of an export job."""
+        return ExportService._to_response(await ExportService._get_job(job_id, current_user))
+
+    @staticmethod
+    async def download_export(job_id: str, current_user: User) -> FileResponse:
+        """Serve the file of a completed export job."""
+        job = await ExportService._get_job(job_id, current_user)
+        if job.status != "completed":
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Export job is {job.status}")
+        exporter = EXPORTERS[job.format]
+        return FileResponse(job.path, media_type=exporter.media_type, filename=exporter.filename)
+
+    @staticmethod
+    async def cancel_export_job(job_id: str, current_user: User) -> None:
+        """Cancel a queued or running job, or delete a finished one."""
+        await run_in_threadpool(export_jobs.cancel, await ExportService._get_job(job_id, current_user))
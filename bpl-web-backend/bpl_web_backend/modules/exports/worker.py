@@ -0,0 +1,51 @@
+"""
+Exports module worker process.
+
+Export files are built by a process of its own, apart from the API workers,
+so builds never compete with requests for their event loop or threadpool:
+
+    python -m bpl_web_backend.modules.exports.worker
+
+Run exactly one, with the same EXPORT_JOB_DIR as the API workers: it picks up
+the jobs they queue (see `ExportJobStore`), deletes expired jobs and, at
+startup, queues again the jobs it left running when it last stopped.
+"""
+
+import asyncio
+import signal
+
+from ...config import DATA_BACKEND, EXPORT_JOB_POLL_SECONDS, EXPORT_JOB_WORKERS
+from ...database import async_supabase, pg_pool
+from .jobs import ExportJobRunner, export_jobs
+from .services import ExportService
+
+export_runner = ExportJobRunner(
+    export_jobs,
+    ExportService.build_export,
+    workers=EXPORT_JOB_WORKERS,
+    poll_seconds=EXPORT_JOB_POLL_SECONDS,
+)
+
+
+async def serve() -> None:
+    """Build export jobs until SIGINT or SIGTERM."""
+    database = pg_pool if DATA_BACKEND == "postgres" else async_supabase
+    await database.open()
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopped.set)
+    await export_runner.start()
+    try:
+        await stopped.wait()
+    finally:
+        await export_runner.close()
+        await database.close()
+
+
+def main() -> None:
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,9 @@
 Medications module models for medication management.
 """
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, TypeAdapter
 from typing import Optional, List
+from datetime import datetime
 
 
 class Medication(BaseModel):
@@ -29,3 +30,37 @@ class MedicationUpdate(BaseModel):
 class MedicationResponse(Medication):
     """Medication response model with ID."""
     id: int
+
+
+# The medication list is validated and serialized in one pass (see serialization.py).
+MEDICATION_LIST = TypeAdapter(List[MedicationResponse])
+
+
+class MedicationPeriod(BaseModel):
+    """One version of a medication and the time it was active; `valid_to` is None while current."""
+    medication_id: int
+    medicine_name: str
+    dosage_mg: Optional[int] = None
+    intake_time: List[str]
+    valid_from: datetime
+    valid_to: Optional[datetime] = None
+
+
+MEDICATION_PERIOD_LIST = TypeAdapter(List[MedicationPeriod])
+
+# Largest number of timestamps looked up in one request.
+MAX_ACTIVE_AT_TIMESTAMPS = 10000
+
+
+class ActiveMedicationsQuery(BaseModel):
+    """Timestamps to look up the active medications of, e.g. those of blood pressure readings."""
+    timestamps: List[datetime] = Field(..., max_length=MAX_ACTIVE_AT_TIMESTAMPS)
+
+
+class ActiveMedications(BaseModel):
+    """
+    Medications active at each timestamp: `active[i]` lists indices into
+    `periods` for `timestamps[i]`, so each period is sent once.
+    """
+    periods: List[MedicationPeriod]
+    active: List[List[int]]
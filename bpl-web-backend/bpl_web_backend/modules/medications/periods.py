@@ -0,0 +1,126 @@
+"""
+Medications module sorted-interval index of medication periods.
+
+A user's periods (see `medication_periods` in schema.sql) split the time line
+at every `valid_from` and `valid_to` into elementary segments within which the
+set of active periods does not change. One sweep over the sorted boundaries
+records each segment's active set; the periods active at any number of
+timestamps are then found with a single vectorized `searchsorted` of the
+timestamps into the boundaries, with no scan of the periods per timestamp.
+
+`medication_changes` turns the same periods into the starts, stops and dose
+changes of each medication.
+"""
+
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# End of periods that are still open.
+OPEN = np.iinfo(np.int64).max
+
+CHANGES = ("start", "dose_change", "stop")
+
+CHANGE_COLUMNS = ("at", "medication_id", "medicine_name", "change", "dosage_before", "dosage_after")
+
+
+def microseconds(values: Iterable[Any]) -> np.ndarray:
+    """Timestamps (ISO strings or datetimes, naive ones UTC) as int64 microseconds since the epoch."""
+    times = pd.to_datetime(pd.Series(list(values), dtype=object), utc=True, format="ISO8601")
+    return times.to_numpy(dtype="datetime64[us]").view(np.int64)
+
+
+def bounds(periods: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """`valid_from` and `valid_to` of the periods in µs, with `OPEN` for open periods."""
+    starts = microseconds(period["valid_from"] for period in periods)
+    ends = [period["valid_to"] for period in periods]
+    closed = np.array([end is not None for end in ends], dtype=bool)
+    end_times = np.full(len(periods), OPEN, dtype=np.int64)
+    if closed.any():
+        end_times[closed] = microseconds(end for end in ends if end is not None)
+    return starts, end_times
+
+
+class PeriodIndex:
+    """The periods of one user, answering "which were active at t" for many t at once."""
+
+    def __init__(self, periods: List[Dict[str, Any]]):
+        self.periods = periods
+        self.starts, self.ends = bounds(periods)
+
+        # Sweep the boundaries in order; ends sort before starts at the same
+        # instant, as periods are half-open. Empty periods are never active.
+        spans = [(index, start, end) for index, (start, end) in enumerate(zip(self.starts.tolist(), self.ends.tolist())) if start < end]
+        events = sorted(
+            [(start, 1, index) for index, start, _ in spans]
+            + [(end, 0, index) for index, _, end in spans if end != OPEN]
+        )
+        boundaries: List[int] = []
+        segments: List[Tuple[int, ...]] = []
+        active: Dict[int, None] = {}
+        for position, (instant, opens, index) in enumerate(events):
+            if opens:
+                active[index] = None
+            else:
+                active.pop(index, None)
+            if position + 1 == len(events) or events[position + 1][0] != instant:
+                boundaries.append(instant)
+                segments.append(tuple(sorted(active)))
+        self.boundaries = np.array(boundaries, dtype=np.int64)
+        # segments[i] holds from boundaries[i] to boundaries[i + 1]; the last
+        # one lasts forever and the time before the first boundary has none.
+        self.segments: List[Tuple[int, ...]] = [()] + segments
+
+    def __len__(self) -> int:
+        return len(self.periods)
+
+    def segment_at(self, times: np.ndarray) -> np.ndarray:
+        """Index into `segments` of each of the µs `times`, in any order."""
+        return np.searchsorted(self.boundaries, times, side="right")
+
+    def active_at(self, times: np.ndarray) -> List[Tuple[int, ...]]:
+        """Indices into `periods` of the periods active at each of the µs `times`."""
+        return [self.segments[segment] for segment in self.segment_at(times).tolist()]
+
+
+def medication_changes(periods: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """
+    The starts, stops and dose changes in a user's periods, ordered by time and medication.
+
+    A version that begins where the previous version of the same medication
+    ends continues it: it is a dose change if the dose differs and no change
+    otherwise (e.g. new intake times). Any other beginning is a start and an
+    end not followed by another version is a stop. Returns `CHANGE_COLUMNS` as
+    parallel arrays, `at` in µs and doses as objects with None when missing.
+    """
+    starts, ends = bounds(periods)
+    medication_ids = np.fromiter((period["medication_id"] for period in periods), dtype=np.int64, count=len(periods))
+    names = np.array([period["medicine_name"] for period in periods], dtype=object)
+    doses = np.array([period.get("dosage_mg") for period in periods], dtype=object)
+
+    # Versions of each medication in order; empty periods never happened.
+    order = np.lexsort((starts, medication_ids))
+    order = order[starts[order] < ends[order]]
+    medication_ids, names, doses, starts, ends = (column[order] for column in (medication_ids, names, doses, starts, ends))
+
+    continues = np.zeros(len(order), dtype=bool)
+    continues[1:] = (medication_ids[1:] == medication_ids[:-1]) & (starts[1:] == ends[:-1])
+    continued = np.append(continues[1:], False)
+    previous_doses = np.concatenate(([None], doses[:-1])) if len(order) else doses
+    dose_changed = np.array([dose != previous for dose, previous in zip(doses.tolist(), previous_doses.tolist())], dtype=bool)
+
+    opened = ~continues
+    changed = continues & dose_changed
+    stopped = ~continued & (ends != OPEN)
+    nothing = np.full(len(order), None, dtype=object)
+    columns = {
+        "at": np.concatenate((starts[opened], starts[changed], ends[stopped])),
+        "medication_id": np.concatenate((medication_ids[opened], medication_ids[changed], medication_ids[stopped])),
+        "medicine_name": np.concatenate((names[opened], names[changed], names[stopped])),
+        "change": np.repeat(np.array(CHANGES, dtype=object), [opened.sum(), changed.sum(), stopped.sum()]),
+        "dosage_before": np.concatenate((nothing[opened], previous_doses[changed], doses[stopped])),
+        "dosage_after": np.concatenate((doses[opened], doses[changed], nothing[stopped])),
+    }
+    order = np.lexsort((columns["medication_id"], columns["at"]))
+    return {name: column[order] for name, column in columns.items()}
@@ -0,0 +1,227 @@
+"""
+Medications module repository for data access.
+"""
+
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from ...config import DATA_BACKEND
+from ...database import async_supabase, pg_pool
+from ...repository import quote_ident, record_to_dict
+
+TABLE = "medications"
+
+# Versions of each medication with the time range they were active (see schema.sql).
+PERIODS_TABLE = "medication_periods"
+
+# Rows per request when reading the active medications of all users.
+FETCH_CHUNK_SIZE = 1000
+
+# Columns the dose scheduler needs.
+SCHEDULE_COLUMNS = ("id", "user_id", "intake_time")
+
+# Columns read to apply changed medications to the dose scheduler.
+FEED_COLUMNS = (*SCHEDULE_COLUMNS, "is_active")
+
+# Deleted rows of all tables, with the revision and time of the deletion (see schema.sql).
+TOMBSTONES_TABLE = "sync_tombstones"
+
+
+class MedicationRepository(ABC):
+    """Data access for medications."""
+
+    @abstractmethod
+    async def list_medications(self, user_id: str) -> List[Dict[str, Any]]:
+        """Return all of the user's medications."""
+
+    @abstractmethod
+    async def get_medication(self, user_id: str, medication_id: int) -> Optional[Dict[str, Any]]:
+        """Return the user's medication, or None if the user has no medication with that id."""
+
+    @abstractmethod
+    async def create_medication(self, user_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Insert a medication and return it."""
+
+    @abstractmethod
+    async def update_medication(self, user_id: str, medication_id: int, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Update a medication and return it, or None if the user has no such medication."""
+
+    @abstractmethod
+    async def delete_medication(self, user_id: str, medication_id: int) -> bool:
+        """Delete a medication; return False if the user has no such medication."""
+
+    @abstractmethod
+    async def list_periods(self, user_id: str) -> List[Dict[str, Any]]:
+        """Return all of the user's medication periods, oldest first."""
+
+    @abstractmethod
+    async def list_active_medications(self, after_id: int, limit: int) -> List[Dict[str, Any]]:
+        """Return up to `limit` active medications of all users with ids above `after_id`, by id."""
+
+    @abstractmethod
+    async def list_changed_medications(self, since: datetime, offset: int, limit: int) -> List[Dict[str, Any]]:
+        """Return up to `limit` medications of all users updated at or after `since`, by `updated_at`, from `offset`."""
+
+    @abstractmethod
+    async def list_deleted_medications(self, since: datetime, offset: int, limit: int) -> List[int]:
+        """Return up to `limit` ids of medications of all users deleted at or after `since`, from `offset`."""
+
+    async def iter_active_medications(self, chunk_size: int = FETCH_CHUNK_SIZE) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield the `SCHEDULE_COLUMNS` of every user's active medications, one keyset page at a time."""
+        after_id = 0
+        while True:
+            chunk = await self.list_active_medications(after_id, chunk_size)
+            if chunk:
+                yield chunk
+            if len(chunk) < chunk_size:
+                return
+            after_id = chunk[-1]["id"]
+
+    async def iter_changes(self, since: datetime, chunk_size: int = FETCH_CHUNK_SIZE) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield the `FEED_COLUMNS` of medications changed at or after `since`, one page at a time."""
+        offset = 0
+        while True:
+            chunk = await self.list_changed_medications(since, offset, chunk_size)
+            if chunk:
+                yield chunk
+            if len(chunk) < chunk_size:
+                return
+            offset += len(chunk)
+
+    async def iter_deletions(self, since: datetime, chunk_size: int = FETCH_CHUNK_SIZE) -> AsyncIterator[List[int]]:
+        """Yield the ids of medications deleted at or after `since`, one page at a time."""
+        offset = 0
+        while True:
+            chunk = await self.list_deleted_medications(since, offset, chunk_size)
+            if chunk:
+                yield chunk
+            if len(chunk) < chunk_size:
+                return
+            offset += len(chunk)
+
+
+class SupabaseMedicationRepository(MedicationRepository):
+    """Medications through PostgREST."""
+
+    async def list_medications(self, user_id):
+        response = await async_supabase.table(TABLE).select("*").eq("user_id", user_id).execute()
+        return response.data
+
+    async def get_medication(self, user_id, medication_id):
+        response = await async_supabase.table(TABLE).select("*").eq("id", medication_id).eq("user_id", user_id).execute()
+        return response.data[0] if response.data else None
+
+    async def create_medication(self, user_id, data):
+        response = await async_supabase.table(TABLE).insert({**data, "user_id": str(user_id)}).execute()
+        return response.data[0] if response.data else None
+
+    async def update_medication(self, user_id, medication_id, data):
+        response = await async_supabase.table(TABLE).update(data).eq("id", medication_id).eq("user_id", user_id).execute()
+        return response.data[0] if response.data else None
+
+    async def delete_medication(self, user_id, medication_id):
+        response = await async_supabase.table(TABLE).delete().eq("id", medication_id).eq("user_id", user_id).execute()
+        return bool(response.data)
+
+    async def list_periods(self, user_id):
+        rows: List[Dict[str, Any]] = []
+        while True:
+            response = await async_supabase.table(PERIODS_TABLE).select("*").eq("user_id", user_id).order("valid_from").order(
+                "id"
+            ).range(len(rows), len(rows) + FETCH_CHUNK_SIZE - 1).execute()
+            rows.extend(response.data)
+            if len(response.data) < FETCH_CHUNK_SIZE:
+                return rows
+
+    async def list_active_medications(self, after_id, limit):
+        response = await async_supabase.table(TABLE).select(",".join(SCHEDULE_COLUMNS)).eq("is_active", True).gt(
+            "id", after_id
+        ).order("id").limit(limit).execute()
+        return response.data
+
+    async def list_changed_medications(self, since, offset, limit):
+        response = await async_supabase.table(TABLE).select(",".join(FEED_COLUMNS)).gte("updated_at", since.isoformat()).order(
+            "updated_at"
+        ).order("id").range(offset, offset + limit - 1).execute()
+        return response.data
+
+    async def list_deleted_medications(self, since, offset, limit):
+        response = await async_supabase.table(TOMBSTONES_TABLE).select("record_id").eq("resource", TABLE).gte(
+            "deleted_at", since.isoformat()
+        ).order("deleted_at").order("user_id").order("revision").range(offset, offset + limit - 1).execute()
+        return [int(row["record_id"]) for row in response.data]
+
+
+class PostgresMedicationRepository(MedicationRepository):
+    """Medications on the direct Postgres pool."""
+
+    async def list_medications(self, user_id):
+        async with pg_pool.transaction(user_id) as conn:
+            rows = await conn.fetch(f"SELECT * FROM {TABLE} WHERE user_id = $1", user_id)
+        return [record_to_dict(row) for row in rows]
+
+    async def get_medication(self, user_id, medication_id):
+        async with pg_pool.transaction(user_id) as conn:
+            row = await conn.fetchrow(f"SELECT * FROM {TABLE} WHERE id = $1 AND user_id = $2", medication_id, user_id)
+        return record_to_dict(row) if row else None
+
+    async def create_medication(self, user_id, data):
+        columns = list(data)
+        placeholders = ", ".join(f"${i}" for i in range(2, len(columns) + 2))
+        sql = f"INSERT INTO {TABLE} (user_id, {', '.join(map(quote_ident, columns))}) VALUES ($1, {placeholders}) RETURNING *"
+        async with pg_pool.transaction(user_id) as conn:
+            row = await conn.fetchrow(sql, user_id, *data.values())
+        return record_to_dict(row) if row else None
+
+    async def update_medication(self, user_id, medication_id, data):
+        assignments = ", ".join(f"{quote_ident(column)} = ${i}" for i, column in enumerate(data, start=3))
+        sql = f"UPDATE {TABLE} SET {assignments} WHERE id = $1 AND user_id = $2 RETURNING *"
+        async with pg_pool.transaction(user_id) as conn:
+            row = await conn.fetchrow(sql, medication_id, user_id, *data.values())
+        return record_to_dict(row) if row else None
+
+    async def delete_medication(self, user_id, medication_id):
+        async with pg_pool.transaction(user_id) as conn:
+            row = await conn.fetchrow(f"DELETE FROM {TABLE} WHERE id = $1 AND user_id = $2 RETURNING id", medication_id, user_id)
+        return row is not None
+
+    async def list_periods(self, user_id):
+        async with pg_pool.transaction(user_id) as conn:
+            rows = await conn.fetch(f"SELECT * FROM {PERIODS_TABLE} WHERE user_id = $1 ORDER BY valid_from, id", user_id)
+        return [record_to_dict(row) for row in rows]
+
+    async def list_active_medications(self, after_id, limit):
+        sql = f"SELECT {', '.join(SCHEDULE_COLUMNS)} FROM {TABLE} WHERE is_active AND id > $1 ORDER BY id LIMIT $2"
+        # No user context: the scheduler reads the medications of all users.
+        async with pg_pool.transaction(None) as conn:
+            rows = await conn.fetch(sql, after_id, limit)
+        return [record_to_dict(row) for row in rows]
+
+    async def list_changed_medications(self, since, offset, limit):
+        sql = (
+            f"SELECT {', '.join(FEED_COLUMNS)} FROM {TABLE} WHERE updated_at >= $1 "
+            f"ORDER BY updated_at, id OFFSET $2 LIMIT $3"
+        )
+        async with pg_pool.transaction(None) as conn:
+            rows = await conn.fetch(sql, since, offset, limit)
+        return [record_to_dict(row) for row in rows]
+
+    async def list_deleted_medications(self, since, offset, limit):
+        sql = (
+            f"SELECT record_id FROM {TOMBSTONES_TABLE} WHERE resource = $1 AND deleted_at >= $2 "
+            f"ORDER BY deleted_at, user_id, revision OFFSET $3 LIMIT $4"
+        )
+        async with pg_pool.transaction(None) as conn:
+            rows = await conn.fetch(sql, TABLE, since, offset, limit)
+        return [int(row["record_id"]) for row in rows]
+
+
+def create_repository() -> MedicationRepository:
+    """Return the repository for the configured data backend."""
+    if DATA_BACKEND == "postgres":
+        return PostgresMedicationRepository()
+    return SupabaseMedicationRepository()
+
+
+repository = create_repository()
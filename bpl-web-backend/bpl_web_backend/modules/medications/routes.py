@@ -7,31 +7,48 @@ from gotrue.types import User
 from typing import List
 
 from ...dependencies import get_current_user
-from .models import Medication, MedicationUpdate, MedicationResponse
+from ...revisions import ConditionalRequest
+from ...serialization import json_response
+from .models import MEDICATION_LIST, ActiveMedications, ActiveMedicationsQuery, Medication, MedicationPeriod, MedicationUpdate, MedicationResponse
 from .services import MedicationService
 
 router = APIRouter(prefix="/api", tags=["Medications"])
 
 
 @router.get("/medications", response_model=List[MedicationResponse])
-def get_medications(current_user: User = Depends(get_current_user)):
-    """Get all medications for the current user."""
-    return MedicationService.get_medications(current_user)
+async def get_medications(current_user: User = Depends(get_current_user), conditional: ConditionalRequest = Depends()):
+    """Get all medications for the current user; 304 if the client's copy is current."""
+    result = await MedicationService.get_medications(current_user, conditional)
+    if isinstance(result, Response):
+        return result
+    return json_response(MEDICATION_LIST, result, conditional.response)
+
+
+@router.get("/medications/history", response_model=List[MedicationPeriod])
+async def get_medication_history(current_user: User = Depends(get_current_user)):
+    """Get every version of the current user's medications and when each was active."""
+    return await MedicationService.get_medication_history(current_user)
+
+
+@router.post("/medications/active-at", response_model=ActiveMedications)
+async def get_active_medications(query: ActiveMedicationsQuery, current_user: User = Depends(get_current_user)):
+    """Get the medications and doses active at each timestamp, e.g. those of a batch of blood pressure readings."""
+    return await MedicationService.get_active_medications(query.timestamps, current_user)
 
 
 @router.post("/medications", response_model=MedicationResponse, status_code=status.HTTP_201_CREATED)
-def create_medication(medication: Medication, current_user: User = Depends(get_current_user)):
+async def create_medication(medication: Medication, current_user: User = Depends(get_current_user)):
     """Create a new medication."""
-    return MedicationService.create_medication(medication, current_user)
+    return await MedicationService.create_medication(medication, current_user)
 
 
 @router.put("/medications/{medication_id}", response_model=MedicationResponse)
-def update_medication(medication_id: int, medication_update: MedicationUpdate, current_user: User = Depends(get_current_user)):
+async def update_medication(medication_id: int, medication_update: MedicationUpdate, current_user: User = Depends(get_current_user)):
     """Update an existing medication."""
-    return MedicationService.update_medication(medication_id, medication_update, current_user)
+    return await MedicationService.update_medication(medication_id, medication_update, current_user)
 
 
 @router.delete("/medications/{medication_id}")
-def delete_medication(medication_id: int, current_user: User = Depends(get_current_user)):
+async def delete_medication(medication_id: int, current_user: User = Depends(get_current_user)):
     """Delete a medication."""
-    return MedicationService.delete_medication(medication_id, current_user)
+    return await MedicationService.delete_medication(medication_id, current_user)
@@ -0,0 +1,376 @@
+"""
+Medications module dose scheduler.
+
+`intake_time` is free text ("08:00", "8:30 pm", "Morning", "ก่อนนอน", ...).
+`intake_slots` normalizes it to times of day; entries that cannot be read are
+not scheduled. Times of day are wall-clock times in `MEDICATION_TIMEZONE`, as
+profiles do not record a timezone.
+
+`DoseScheduler` keeps the next dose of every slot of every active medication,
+across all users, in one min-heap ordered by due time. Rescheduling a changed
+medication bumps its version and heap entries of older versions are skipped
+when they surface, so no change needs a scan of the heap. Taking a due dose
+off the heap pushes the same slot's next occurrence, so each event costs
+O(log n).
+
+The index lives in the memory of the reminder worker process (see
+reminders/worker.py). `ScheduleFeed` loads it from the database and keeps it
+in step with the medications table, whichever API worker wrote to it: it
+polls for rows updated since the last poll and for the tombstones of deleted
+ones, and periodically reconciles the whole index with the active medications.
+"""
+
+import asyncio
+import functools
+import heapq
+import logging
+import re
+import threading
+from datetime import datetime, time, timedelta, timezone
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+from ...config import (
+    DOSE_SCHEDULE_RECONCILE_SECONDS,
+    DOSE_SCHEDULE_SYNC_OVERLAP_SECONDS,
+    DOSE_SCHEDULE_SYNC_SECONDS,
+    MEDICATION_TIMEZONE,
+)
+from .repository import MedicationRepository, repository
+
+logger = logging.getLogger(__name__)
+
+# Named intake times and the time of day they stand for; they match the times
+# the frontend offers (08:00, 12:00, 18:00, 22:00).
+NAMED_SLOTS = {
+    "morning": time(8),
+    "breakfast": time(8),
+    "เช้า": time(8),
+    "noon": time(12),
+    "lunch": time(12),
+    "กลางวัน": time(12),
+    "evening": time(18),
+    "dinner": time(18),
+    "เย็น": time(18),
+    "night": time(22),
+    "bedtime": time(22),
+    "before bed": time(22),
+    "ก่อนนอน": time(22),
+}
+
+_CLOCK = re.compile(r"^(\d{1,2})(?:[:.](\d{2}))?(?::\d{2})?\s*(am|pm|a\.m\.|p\.m\.)?$")
+
+
+# The same few intake times recur across medications.
+@functools.lru_cache(maxsize=4096)
+def parse_intake_time(value: str) -> Optional[time]:
+    """Return the time of day an `intake_time` entry stands for, or None if it cannot be read."""
+    text = " ".join(str(value).strip().lower().split())
+    if text in NAMED_SLOTS:
+        return NAMED_SLOTS[text]
+    match = _CLOCK.match(text)
+    # A bare number is only a time with am/pm ("8 pm").
+    if match is None or (match.group(2) is None and match.group(3) is None):
+        return None
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+    if meridiem is not None:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem.startswith("p") else 0)
+    if hour > 23 or minute > 59:
+        return None
+    return time(hour, minute)
+
+
+def intake_slots(values: Optional[Iterable[str]]) -> Tuple[time, ...]:
+    """The distinct readable times of day of an `intake_time` array, earliest first."""
+    return tuple(sorted({slot for slot in map(parse_intake_time, values or ()) if slot is not None}))
+
+
+class Dose(NamedTuple):
+    """One scheduled dose of a medication."""
+    due_at: datetime
+    user_id: str
+    medication_id: int
+    slot: time
+
+
+class _Schedule(NamedTuple):
+    user_id: str
+    version: int
+    slots: Tuple[time, ...]
+
+
+# Heap entries: (due timestamp, medication id, version, slot). Entries whose
+# version is not the medication's current one are stale.
+_Entry = Tuple[float, int, int, time]
+
+
+class DoseScheduler:
+    """Min-heap of the upcoming doses of all active medications."""
+
+    def __init__(self, tz: str, clock=lambda: datetime.now(timezone.utc)):
+        self.tz = ZoneInfo(tz)
+        self._clock = clock
+        self._schedules: Dict[int, _Schedule] = {}
+        self._heap: List[_Entry] = []
+        # Heap entries of current versions; the rest of the heap is stale.
+        self._live = 0
+        self._versions = 0
+        self._lock = threading.Lock()
+
+    def next_occurrence(self, slot: time, after: datetime) -> datetime:
+        """The first time after `after` that the local clock shows `slot`, in UTC."""
+        local = after.astimezone(self.tz)
+        day = local.date()
+        while True:
+            candidate = datetime.combine(day, slot, tzinfo=self.tz).astimezone(timezone.utc)
+            if candidate > after:
+                return candidate
+            day += timedelta(days=1)
+
+    def _push(self, medication_id: int, schedule: _Schedule, after: datetime) -> None:
+        for slot in schedule.slots:
+            due_at = self.next_occurrence(slot, after)
+            heapq.heappush(self._heap, (due_at.timestamp(), medication_id, schedule.version, slot))
+
+    def _is_current(self, entry: _Entry) -> bool:
+        schedule = self._schedules.get(entry[1])
+        return schedule is not None and schedule.version == entry[2]
+
+    def _compact(self) -> None:
+        # Stale entries only cost memory; drop them once they outnumber the live ones.
+        if len(self._heap) > 2 * self._live + 64:
+            self._heap = [entry for entry in self._heap if self._is_current(entry)]
+            heapq.heapify(self._heap)
+
+    def load(self, medications: Iterable[Dict[str, Any]], now: Optional[datetime] = None) -> None:
+        """Replace the index with the doses of `medications`, rows with `id`, `user_id` and `intake_time`."""
+        now = now or self._clock()
+        # Every medication's first dose of a slot is the same instant.
+        first_due: Dict[time, float] = {}
+        with self._lock:
+            self._schedules, self._heap = {}, []
+            for medication in medications:
+                slots = intake_slots(medication.get("intake_time"))
+                if slots and medication.get("is_active", True):
+                    self._versions += 1
+                    schedule = _Schedule(str(medication["user_id"]), self._versions, slots)
+                    self._schedules[medication["id"]] = schedule
+                    for slot in slots:
+                        if slot not in first_due:
+                            first_due[slot] = self.next_occurrence(slot, now).timestamp()
+                        self._heap.append((first_due[slot], medication["id"], schedule.version, slot))
+            self._live = len(self._heap)
+            heapq.heapify(self._heap)
+
+    def schedule(self, user_id: str, medication: Dict[str, Any], now: Optional[datetime] = None) -> None:
+        """Schedule a created or updated medication row; inactive ones and ones without readable times are unscheduled."""
+        slots = intake_slots(medication.get("intake_time"))
+        if not slots or not medication.get("is_active", True):
+            self.remove(medication["id"])
+            return
+        with self._lock:
+            current = self._schedules.get(medication["id"])
+            if current is not None and current.slots == slots and current.user_id == str(user_id):
+                return
+            self._versions += 1
+            schedule = _Schedule(str(user_id), self._versions, slots)
+            self._schedules[medication["id"]] = schedule
+            self._live += len(slots) - (len(current.slots) if current is not None else 0)
+            self._push(medication["id"], schedule, now or self._clock())
+            self._compact()
+
+    def remove(self, medication_id: int) -> None:
+        """Unschedule a medication."""
+        with self._lock:
+            schedule = self._schedules.pop(medication_id, None)
+            if schedule is not None:
+                self._live -= len(schedule.slots)
+                self._compact()
+
+    @property
+    def version(self) -> int:
+        """The version given to the most recent schedule; it only grows."""
+        return self._versions
+
+    def retain(self, medication_ids: Set[int], version: int) -> int:
+        """
+        Unschedule medications not in `medication_ids` whose schedule is not newer than `version`.
+
+        Schedules set after `version` came from changes read since and are kept.
+        Returns how many medications were unscheduled.
+        """
+        with self._lock:
+            stale = [i for i, schedule in self._schedules.items() if i not in medication_ids and schedule.version <= version]
+            for medication_id in stale:
+                self._live -= len(self._schedules.pop(medication_id).slots)
+            self._compact()
+            return len(stale)
+
+    def _pop_current(self, until: float) -> Optional[_Entry]:
+        while self._heap and self._heap[0][0] <= until:
+            entry = heapq.heappop(self._heap)
+            if self._is_current(entry):
+                return entry
+        return None
+
+    def _dose(self, entry: _Entry) -> Dose:
+        return Dose(datetime.fromtimestamp(entry[0], timezone.utc), self._schedules[entry[1]].user_id, entry[1], entry[3])
+
+    def upcoming(self, until: datetime, limit: Optional[int] = None) -> List[Dose]:
+        """Doses due up to `until`, including overdue ones not yet taken, earliest first; the index is unchanged."""
+        with self._lock:
+            taken: List[_Entry] = []
+            while limit is None or len(taken) < limit:
+                entry = self._pop_current(until.timestamp())
+                if entry is None:
+                    break
+                taken.append(entry)
+            doses = [self._dose(entry) for entry in taken]
+            for entry in taken:
+                heapq.heappush(self._heap, entry)
+            return doses
+
+    def take_due(self, until: datetime, limit: Optional[int] = None) -> List[Dose]:
+        """
+        Remove and return the doses due up to `until`, earliest first.
+
+        Each slot's next occurrence after the returned dose is scheduled in its
+        place, so a slot comes up again the next day.
+        """
+        # Doses due together mostly share a slot, and so their next occurrence.
+        next_due: Dict[Tuple[float, time], float] = {}
+        with self._lock:
+            doses: List[Dose] = []
+            while limit is None or len(doses) < limit:
+                entry = self._pop_current(until.timestamp())
+                if entry is None:
+                    break
+                dose = self._dose(entry)
+                doses.append(dose)
+                key = (entry[0], entry[3])
+                if key not in next_due:
+                    next_due[key] = self.next_occurrence(dose.slot, dose.due_at).timestamp()
+                heapq.heappush(self._heap, (next_due[key], entry[1], entry[2], entry[3]))
+            return doses
+
+    def clear(self) -> None:
+        with self._lock:
+            self._schedules.clear()
+            self._heap.clear()
+            self._live = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of scheduled medications and heap entries."""
+        with self._lock:
+            return {"medications": len(self._schedules), "entries": len(self._heap)}
+
+
+dose_scheduler = DoseScheduler(MEDICATION_TIMEZONE)
+
+
+class ScheduleFeed:
+    """
+    Keeps a dose scheduler in step with the medications of all users in the database.
+
+    Each poll reads the medications updated, and the tombstones of those
+    deleted, since `overlap` before the previous poll began. The overlap
+    covers transactions that commit after the poll that should have seen them
+    (`updated_at` is the transaction's start) and clock skew; applying a change
+    twice has no effect. Every `reconcile_seconds` the index is also checked
+    against all active medications, which drops medications removed without a
+    tombstone, e.g. with their user.
+    """
+
+    def __init__(
+        self,
+        scheduler: DoseScheduler,
+        source: MedicationRepository,
+        *,
+        poll_seconds: float,
+        overlap: timedelta,
+        reconcile_seconds: float,
+        clock=lambda: datetime.now(timezone.utc),
+    ):
+        self.scheduler = scheduler
+        self.source = source
+        self.poll_seconds = poll_seconds
+        self.overlap = overlap
+        self.reconcile_seconds = reconcile_seconds
+        self._clock = clock
+        self.watermark: Optional[datetime] = None
+        self._tasks: List[asyncio.Task] = []
+        self.applied = 0
+
+    async def load(self) -> None:
+        """Build the index from every user's active medications."""
+        started = self._clock()
+        medications = [medication async for chunk in self.source.iter_active_medications() for medication in chunk]
+        self.scheduler.load(medications, started)
+        self.watermark = started
+
+    async def poll(self) -> int:
+        """Apply the changes since the previous poll; return how many rows were applied."""
+        started = self._clock()
+        since = (self.watermark or started) - self.overlap
+        applied = 0
+        async for chunk in self.source.iter_changes(since):
+            for medication in chunk:
+                self.scheduler.schedule(medication["user_id"], medication, started)
+            applied += len(chunk)
+        async for chunk in self.source.iter_deletions(since):
+            for medication_id in chunk:
+                self.scheduler.remove(medication_id)
+            applied += len(chunk)
+        self.watermark = started
+        self.applied += applied
+        return applied
+
+    async def reconcile(self) -> int:
+        """Reschedule every active medication and drop the rest; return how many were dropped."""
+        version = self.scheduler.version
+        started = self._clock()
+        active: Set[int] = set()
+        async for chunk in self.source.iter_active_medications():
+            for medication in chunk:
+                self.scheduler.schedule(medication["user_id"], medication, started)
+                active.add(medication["id"])
+        return self.scheduler.retain(active, version)
+
+    async def _loop(self, interval: float, step, description: str) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await step()
+            except Exception:
+                logger.exception("%s failed", description)
+
+    def start(self) -> None:
+        """Poll and reconcile in the background; called after `load`."""
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._loop(self.poll_seconds, self.poll, "Reading medication changes")),
+                asyncio.create_task(self._loop(self.reconcile_seconds, self.reconcile, "Reconciling dose schedules")),
+            ]
+
+    async def close(self) -> None:
+        """Stop the background tasks."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, float]:
+        """Return the number of scheduled medications and how far the feed trails the database."""
+        lag = (self._clock() - self.watermark).total_seconds() if self.watermark is not None else 0.0
+        return {"medications": self.scheduler.stats()["medications"], "applied": self.applied, "sync_lag_seconds": max(lag, 0.0)}
+
+
+schedule_feed = ScheduleFeed(
+    dose_scheduler,
+    repository,
+    poll_seconds=DOSE_SCHEDULE_SYNC_SECONDS,
+    overlap=timedelta(seconds=DOSE_SCHEDULE_SYNC_OVERLAP_SECONDS),
+    reconcile_seconds=DOSE_SCHEDULE_RECONCILE_SECONDS,
+)
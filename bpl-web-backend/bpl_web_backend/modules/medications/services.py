@@ -3,23 +3,31 @@ Medications module services for business logic.
 """
 
 from fastapi import HTTPException, status, Response
+from fastapi.concurrency import run_in_threadpool
 from gotrue.types import User
 from postgrest.exceptions import APIError
-from typing import List
+from datetime import datetime
+from typing import List, Optional, Union
 
-from ...database import supabase
-from .models import Medication, MedicationUpdate, MedicationResponse
+from ...revisions import ConditionalRequest, revision_repository
+from .models import MEDICATION_LIST, MEDICATION_PERIOD_LIST, ActiveMedications, Medication, MedicationPeriod, MedicationUpdate, MedicationResponse
+from .periods import PeriodIndex, microseconds
+from .repository import TABLE, repository
 
 
 class MedicationService:
     """Service class for medication operations."""
     
     @staticmethod
-    def get_medications(current_user: User) -> List[MedicationResponse]:
-        """Get all medications for the current user."""
+    async def get_medications(current_user: User, conditional: Optional[ConditionalRequest] = None) -> Union[List[MedicationResponse], Response]:
+        """Get all medications for the current user, or a 304 response if `conditional` shows the client's copy is current."""
         try:
-            response = supabase.table("medications").select("*").eq("user_id", current_user.id).execute()
-            return [MedicationResponse(**med) for med in response.data]
+            if conditional is not None:
+                not_modified = conditional.check(await revision_repository.get(current_user.id, TABLE), "medications")
+                if not_modified is not None:
+                    return not_modified
+            medications = await repository.list_medications(current_user.id)
+            return MEDICATION_LIST.validate_python(medications)
         except APIError as e:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=e.message)
         except HTTPException:
@@ -28,15 +36,13 @@ class MedicationService:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {str(e)}")
     
     @staticmethod
-    def create_medication(medication: Medication, current_user: User) -> MedicationResponse:
+    async def create_medication(medication: Medication, current_user: User) -> MedicationResponse:
         """Create a new medication."""
         try:
-            medication_data = medication.model_dump()
-            medication_data["user_id"] = str(current_user.id)
-            response = supabase.table("medications").insert(medication_data).execute()
-            if not response.data:
+            created = await repository.create_medication(current_user.id, medication.model_dump())
+            if not created:
                 raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to create medication: No data returned")
-            return MedicationResponse(**response.data[0])
+            return MedicationResponse(**created)
         except APIError as e:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=e.message)
         except HTTPException:
@@ -45,17 +51,17 @@ class MedicationService:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {str(e)}")
     
     @staticmethod
-    def update_medication(medication_id: int, medication_update: MedicationUpdate, current_user: User) -> MedicationResponse:
+    async def update_medication(medication_id: int, medication_update: MedicationUpdate, current_user: User) -> MedicationResponse:
         """Update an existing medication."""
         update_data = medication_update.model_dump(exclude_unset=True)
         if not update_data:
             raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="No fields to update")
 
         try:
-            response = supabase.table("medications").update(update_data).eq("id", medication_id).eq("user_id", current_user.id).execute()
-            if not response.data:
+            updated = await repository.update_medication(current_user.id, medication_id, update_data)
+            if not updated:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Medication not found")
-            return MedicationResponse(**response.data[0])
+            return MedicationResponse(**updated)
         except APIError as e:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=e.message)
         except HTTPException:
@@ -64,12 +70,12 @@ class MedicationService:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {str(e)}")
     
     @staticmethod
-    def delete_medication(medication_id: int, current_user: User) -> Response:
+    async def delete_medication(medication_id: int, current_user: User) -> Response:
         """Delete a medication."""
         try:
-            response = supabase.table("medications").delete().eq("id", medication_id).eq("user_id", current_user.id).execute()
+            deleted = await repository.delete_medication(current_user.id, medication_id)
             
-            if not response.data:
+            if not deleted:
                 return Response(status_code=status.HTTP_404_NOT_FOUND)
                 
             return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -80,3 +86,40 @@ class MedicationService:
             raise
         except Exception as e:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {str(e)}")
+
+    @staticmethod
+    async def get_medication_history(current_user: User) -> List[MedicationPeriod]:
+        """Get every version of the current user's medications with the time each was active, oldest first."""
+        try:
+            periods = await repository.list_periods(current_user.id)
+            return MEDICATION_PERIOD_LIST.validate_python(periods)
+        except APIError as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=e.message)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {str(e)}")
+
+    @staticmethod
+    async def get_active_medications(timestamps: List[datetime], current_user: User) -> ActiveMedications:
+        """
+        Get the medications, with their doses, that were active at each of `timestamps`.
+
+        The user's periods are read once and indexed (see periods.py), so the
+        cost is one query plus a binary search per timestamp.
+        """
+        try:
+            periods = await repository.list_periods(current_user.id)
+
+            def look_up():
+                index = PeriodIndex(periods)
+                return [list(active) for active in index.active_at(microseconds(timestamps))]
+
+            active = await run_in_threadpool(look_up)
+            return ActiveMedications(periods=MEDICATION_PERIOD_LIST.validate_python(periods), active=active)
+        except APIError as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=e.message)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {str(e)}")
@@ -0,0 +1,111 @@
+"""
+Profile module repository for data access.
+"""
+
+import datetime
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+from postgrest.exceptions import APIError
+
+from ...config import DATA_BACKEND
+from ...database import async_supabase, pg_pool
+from ...repository import DuplicateRecordError, is_unique_violation, quote_ident, record_to_dict
+
+TABLE = "user_profiles"
+
+
+class ProfileRepository(ABC):
+    """Data access for user profiles."""
+
+    @abstractmethod
+    async def get_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Return the user's profile, or None if it does not exist."""
+
+    @abstractmethod
+    async def create_profile(self, user_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Insert the user's profile and return it.
+
+        Raises:
+            DuplicateRecordError: If the user already has a profile.
+        """
+
+    @abstractmethod
+    async def update_profile(self, user_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Update the user's profile and return it, or None if it does not exist."""
+
+
+class SupabaseProfileRepository(ProfileRepository):
+    """User profiles through PostgREST."""
+
+    async def get_profile(self, user_id):
+        try:
+            response = await async_supabase.table(TABLE).select("*", count='exact').eq("user_id", user_id).single().execute()
+        except APIError as e:
+            # PGRST116: the single() request matched no rows
+            if "PGRST116" in e.message:
+                return None
+            raise
+        return response.data
+
+    async def create_profile(self, user_id, data):
+        try:
+            response = await async_supabase.table(TABLE).insert({**data, "user_id": str(user_id)}).execute()
+        except APIError as e:
+            if is_unique_violation(e):
+                raise DuplicateRecordError("User profile already exists.") from e
+            raise
+        return response.data[0] if response.data else None
+
+    async def update_profile(self, user_id, data):
+        response = await async_supabase.table(TABLE).update(data).eq("user_id", user_id).execute()
+        return response.data[0] if response.data else None
+
+
+class PostgresProfileRepository(ProfileRepository):
+    """User profiles on the direct Postgres pool."""
+
+    @staticmethod
+    def _to_params(data: Dict[str, Any]) -> Dict[str, Any]:
+        # date_of_birth is a `date` column; asyncpg needs a date object for it.
+        if isinstance(data.get("date_of_birth"), str):
+            data = {**data, "date_of_birth": datetime.date.fromisoformat(data["date_of_birth"])}
+        return data
+
+    async def get_profile(self, user_id):
+        async with pg_pool.transaction(user_id) as conn:
+            row = await conn.fetchrow(f"SELECT * FROM {TABLE} WHERE user_id = $1", user_id)
+        return record_to_dict(row) if row else None
+
+    async def create_profile(self, user_id, data):
+        data = self._to_params(data)
+        columns = list(data)
+        placeholders = ", ".join(f"${i}" for i in range(2, len(columns) + 2))
+        sql = f"INSERT INTO {TABLE} (user_id, {', '.join(map(quote_ident, columns))}) VALUES ($1, {placeholders}) RETURNING *"
+        try:
+            async with pg_pool.transaction(user_id) as conn:
+                row = await conn.fetchrow(sql, user_id, *data.values())
+        except APIError as e:
+            if is_unique_violation(e):
+                raise DuplicateRecordError("User profile already exists.") from e
+            raise
+        return record_to_dict(row) if row else None
+
+    async def update_profile(self, user_id, data):
+        data = self._to_params(data)
+        assignments = ", ".join(f"{quote_ident(column)} = ${i}" for i, column in enumerate(data, start=2))
+        sql = f"UPDATE {TABLE} SET {assignments} WHERE user_id = $1 RETURNING *"
+        async with pg_pool.transaction(user_id) as conn:
+            row = await conn.fetchrow(sql, user_id, *data.values())
+        return record_to_dict(row) if row else None
+
+
+def create_repository() -> ProfileRepository:
+    """Return the repository for the configured data backend."""
+    if DATA_BACKEND == "postgres":
+        return PostgresProfileRepository()
+    return SupabaseProfileRepository()
+
+
+repository = create_repository()
@@ -0,0 +1,9 @@
+"""
+Reminders module for batched delivery of medication reminders.
+
+The dispatcher runs in a worker process of its own; see worker.py.
+"""
+
+from .models import ReminderMetrics
+
+__all__ = ["ReminderMetrics"]
@@ -0,0 +1,282 @@
+"""
+Reminders module dispatcher.
+
+A background task takes due doses off the dose scheduler and turns them into
+reminders, one per user and due time, so a user taking three medications at
+08:00 gets a single reminder. Reminders are delivered through the configured
+sink in batches of at most `REMINDER_BATCH_SIZE`, paced by a token bucket
+shared by all deliveries (`REMINDER_RATE_PER_SECOND`).
+
+Failed reminders are retried with exponential backoff and jitter up to
+`REMINDER_MAX_ATTEMPTS` times. A dose that already reached the queue, or was
+delivered recently, is not queued again. Once `REMINDER_MAX_QUEUE` reminders
+wait, no more doses are taken off the scheduler, so a slow sink shows up as
+lag instead of unbounded memory.
+
+The dispatcher runs in the reminder worker process (see worker.py), apart
+from the API workers, together with the dose index it reads. Within that
+process all work runs on the event loop except taking doses off the
+scheduler, which holds its lock and runs in the threadpool.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from ...config import (
+    REMINDER_BATCH_SIZE,
+    REMINDER_MAX_ATTEMPTS,
+    REMINDER_MAX_QUEUE,
+    REMINDER_POLL_SECONDS,
+    REMINDER_RATE_PER_SECOND,
+    REMINDER_RETRY_BASE_SECONDS,
+)
+from ..medications.scheduler import Dose, DoseScheduler, dose_scheduler
+from .sinks import ReminderSink, create_sink
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(eq=False)
+class Reminder:
+    """A reminder to take the medications due for a user at one time."""
+    user_id: str
+    due_at: datetime
+    medication_ids: List[int] = field(default_factory=list)
+    attempts: int = 0
+
+    @property
+    def key(self) -> Tuple[str, datetime]:
+        return (self.user_id, self.due_at)
+
+
+class TokenBucket:
+    """Allows `rate` tokens per second on average and bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: float, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = burst
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float) -> None:
+        """Wait until `tokens` (at most `burst`) are available and take them."""
+        tokens = min(tokens, self.burst)
+        self._refill()
+        while self._tokens < tokens:
+            await asyncio.sleep((tokens - self._tokens) / self.rate)
+            self._refill()
+        self._tokens -= tokens
+
+
+class ReminderDispatcher:
+    """Queue, batch, rate-limit and retry medication reminders."""
+
+    def __init__(
+        self,
+        scheduler: DoseScheduler,
+        sink: ReminderSink,
+        *,
+        batch_size: int,
+        rate_per_second: float,
+        max_attempts: int,
+        retry_base_seconds: float,
+        poll_seconds: float,
+        max_queue: int,
+        clock=lambda: datetime.now(timezone.utc),
+    ):
+        self.scheduler = scheduler
+        self.sink = sink
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.poll_seconds = poll_seconds
+        self.max_queue = max_queue
+        self._clock = clock
+        self._bucket = TokenBucket(rate_per_second, max(batch_size, rate_per_second))
+        # Reminders ready to send, oldest first, by (user, due time).
+        self._ready: "OrderedDict[Tuple[str, datetime], Reminder]" = OrderedDict()
+        # Reminders waiting out a backoff: (retry at, sequence, reminder).
+        self._retrying: List[Tuple[float, int, Reminder]] = []
+        self._sequence = itertools.count()
+        # (user, medication, due time) of recently delivered doses.
+        self._delivered_doses: "OrderedDict[Tuple[str, int, datetime], None]" = OrderedDict()
+        self._in_flight = 0
+        self._wake = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self.delivered = 0
+        self.failed = 0
+        self.retried = 0
+        self.deduplicated = 0
+        self.batches = 0
+        self.last_delivery_lag = 0.0
+
+    @property
+    def depth(self) -> int:
+        """Reminders queued or waiting to be retried."""
+        return len(self._ready) + len(self._retrying)
+
+    def enqueue(self, doses: List[Dose]) -> None:
+        """Queue reminders for `doses`, merging doses of a user due at the same time."""
+        for dose in doses:
+            dose_key = (dose.user_id, dose.medication_id, dose.due_at)
+            reminder = self._ready.get((dose.user_id, dose.due_at))
+            if dose_key in self._delivered_doses or (reminder is not None and dose.medication_id in reminder.medication_ids):
+                self.deduplicated += 1
+                continue
+            if reminder is None:
+                reminder = self._ready[(dose.user_id, dose.due_at)] = Reminder(dose.user_id, dose.due_at)
+            reminder.medication_ids.append(dose.medication_id)
+        if self._ready:
+            self._wake.set()
+
+    async def poll(self) -> int:
+        """Queue the doses that are due, as far as the queue has room; return how many were taken."""
+        room = self.max_queue - self.depth
+        if room <= 0:
+            return 0
+        doses = await run_in_threadpool(self.scheduler.take_due, self._clock(), room)
+        self.enqueue(doses)
+        return len(doses)
+
+    def _release_retries(self) -> None:
+        now = time.monotonic()
+        while self._retrying and self._retrying[0][0] <= now:
+            _, _, reminder = heapq.heappop(self._retrying)
+            existing = self._ready.get(reminder.key)
+            if existing is not None:
+                # Doses of the same time queued meanwhile join the retried reminder.
+                reminder.medication_ids.extend(i for i in existing.medication_ids if i not in reminder.medication_ids)
+            self._ready[reminder.key] = reminder
+            self._ready.move_to_end(reminder.key, last=False)
+
+    def _next_batch(self) -> List[Reminder]:
+        batch = []
+        while self._ready and len(batch) < self.batch_size:
+            batch.append(self._ready.popitem(last=False)[1])
+        return batch
+
+    def _backoff(self, attempts: int) -> float:
+        # Full jitter spreads retries of one failed batch over the backoff window.
+        return random.uniform(0, self.retry_base_seconds * 2 ** (attempts - 1))
+
+    def _record_delivery(self, reminder: Reminder) -> None:
+        self.delivered += 1
+        for medication_id in reminder.medication_ids:
+            self._delivered_doses[(reminder.user_id, medication_id, reminder.due_at)] = None
+        while len(self._delivered_doses) > 2 * self.max_queue:
+            self._delivered_doses.popitem(last=False)
+
+    async def deliver(self) -> int:
+        """Send one batch of ready reminders through the sink; return its size."""
+        self._release_retries()
+        batch = self._next_batch()
+        if not batch:
+            return 0
+        await self._bucket.acquire(len(batch))
+        self._in_flight += len(batch)
+        try:
+            failed = list(await self.sink.deliver(batch))
+        except Exception:
+            logger.exception("Reminder sink failed a batch of %d", len(batch))
+            failed = batch
+        finally:
+            self._in_flight -= len(batch)
+        self.batches += 1
+        self.last_delivery_lag = max((self._clock() - batch[0].due_at).total_seconds(), 0.0)
+
+        rejected = set(map(id, failed))
+        for reminder in batch:
+            if id(reminder) not in rejected:
+                self._record_delivery(reminder)
+        for reminder in failed:
+            reminder.attempts += 1
+            if reminder.attempts >= self.max_attempts:
+                self.failed += 1
+                continue
+            self.retried += 1
+            retry_at = time.monotonic() + self._backoff(reminder.attempts)
+            heapq.heappush(self._retrying, (retry_at, next(self._sequence), reminder))
+        return len(batch)
+
+    async def _poll_loop(self) -> None:
+        while True:
+            try:
+                await self.poll()
+            except Exception:
+                logger.exception("Taking due doses off the scheduler failed")
+            await asyncio.sleep(self.poll_seconds)
+
+    async def _deliver_loop(self) -> None:
+        while True:
+            if not await self.deliver():
+                self._wake.clear()
+                timeout = self.poll_seconds
+                if self._retrying:
+                    timeout = min(timeout, max(self._retrying[0][0] - time.monotonic(), 0))
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+    def start(self) -> None:
+        """Start polling and delivering in the background; called on startup."""
+        if not self._tasks:
+            self._wake = asyncio.Event()
+            self._tasks = [asyncio.create_task(self._poll_loop()), asyncio.create_task(self._deliver_loop())]
+
+    async def close(self) -> None:
+        """Stop the background tasks; reminders still queued are dropped."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, float]:
+        """Return queue depth, lag and delivery counters."""
+        now = self._clock()
+        waiting = [reminder.due_at for reminder in itertools.islice(self._ready.values(), 1)]
+        waiting += [min(reminder.due_at for _, _, reminder in self._retrying)] if self._retrying else []
+        overdue = self.scheduler.upcoming(now, limit=1)
+        return {
+            "queued": len(self._ready),
+            "retrying": len(self._retrying),
+            "in_flight": self._in_flight,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "retried": self.retried,
+            "deduplicated": self.deduplicated,
+            "batches": self.batches,
+            # Age of the oldest reminder not yet delivered.
+            "lag_seconds": max((now - min(waiting)).total_seconds(), 0.0) if waiting else 0.0,
+            # Age of the oldest due dose not yet taken off the scheduler (the queue is full).
+            "scheduler_lag_seconds": max((now - overdue[0].due_at).total_seconds(), 0.0) if overdue else 0.0,
+            "last_delivery_lag_seconds": self.last_delivery_lag,
+        }
+
+
+reminder_dispatcher = ReminderDispatcher(
+    dose_scheduler,
+    create_sink(),
+    batch_size=REMINDER_BATCH_SIZE,
+    rate_per_second=REMINDER_RATE_PER_SECOND,
+    max_attempts=REMINDER_MAX_ATTEMPTS,
+    retry_base_seconds=REMINDER_RETRY_BASE_SECONDS,
+    poll_seconds=REMINDER_POLL_SECONDS,
+    max_queue=REMINDER_MAX_QUEUE,
+)
@@ -0,0 +1,22 @@
+"""
+Reminders module models for dispatcher metrics.
+"""
+
+from pydantic import BaseModel
+
+
+class ReminderMetrics(BaseModel):
+    """Queue depth, lag and counters of the reminder worker, and how far its dose index trails the database."""
+    medications: int
+    sync_lag_seconds: float
+    queued: int
+    retrying: int
+    in_flight: int
+    delivered: int
+    failed: int
+    retried: int
+    deduplicated: int
+    batches: int
+    lag_seconds: float
+    scheduler_lag_seconds: float
+    last_delivery_lag_seconds: float
@@ -0,0 +1,65 @@
+"""
+Reminders module delivery sinks.
+
+A sink delivers one batch of reminders and returns the ones it could not
+deliver, which the dispatcher retries; raising fails the whole batch. Push and
+email sinks can be added next to the log and in-memory ones here.
+"""
+
+import logging
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Callable, List, Optional, Sequence
+
+from ...config import REMINDER_SINK
+
+if TYPE_CHECKING:
+    from .dispatcher import Reminder
+
+logger = logging.getLogger(__name__)
+
+
+class ReminderSink(ABC):
+    """Delivers reminders to users."""
+
+    @abstractmethod
+    async def deliver(self, reminders: Sequence["Reminder"]) -> Sequence["Reminder"]:
+        """Deliver a batch of reminders and return the ones that failed."""
+
+
+class LogSink(ReminderSink):
+    """Writes each reminder to the application log."""
+
+    async def deliver(self, reminders):
+        for reminder in reminders:
+            logger.info(
+                "Medication reminder for user %s: medications %s due at %s",
+                reminder.user_id, ", ".join(map(str, reminder.medication_ids)), reminder.due_at.isoformat(),
+            )
+        return []
+
+
+class MemorySink(ReminderSink):
+    """Keeps delivered reminders in a list; `fail` picks reminders to reject."""
+
+    def __init__(self, fail: Optional[Callable[["Reminder"], bool]] = None):
+        self.fail = fail
+        self.delivered: List["Reminder"] = []
+        self.batches = 0
+
+    async def deliver(self, reminders):
+        self.batches += 1
+        failed = [reminder for reminder in reminders if self.fail is not None and self.fail(reminder)]
+        rejected = set(map(id, failed))
+        self.delivered.extend(reminder for reminder in reminders if id(reminder) not in rejected)
+        return failed
+
+
+SINKS = {"log": LogSink, "memory": MemorySink}
+
+
+def create_sink() -> ReminderSink:
+    """Return the sink named by `REMINDER_SINK`."""
+    try:
+        return SINKS[REMINDER_SINK]()
+    except KeyError:
+        raise ValueError(f"Unknown REMINDER_SINK: {REMINDER_SINK}") from None
@@ -0,0 +1,56 @@
+"""
+Reminders module worker process.
+
+Reminders are dispatched by a process of its own, apart from the API workers,
+so delivery never competes with requests for their event loop or threadpool:
+
+    python -m bpl_web_backend.modules.reminders.worker
+
+Run exactly one. At startup it loads the upcoming doses of all users; it then
+follows medication changes in the database (see `ScheduleFeed`), so writes
+made through any API worker reach it. Its metrics are served to operators at
+GET /metrics on REMINDER_METRICS_HOST:REMINDER_METRICS_PORT, which is bound to
+localhost by default; the API does not expose them.
+"""
+
+from contextlib import asynccontextmanager
+
+import uvicorn
+from fastapi import FastAPI
+
+from ...config import DATA_BACKEND, REMINDER_METRICS_HOST, REMINDER_METRICS_PORT
+from ...database import async_supabase, pg_pool
+from ..medications.scheduler import schedule_feed
+from .dispatcher import reminder_dispatcher
+from .models import ReminderMetrics
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    database = pg_pool if DATA_BACKEND == "postgres" else async_supabase
+    await database.open()
+    await schedule_feed.load()
+    schedule_feed.start()
+    reminder_dispatcher.start()
+    yield
+    await reminder_dispatcher.close()
+    await schedule_feed.close()
+    await database.close()
+
+
+app = FastAPI(title="BPL Reminder Worker", lifespan=lifespan, docs_url=None, redoc_url=None, openapi_url=None)
+
+
+@app.get("/metrics", response_model=ReminderMetrics)
+async def get_metrics():
+    """Get the queue depth, lag and delivery counters of the dispatcher and the lag of the dose index."""
+    feed = schedule_feed.stats()
+    return ReminderMetrics(medications=feed["medications"], sync_lag_seconds=feed["sync_lag_seconds"], **reminder_dispatcher.stats())
+
+
+def main() -> None:
+    uvicorn.run(app, host=REMINDER_METRICS_HOST, port=REMINDER_METRICS_PORT, workers=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+"""
+Sync module for delta sync of offline-first clients.
+"""
+
+from .routes import router
+from .models import ResourceChanges, SyncResponse
+
+__all__ = ["router", "ResourceChanges", "SyncResponse"]
@@ -0,0 +1,19 @@
+"""
+Sync module models for delta sync.
+"""
+
+from pydantic import BaseModel
+from typing import Any, Dict, List
+
+
+class ResourceChanges(BaseModel):
+    """Changes to one table: rows to insert or replace, and ids of rows to drop."""
+    upserts: List[Dict[str, Any]] = []
+    deletes: List[str] = []
+
+
+class SyncResponse(BaseModel):
+    """Changes since the requested token, keyed by table name."""
+    token: str
+    has_more: bool
+    changes: Dict[str, ResourceChanges]
@@ -0,0 +1,71 @@
+"""
+Sync module repository for data access.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List
+
+from ...config import DATA_BACKEND
+from ...database import async_supabase, pg_pool
+from ...repository import record_to_dict
+
+TOMBSTONES_TABLE = "sync_tombstones"
+
+
+class SyncRepository(ABC):
+    """Read access to the rows and tombstones of a user's revisions."""
+
+    @abstractmethod
+    async def changed_rows(self, user_id: str, table: str, since: int, limit: int) -> List[Dict[str, Any]]:
+        """Return up to `limit` of the user's rows in `table` stamped after revision `since`, oldest first."""
+
+    @abstractmethod
+    async def tombstones(self, user_id: str, table: str, since: int, limit: int) -> List[Dict[str, Any]]:
+        """Return up to `limit` tombstones (`revision`, `record_id`) of `table` after revision `since`, oldest first."""
+
+
+class SupabaseSyncRepository(SyncRepository):
+    """Sync reads through PostgREST."""
+
+    async def changed_rows(self, user_id, table, since, limit):
+        response = await (
+            async_supabase.table(table).select("*").eq("user_id", user_id)
+            .gt("revision", since).order("revision").limit(limit).execute()
+        )
+        return response.data
+
+    async def tombstones(self, user_id, table, since, limit):
+        response = await (
+            async_supabase.table(TOMBSTONES_TABLE).select("revision, record_id").eq("user_id", user_id).eq("resource", table)
+            .gt("revision", since).order("revision").limit(limit).execute()
+        )
+        return response.data
+
+
+class PostgresSyncRepository(SyncRepository):
+    """Sync reads on the direct Postgres pool."""
+
+    async def changed_rows(self, user_id, table, since, limit):
+        sql = f"SELECT * FROM {table} WHERE user_id = $1 AND revision > $2 ORDER BY revision LIMIT $3"
+        async with pg_pool.transaction(user_id) as conn:
+            rows = await conn.fetch(sql, user_id, since, limit)
+        return [record_to_dict(row) for row in rows]
+
+    async def tombstones(self, user_id, table, since, limit):
+        sql = (
+            f"SELECT revision, record_id FROM {TOMBSTONES_TABLE} "
+            "WHERE user_id = $1 AND resource = $2 AND revision > $3 ORDER BY revision LIMIT $4"
+        )
+        async with pg_pool.transaction(user_id) as conn:
+            rows = await conn.fetch(sql, user_id, table, since, limit)
+        return [record_to_dict(row) for row in rows]
+
+
+def create_repository() -> SyncRepository:
+    """Return the repository for the configured data backend."""
+    if DATA_BACKEND == "postgres":
+        return PostgresSyncRepository()
+    return SupabaseSyncRepository()
+
+
+repository = create_repository()
@@ -0,0 +1,22 @@
+"""
+Sync module routes for API endpoints.
+"""
+
+from fastapi import APIRouter, Depends, Query
+from gotrue.types import User
+from typing import Optional
+
+from ...dependencies import get_current_user
+from .models import SyncResponse
+from .services import SyncService
+
+router = APIRouter(prefix="/api", tags=["Sync"])
+
+
+@router.get("/sync", response_model=SyncResponse)
+async def sync(
+    since: Optional[str] = Query(None, description="Token of the previous sync; omit for a full sync"),
+    current_user: User = Depends(get_current_user),
+):
+    """Get the blood pressure records, medications and profile changed since the last sync."""
+    return await SyncService.sync(current_user, since)
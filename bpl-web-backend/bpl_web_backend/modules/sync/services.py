@@ -0,0 +1,84 @@
+"""
+Sync module services for business logic.
+"""
+
+import asyncio
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from gotrue.types import User
+from postgrest.exceptions import APIError
+
+from ...config import SYNC_PAGE_SIZE
+from ..blood_pressure_log.repository import TABLE as BLOOD_PRESSURE_TABLE
+from ..medications.repository import TABLE as MEDICATIONS_TABLE
+from ..profile.repository import TABLE as PROFILES_TABLE
+from .models import ResourceChanges, SyncResponse
+from .repository import repository
+from .token import decode_token, encode_token
+
+# Tables a client replicates.
+RESOURCES = (BLOOD_PRESSURE_TABLE, MEDICATIONS_TABLE, PROFILES_TABLE)
+
+
+class SyncService:
+    """Service class for delta sync."""
+
+    @staticmethod
+    async def _resource_changes(user_id: str, table: str, since: int, full: bool) -> Tuple[ResourceChanges, int, bool]:
+        """
+        Read one page of a table's changes after revision `since`.
+
+        Returns the changes, the revision the next sync continues from and
+        whether more changes may follow.
+        """
+        rows = await repository.changed_rows(user_id, table, since, SYNC_PAGE_SIZE)
+        # A full sync starts from an empty replica: nothing to delete.
+        tombstones = [] if full else await repository.tombstones(user_id, table, since, SYNC_PAGE_SIZE)
+
+        events = sorted(
+            [(row["revision"], row, None) for row in rows]
+            + [(tombstone["revision"], None, tombstone["record_id"]) for tombstone in tombstones],
+            key=lambda event: event[0],
+        )
+        has_more = len(events) > SYNC_PAGE_SIZE or SYNC_PAGE_SIZE in (len(rows), len(tombstones))
+        events = events[:SYNC_PAGE_SIZE]
+
+        changes = ResourceChanges(
+            upserts=[row for _, row, _ in events if row is not None],
+            deletes=[record_id for _, _, record_id in events if record_id is not None],
+        )
+        return changes, events[-1][0] if events else since, has_more
+
+    @staticmethod
+    async def sync(current_user: User, since: Optional[str] = None) -> SyncResponse:
+        """
+        Get the changes to the user's data after the token `since`.
+
+        Each resource returns at most `SYNC_PAGE_SIZE` changes in revision
+        order; while `has_more` is set the client syncs again with the new token.
+        """
+        try:
+            try:
+                revisions = decode_token(since) if since is not None else {}
+            except ValueError:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sync token")
+
+            results = await asyncio.gather(*(
+                SyncService._resource_changes(current_user.id, table, revisions.get(table, 0), since is None)
+                for table in RESOURCES
+            ))
+            changes: Dict[str, ResourceChanges] = {}
+            next_revisions: Dict[str, int] = {}
+            has_more = False
+            for table, (resource_changes, revision, resource_has_more) in zip(RESOURCES, results):
+                changes[table] = resource_changes
+                next_revisions[table] = revision
+                has_more = has_more or resource_has_more
+            return SyncResponse(token=encode_token(next_revisions), has_more=has_more, changes=changes)
+        except APIError as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error: {e.message}")
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {str(e)}")
@@ -0,0 +1,33 @@
+"""
+Sync module tokens.
+
+A sync token is the last revision the client has seen of each resource,
+encoded as opaque URL-safe base64 so clients never build or parse it themselves.
+"""
+
+import base64
+import json
+from typing import Dict
+
+SyncToken = Dict[str, int]
+
+
+def encode_token(revisions: SyncToken) -> str:
+    """Build the token that asks for the changes after `revisions`."""
+    payload = json.dumps(revisions, separators=(",", ":"), sort_keys=True)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_token(token: str) -> SyncToken:
+    """
+    Decode a token produced by `encode_token`.
+
+    Raises:
+        ValueError: If the token is malformed.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        revisions = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return {str(resource): int(revision) for resource, revision in revisions.items()}
+    except (ValueError, TypeError, AttributeError) as e:
+        raise ValueError("Invalid sync token") from e
@@ -0,0 +1,49 @@
+"""
+Shared pieces of the repository layer.
+
+Every feature module keeps its queries in a `repository.py` with one
+implementation per data backend: `supabase` sends them through PostgREST over
+HTTP, `postgres` runs them on a direct asyncpg pool. The DATA_BACKEND setting
+picks the implementation; services only talk to the repository interface.
+"""
+
+import datetime
+import uuid
+from typing import Any, Dict, Mapping, Union
+
+from postgrest.exceptions import APIError
+
+
+class DuplicateRecordError(Exception):
+    """Raised when an insert violates a unique constraint."""
+
+
+def is_unique_violation(error: APIError) -> bool:
+    """Return True if a database error is a unique constraint violation (SQLSTATE 23505)."""
+    return error.code == "23505" or "23505" in str(error.details)
+
+
+def quote_ident(name: str) -> str:
+    """Quote a column or table name for use in SQL text."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def record_to_dict(record: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Convert an asyncpg record to the shape PostgREST returns.
+
+    UUIDs and plain dates come back from PostgREST as strings, and the response
+    models expect them that way.
+    """
+    row = dict(record)
+    for key, value in row.items():
+        if isinstance(value, uuid.UUID):
+            row[key] = str(value)
+        elif isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+            row[key] = value.isoformat()
+    return row
+
+
+def parse_timestamp(value: Union[str, datetime.datetime]) -> datetime.datetime:
+    """Return a timestamp column as a datetime: PostgREST sends ISO strings, asyncpg datetimes."""
+    return datetime.datetime.fromisoformat(value) if isinstance(value, str) else value
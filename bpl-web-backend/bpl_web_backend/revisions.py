@@ -0,0 +1,131 @@
+"""
+Per-user data revisions.
+
+`user_data_revisions` (see schema.sql) holds a counter per user and table that
+triggers bump on every row of the user's that changes. An unchanged
+revision therefore means unchanged data, which is what caches and HTTP
+validators (ETag, Last-Modified) key on.
+"""
+
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, NamedTuple, Optional
+
+from fastapi import Header, Response, status
+
+from .config import DATA_BACKEND
+from .database import async_supabase, pg_pool
+from .repository import parse_timestamp
+
+TABLE = "user_data_revisions"
+
+
+class Revision(NamedTuple):
+    """A user's revision of a resource and when it was reached (None if it never changed)."""
+    revision: int
+    updated_at: Optional[datetime] = None
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches `etag` (weak comparison, as RFC 9110 requires)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+class RevisionRepository(ABC):
+    """Read access to the per-user revision counters."""
+
+    @abstractmethod
+    async def get(self, user_id: str, resource: str) -> Revision:
+        """Return the user's revision of `resource` (a table name); revision 0 if it never changed."""
+
+
+class SupabaseRevisionRepository(RevisionRepository):
+    """Revisions through PostgREST."""
+
+    async def get(self, user_id, resource):
+        response = await async_supabase.table(TABLE).select("revision, updated_at").eq("user_id", user_id).eq("resource", resource).execute()
+        if not response.data:
+            return Revision(0)
+        row = response.data[0]
+        return Revision(row["revision"], parse_timestamp(row["updated_at"]))
+
+
+class PostgresRevisionRepository(RevisionRepository):
+    """Revisions on the direct Postgres pool."""
+
+    async def get(self, user_id, resource):
+        async with pg_pool.transaction(user_id) as conn:
+            row = await conn.fetchrow(f"SELECT revision, updated_at FROM {TABLE} WHERE user_id = $1 AND resource = $2", user_id, resource)
+        return Revision(row["revision"], row["updated_at"]) if row else Revision(0)
+
+
+class ConditionalRequest:
+    """
+    Dependency holding a GET request's validators (If-None-Match, If-Modified-Since).
+
+    Services call `check` with the current revision before reading any data:
+    it returns a bodiless 304 response when the client's copy is current, and
+    otherwise puts the validators on the response being built.
+    """
+
+    def __init__(
+        self,
+        response: Response,
+        if_none_match: Optional[str] = Header(None),
+        if_modified_since: Optional[str] = Header(None),
+    ):
+        self.response = response
+        self.if_none_match = if_none_match
+        self.if_modified_since = if_modified_since
+
+    def check(self, revision: Revision, variant: str) -> Optional[Response]:
+        """Return a 304 response if the client has `revision` of the `variant` representation, else None."""
+        headers = validator_headers(revision, variant)
+        if self._not_modified(revision, headers["ETag"]):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        self.response.headers.update(headers)
+        return None
+
+    def _not_modified(self, revision: Revision, etag: str) -> bool:
+        # If-Modified-Since is ignored when If-None-Match is sent (RFC 9110, 13.2.2).
+        if self.if_none_match is not None:
+            return etag_matches(self.if_none_match, etag)
+        if self.if_modified_since is None or revision.updated_at is None:
+            return False
+        try:
+            since = parsedate_to_datetime(self.if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            return False
+        # HTTP dates have whole seconds.
+        return revision.updated_at.replace(microsecond=0) <= since
+
+
+def validator_headers(revision: Revision, variant: str) -> Dict[str, str]:
+    """Response headers validating the `variant` representation (e.g. a format) at `revision`."""
+    headers = {
+        "ETag": f'W/"{revision.revision}-{variant}"',
+        "Cache-Control": "private, no-cache",
+        # Responses differ per user: a browser must not revalidate one user's copy for another.
+        "Vary": "Authorization",
+    }
+    if revision.updated_at is not None:
+        headers["Last-Modified"] = format_datetime(revision.updated_at.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+
+def create_repository() -> RevisionRepository:
+    """Return the repository for the configured data backend."""
+    if DATA_BACKEND == "postgres":
+        return PostgresRevisionRepository()
+    return SupabaseRevisionRepository()
+
+
+revision_repository = create_repository()
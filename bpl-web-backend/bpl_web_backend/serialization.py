@@ -0,0 +1,26 @@
+"""
+Single-pass JSON responses for list endpoints.
+
+Returning model instances from a route makes FastAPI dump them, validate the
+dump against `response_model` and encode the result again. List endpoints
+instead validate the raw rows once in bulk with a `TypeAdapter` and return the
+adapter's JSON directly; FastAPI sends a returned `Response` as it is, so the
+route's `response_model` only documents the schema.
+"""
+
+from typing import Any, Optional
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+
+def json_response(adapter: TypeAdapter, value: Any, response: Optional[Response] = None, **dump_options: Any) -> Response:
+    """
+    Serialize already validated `value` with `adapter` into a JSON response.
+
+    Headers set on the route's injected `response` (validators, cursors) are
+    carried over. `dump_options` are passed to `TypeAdapter.dump_json`, e.g.
+    `exclude_unset=True`.
+    """
+    headers = dict(response.headers) if response is not None else None
+    return Response(content=adapter.dump_json(value, **dump_options), media_type="application/json", headers=headers)
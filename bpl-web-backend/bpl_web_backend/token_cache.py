@@ -0,0 +1,124 @@
+"""
+In-process cache of verified access tokens.
+
+Entries are keyed by a SHA-256 hash of the bearer token so raw tokens are never
+kept in memory longer than the request, and they never outlive the token's own
+`exp` claim.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional, Set
+
+from .config import AUTH_CACHE_MAX_SIZE, AUTH_CACHE_TTL_SECONDS
+
+
+class _Entry(NamedTuple):
+    user: Any
+    user_id: str
+    expires_at: float
+
+
+class TokenCache:
+    """Bounded LRU cache of verified tokens with per-entry TTL."""
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 60, clock=time.time):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._keys_by_user: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl_seconds > 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[Any]:
+        """Return the cached user for `token`, or None if it is missing or expired."""
+        if not self.enabled:
+            return None
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= self._clock():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.user
+
+    def put(self, token: str, user: Any, token_expires_at: Optional[float]) -> None:
+        """Cache `user` for `token` until the cache TTL or the token's expiry, whichever is sooner."""
+        if not self.enabled or token_expires_at is None:
+            return
+        now = self._clock()
+        expires_at = min(now + self.ttl_seconds, token_expires_at)
+        if expires_at <= now:
+            return
+        key = self._key(token)
+        user_id = str(user.id)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(user, user_id, expires_at)
+            self._keys_by_user.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate_token(self, token: str) -> bool:
+        """Drop a single token, e.g. on logout. Returns True if it was cached."""
+        key = self._key(token)
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            return True
+
+    def invalidate_user(self, user_id: str) -> int:
+        """Drop every cached token of a user, e.g. after a password change or global logout."""
+        with self._lock:
+            keys = list(self._keys_by_user.get(str(user_id), ()))
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Return size and hit/miss/eviction counters."""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        keys = self._keys_by_user.get(entry.user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[entry.user_id]
+
+
+token_cache = TokenCache(max_size=AUTH_CACHE_MAX_SIZE, ttl_seconds=AUTH_CACHE_TTL_SECONDS)
@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+
+# Add the project root to the Python path to allow importing the application
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bpl_web_backend.compression import ENCODERS
+from bpl_web_backend.dependencies import get_current_user
+from bpl_web_backend.main import app
+from bpl_web_backend.modules.blood_pressure_log.repository import repository as bp_repository
+from bpl_web_backend.modules.medications.repository import repository as medication_repository
+from bpl_web_backend.modules.profile.repository import repository as profile_repository
+from bpl_web_backend.revisions import Revision, revision_repository
+
+USER_ID = "00000000-0000-0000-0000-000000000001"
+
+
+def sample_data(rows):
+    """Build `rows` blood pressure logs, a medication list and a profile."""
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    logs = [
+        {"id": i, "user_id": USER_ID, "record_datetime": (start + timedelta(hours=i)).isoformat(),
+         "systolic": 110 + i % 30, "diastolic": 70 + i % 20, "heart_rate": 60 + i % 25, "notes": "after walk" if i % 7 == 0 else None}
+        for i in range(rows, 0, -1)
+    ]
+    medications = [
+        {"id": i, "user_id": USER_ID, "medicine_name": f"Medicine {i}", "dosage_mg": 10 * i, "quantity": "30",
+         "intake_time": ["Morning", "Evening"], "is_active": True, "notes": None}
+        for i in range(1, 21)
+    ]
+    profile = {"id": USER_ID, "user_id": USER_ID, "full_name": "Benchmark User", "nickname": "Bench",
+               "date_of_birth": "1980-01-01", "gender": "Other", "medical_conditions": "Hypertension"}
+    return logs, medications, profile
+
+
+def measure(client, path, accept_encoding, iterations):
+    """Return the median request time in milliseconds and the size of the body as sent."""
+    timings, size = [], 0
+    for _ in range(iterations):
+        began = time.perf_counter()
+        with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding}) as response:
+            size = len(b"".join(response.iter_raw()))
+        timings.append((time.perf_counter() - began) * 1000)
+    return statistics.median(timings), size
+
+
+def measure_serializers(payload, iterations):
+    """Median milliseconds to serialize `payload` with the stdlib encoder and with orjson."""
+    data = jsonable_encoder(payload)
+    results = []
+    for dumps in (lambda: json.dumps(data).encode(), lambda: orjson.dumps(data)):
+        timings = []
+        for _ in range(iterations):
+            began = time.perf_counter()
+            dumps()
+            timings.append((time.perf_counter() - began) * 1000)
+        results.append(statistics.median(timings))
+    return results
+
+
+def run(rows, iterations):
+    """Benchmark the read endpoints with in-memory data, one line per endpoint and coding."""
+    logs, medications, profile = sample_data(rows)
+    user = MagicMock(id=USER_ID)
+    app.dependency_overrides[get_current_user] = lambda: user
+    endpoints = {
+        f"/api/blood-pressure-logs?per_page={rows}": logs,
+        "/api/medications": medications,
+        "/api/user-profile": profile,
+    }
+    codings = ["identity"] + [coding for coding in ("gzip", "br", "zstd") if coding in ENCODERS]
+
+    with patch.object(bp_repository, "list_logs", AsyncMock(return_value=(logs, None))), \
+            patch.object(medication_repository, "list_medications", AsyncMock(return_value=medications)), \
+            patch.object(profile_repository, "get_profile", AsyncMock(return_value=profile)), \
+            patch.object(revision_repository, "get", AsyncMock(return_value=Revision(1))):
+        # Without the context manager the lifespan, and so the database pool, is not started
+        client = TestClient(app)
+        print(f"{'endpoint':<45} {'coding':<9} {'median ms':>10} {'bytes':>8}")
+        for path, payload in endpoints.items():
+            for coding in codings:
+                milliseconds, size = measure(client, path, coding, iterations)
+                print(f"{path:<45} {coding:<9} {milliseconds:>10.3f} {size:>8}")
+            stdlib, fast = measure_serializers(payload, iterations)
+            print(f"{'':<45} {'json':<9} {stdlib:>10.3f}   (serialization only)")
+            print(f"{'':<45} {'orjson':<9} {fast:>10.3f}   (serialization only)")
+    app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark serialization and compression of the read endpoints.")
+    parser.add_argument("--rows", type=int, default=100, help="Blood pressure logs per page")
+    parser.add_argument("--iterations", type=int, default=200, help="Requests per endpoint and coding")
+    args = parser.parse_args()
+    run(args.rows, args.iterations)
@@ -0,0 +1,99 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+# Add the project root to the Python path to allow importing the application
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bpl_web_backend.modules.blood_pressure_log.models import (
+    BLOOD_PRESSURE_LOG_ITEMS,
+    BLOOD_PRESSURE_RECORD_LIST,
+    BloodPressureRecordProjection,
+    BloodPressureRecordResponse,
+)
+from bpl_web_backend.modules.medications.models import MEDICATION_LIST, MedicationResponse
+
+
+def sample_rows(count):
+    """Rows as PostgREST returns them: ISO timestamps, all columns."""
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    logs = [
+        {"id": i, "user_id": "00000000-0000-0000-0000-000000000001", "record_datetime": (start + timedelta(minutes=i)).isoformat(),
+         "systolic": 110 + i % 30, "diastolic": 70 + i % 20, "heart_rate": 60 + i % 25, "notes": None,
+         "created_at": start.isoformat(), "updated_at": start.isoformat(), "revision": i}
+        for i in range(count)
+    ]
+    medications = [
+        {"id": i, "user_id": "00000000-0000-0000-0000-000000000001", "medicine_name": f"Medicine {i}", "dosage_mg": 10,
+         "quantity": "30", "intake_time": ["Morning"], "is_active": True, "notes": None}
+        for i in range(count)
+    ]
+    return logs, medications
+
+
+LOOP = asyncio.new_event_loop()
+
+
+def model_per_row_then_response_model(rows, model, response_type):
+    """The former path: one model per row, then FastAPI's response_model pass and JSON encoding."""
+    items = [model(**row) for row in rows]
+    field = create_response_field("response", response_type, mode="serialization")
+    content = LOOP.run_until_complete(serialize_response(field=field, response_content=items, exclude_unset=True))
+    return ORJSONResponse(content).body
+
+
+def bulk_adapter(rows, validate, dump):
+    """The current path: one bulk validation and one serialization in pydantic-core."""
+    return dump.dump_json(validate.validate_python(rows), exclude_unset=True)
+
+
+def measure(function, repeats):
+    """Return the best CPU milliseconds of `repeats` runs and the peak traced memory of one run."""
+    cpu = []
+    for _ in range(repeats):
+        began = time.process_time()
+        function()
+        cpu.append((time.process_time() - began) * 1000)
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(cpu), peak
+
+
+def run(rows, repeats):
+    """Compare the two paths per `rows` rows for the blood pressure and medication lists."""
+    logs, medications = sample_rows(rows)
+    cases = {
+        "blood pressure logs": (
+            lambda: model_per_row_then_response_model(logs, BloodPressureRecordResponse, List[BloodPressureRecordProjection]),
+            lambda: bulk_adapter(logs, BLOOD_PRESSURE_RECORD_LIST, BLOOD_PRESSURE_LOG_ITEMS),
+        ),
+        "medications": (
+            lambda: model_per_row_then_response_model(medications, MedicationResponse, List[MedicationResponse]),
+            lambda: bulk_adapter(medications, MEDICATION_LIST, MEDICATION_LIST),
+        ),
+    }
+    print(f"{rows} rows per list, best of {repeats} runs")
+    print(f"{'list':<20} {'path':<8} {'cpu ms':>8} {'peak KiB':>9}")
+    for name, (before, after) in cases.items():
+        for label, function in (("before", before), ("after", after)):
+            cpu, peak = measure(function, repeats)
+            print(f"{name:<20} {label:<8} {cpu:>8.2f} {peak / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-row models against bulk TypeAdapter validation of list responses.")
+    parser.add_argument("--rows", type=int, default=1000, help="Rows per list")
+    parser.add_argument("--repeats", type=int, default=20, help="Runs per path; the fastest is reported")
+    args = parser.parse_args()
+    run(args.rows, args.repeats)
@@ -0,0 +1,35 @@
+import argparse
+import asyncio
+import os
+import sys
+
+import asyncpg
+
+# Add the project root to the Python path to allow importing the application config
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bpl_web_backend.config import DATABASE_URL
+
+
+async def rebuild(user_id=None):
+    """Rebuild the blood pressure daily rollups of one user, or of every user."""
+    if not DATABASE_URL:
+        print("Error: DATABASE_URL must be set to rebuild rollups")
+        return 1
+
+    # Connects as the database owner: the rebuild function is not granted to API roles.
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        rebuilt = await conn.fetchval("SELECT public.rebuild_blood_pressure_daily_rollups($1::uuid)", user_id)
+    finally:
+        await conn.close()
+    scope = f"user {user_id}" if user_id else "all users"
+    print(f"Rebuilt {rebuilt} daily rollup rows for {scope}.")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill or repair the blood pressure daily rollup table.")
+    parser.add_argument("--user-id", help="Only rebuild this user's rollups")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(rebuild(args.user_id)))
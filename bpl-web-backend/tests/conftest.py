@@ -10,7 +10,10 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from bpl_web_backend.main import app
 from bpl_web_backend.dependencies import get_current_user
-from unittest.mock import MagicMock
+from bpl_web_backend.export_cache import ExportCache
+from bpl_web_backend.modules.blood_pressure_log.history import HistoryCache
+from bpl_web_backend.revisions import Revision, revision_repository
+from unittest.mock import AsyncMock, MagicMock, patch
 
 @pytest.fixture(scope="session")
 def client():
@@ -38,3 +41,31 @@ async def async_client():
     """Async Test Client for making API requests."""
     async with AsyncClient(app=app, base_url="http://test") as ac:
         yield ac
+
+@pytest.fixture(autouse=True)
+def export_cache(tmp_path):
+    """A fresh export cache per test, so no test is served another test's file."""
+    cache = ExportCache(directory=str(tmp_path / "exports"), max_bytes=10 * 1024 * 1024)
+    with patch('bpl_web_backend.modules.blood_pressure_log.services.export_cache', cache):
+        yield cache
+
+@pytest.fixture(autouse=True)
+def history_cache():
+    """A fresh history cache per test, so no test reads another test's readings."""
+    cache = HistoryCache(max_bytes=10 * 1024 * 1024)
+    with patch('bpl_web_backend.modules.blood_pressure_log.services.history_cache', cache):
+        yield cache
+
+@pytest.fixture(autouse=True)
+def data_revision():
+    """Data revisions read as 0 unless a test sets `return_value`."""
+    with patch.object(revision_repository, "get", AsyncMock(return_value=Revision(0))) as get:
+        yield get
+
+def make_logs(user_id, count, start_id=100):
+    """Build `count` consecutive records, newest first."""
+    return [
+        {"id": start_id - i, "user_id": user_id, "systolic": 120, "diastolic": 80, "heart_rate": 70, "notes": None,
+         "record_datetime": f"2024-01-{28 - i:02d}T08:00:00+00:00"}
+        for i in range(count)
+    ]
@@ -1,6 +1,6 @@
 from fastapi import status
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from datetime import datetime, timezone
 import json
 
@@ -27,7 +27,7 @@ def test_export_bp_logs_debug():
     mock_logs = [
         {"id": 1, "user_id": mock_user.id, "systolic": 120, "diastolic": 80, "heart_rate": 70, "notes": "Test 1", "record_datetime": datetime.now(timezone.utc).isoformat()}
     ]
-    mock_supabase.table.return_value.select.return_value.eq.return_value.order.return_value.execute.return_value = MagicMock(data=mock_logs)
+    mock_supabase.table.return_value.select.return_value.eq.return_value.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=mock_logs))
     
     # Create a mock response
     mock_response = MagicMock()
@@ -40,9 +40,9 @@ def test_export_bp_logs_debug():
     
     # Apply the patches manually
     import bpl_web_backend.modules.blood_pressure_log.services
-    original_supabase = bpl_web_backend.modules.blood_pressure_log.services.supabase
+    original_supabase = bpl_web_backend.modules.blood_pressure_log.repository.async_supabase
     
-    bpl_web_backend.modules.blood_pressure_log.services.supabase = mock_supabase
+    bpl_web_backend.modules.blood_pressure_log.repository.async_supabase = mock_supabase
     
     try:
         response = client.get("/api/blood-pressure-logs/export")
@@ -59,7 +59,7 @@ def test_export_bp_logs_debug():
         assert response.status_code == status.HTTP_200_OK
     finally:
         # Restore the original
-        bpl_web_backend.modules.blood_pressure_log.services.supabase = original_supabase
+        bpl_web_backend.modules.blood_pressure_log.repository.async_supabase = original_supabase
 
 if __name__ == "__main__":
     # Run the test directly
@@ -0,0 +1,100 @@
+from datetime import date, timedelta
+
+from fastapi import status
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from bpl_web_backend.modules.adherence.bitmaps import BITMAP_BYTES, day_index
+
+# All fixtures (client, auth_client, mock_user) are in conftest.py
+
+
+def bitmap(*days):
+    data = bytearray(BITMAP_BYTES)
+    for day in days:
+        data[day_index(day) // 8] |= 1 << (day_index(day) % 8)
+    return "\\x" + data.hex()
+
+
+@patch('bpl_web_backend.modules.adherence.repository.async_supabase')
+def test_mark_dose(mock_supabase, auth_client: TestClient, mock_user: MagicMock):
+    """A named intake time is normalized and the dose is marked through the database function."""
+    mock_supabase.rpc.return_value.execute = AsyncMock(return_value=MagicMock(data=[{"medication_id": 5}]))
+
+    response = auth_client.post("/api/medications/5/doses", json={"date": "2024-01-02", "slot": "Morning", "status": "missed"})
+
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    mock_supabase.rpc.assert_called_once_with("mark_medication_dose", {
+        "p_user_id": mock_user.id, "p_medication_id": 5, "p_slot": "08:00:00", "p_day": "2024-01-02", "p_taken": False,
+    })
+
+
+@patch('bpl_web_backend.modules.adherence.repository.async_supabase')
+def test_mark_dose_of_unknown_medication(mock_supabase, auth_client: TestClient):
+    mock_supabase.rpc.return_value.execute = AsyncMock(return_value=MagicMock(data=[]))
+
+    response = auth_client.post("/api/medications/99/doses", json={"date": "2024-01-02", "slot": "08:00", "status": "taken"})
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_mark_dose_rejects_unreadable_and_future_doses(auth_client: TestClient):
+    unreadable = auth_client.post("/api/medications/5/doses", json={"date": "2024-01-02", "slot": "Anytime", "status": "taken"})
+    future = auth_client.post("/api/medications/5/doses", json={"date": (date.today() + timedelta(days=2)).isoformat(), "slot": "08:00", "status": "taken"})
+
+    assert unreadable.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert future.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@patch('bpl_web_backend.modules.adherence.services._today', return_value=date(2024, 3, 10))
+@patch('bpl_web_backend.modules.adherence.repository.async_supabase')
+def test_get_adherence_reads_only_the_years_in_the_windows(mock_supabase, _today, auth_client: TestClient, mock_user: MagicMock):
+    rows = [{"medication_id": 5, "year": 2024, "taken": bitmap(date(2024, 3, 9), date(2024, 3, 10), date(2024, 2, 1)),
+             "missed": bitmap(date(2024, 3, 8))}]
+    query = mock_supabase.table.return_value.select.return_value.eq.return_value.in_.return_value
+    query.execute = AsyncMock(return_value=MagicMock(data=rows))
+
+    response = auth_client.get("/api/adherence")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == [{"medication_id": 5, "windows": [
+        {"days": 7, "taken": 2, "missed": 1, "adherence": 0.6667},
+        {"days": 30, "taken": 2, "missed": 1, "adherence": 0.6667},
+        {"days": 90, "taken": 3, "missed": 1, "adherence": 0.75},
+    ]}]
+    mock_supabase.table.return_value.select.return_value.eq.return_value.in_.assert_called_with("year", [2023, 2024])
+
+
+@patch('bpl_web_backend.modules.medications.repository.async_supabase')
+@patch('bpl_web_backend.modules.adherence.repository.async_supabase')
+def test_get_medication_adherence_without_marks(mock_supabase, mock_medications_supabase, auth_client: TestClient, mock_user: MagicMock):
+    query = mock_supabase.table.return_value.select.return_value.eq.return_value.in_.return_value.eq.return_value
+    query.execute = AsyncMock(return_value=MagicMock(data=[]))
+    medication = {"id": 5, "user_id": mock_user.id, "medicine_name": "Lisinopril", "intake_time": ["08:00"]}
+    mock_medications_supabase.table.return_value.select.return_value.eq.return_value.eq.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=[medication])
+    )
+
+    response = auth_client.get("/api/medications/5/adherence")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["windows"][0] == {"days": 7, "taken": 0, "missed": 0, "adherence": None}
+
+
+@patch('bpl_web_backend.modules.medications.repository.async_supabase')
+@patch('bpl_web_backend.modules.adherence.repository.async_supabase')
+def test_get_medication_adherence_of_unknown_medication(mock_supabase, mock_medications_supabase, auth_client: TestClient):
+    """A medication that does not exist or is another user's is a 404, not empty windows."""
+    query = mock_supabase.table.return_value.select.return_value.eq.return_value.in_.return_value.eq.return_value
+    query.execute = AsyncMock(return_value=MagicMock(data=[]))
+    mock_medications_supabase.table.return_value.select.return_value.eq.return_value.eq.return_value.execute = AsyncMock(
+        return_value=MagicMock(data=[])
+    )
+
+    response = auth_client.get("/api/medications/5/adherence")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_adherence_requires_auth(client: TestClient):
+    assert client.get("/api/adherence").status_code == status.HTTP_403_FORBIDDEN
@@ -1,8 +1,15 @@
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from postgrest.exceptions import APIError
 from datetime import datetime, timezone
 from fastapi import status
+import io
+import json
+import zipfile
+import pytest
+
+from bpl_web_backend.revisions import Revision
+from conftest import make_logs
 
 # All fixtures (client, auth_client, mock_user) are now in conftest.py
 
@@ -22,7 +29,7 @@ mock_xlsxwriter = MockXlsxwriter()
 
 # --- Test Cases ---
 
-@patch('bpl_web_backend.modules.blood_pressure_log.services.supabase')
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
 def test_create_bp_record_success(mock_supabase, auth_client: TestClient, mock_user: MagicMock):
     """Tests successful creation of a blood pressure record."""
     record_time = datetime.now(timezone.utc).isoformat()
@@ -34,7 +41,7 @@ def test_create_bp_record_success(mock_supabase, auth_client: TestClient, mock_u
         "notes": "Feeling good"
     }
     mock_db_response = {**bp_payload, "id": 1, "user_id": mock_user.id}
-    mock_supabase.table.return_value.insert.return_value.execute.return_value = MagicMock(data=[mock_db_response])
+    mock_supabase.table.return_value.insert.return_value.execute = AsyncMock(return_value=MagicMock(data=[mock_db_response]))
 
     response = auth_client.post("/api/blood-pressure-logs", json=bp_payload)
     
@@ -42,7 +49,7 @@ def test_create_bp_record_success(mock_supabase, auth_client: TestClient, mock_u
     response_data = response.json()
     assert response_data["systolic"] == 120
 
-@patch('bpl_web_backend.modules.blood_pressure_log.services.supabase')
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
 def test_get_bp_logs_success(mock_supabase, auth_client: TestClient, mock_user: MagicMock):
     """Tests successful retrieval of blood pressure logs."""
     time_now = datetime.now(timezone.utc).isoformat()
@@ -50,7 +57,7 @@ def test_get_bp_logs_success(mock_supabase, auth_client: TestClient, mock_user:
         {"id": 1, "user_id": mock_user.id, "systolic": 120, "diastolic": 80, "heart_rate": 70, "notes": "Test 1", "record_datetime": time_now},
         {"id": 2, "user_id": mock_user.id, "systolic": 125, "diastolic": 85, "heart_rate": 75, "notes": "Test 2", "record_datetime": time_now}
     ]
-    mock_supabase.table.return_value.select.return_value.eq.return_value.order.return_value.range.return_value.execute.return_value = MagicMock(data=mock_logs)
+    mock_supabase.table.return_value.select.return_value.eq.return_value.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=mock_logs))
 
     response = auth_client.get("/api/blood-pressure-logs")
 
@@ -58,10 +65,10 @@ def test_get_bp_logs_success(mock_supabase, auth_client: TestClient, mock_user:
     assert len(response.json()) == 2
     assert response.json()[0]['systolic'] == 120
 
-@patch('bpl_web_backend.modules.blood_pressure_log.services.supabase')
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
 def test_get_bp_logs_empty(mock_supabase, auth_client: TestClient):
     """Tests getting an empty list when no logs exist."""
-    mock_supabase.table.return_value.select.return_value.eq.return_value.order.return_value.range.return_value.execute.return_value = MagicMock(data=[])
+    mock_supabase.table.return_value.select.return_value.eq.return_value.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=[]))
     
     response = auth_client.get("/api/blood-pressure-logs")
     
@@ -74,76 +81,78 @@ def test_create_bp_record_validation_error(auth_client: TestClient):
     response = auth_client.post("/api/blood-pressure-logs", json=bp_payload)
     assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
 
-@patch('bpl_web_backend.modules.blood_pressure_log.services.supabase')
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
 def test_update_bp_record_success(mock_supabase, auth_client: TestClient, mock_user: MagicMock):
     """Tests successful update of a blood pressure record."""
     log_id = 1
     payload = {"notes": "Feeling good"}
     record_time = datetime.now(timezone.utc).isoformat()
     mock_data = {"id": log_id, "user_id": mock_user.id, "systolic": 120, "diastolic": 80, "heart_rate": 70, "record_datetime": record_time, **payload}
-    mock_supabase.table.return_value.update.return_value.eq.return_value.eq.return_value.execute.return_value = MagicMock(data=[mock_data])
+    mock_supabase.table.return_value.update.return_value.eq.return_value.eq.return_value.execute = AsyncMock(return_value=MagicMock(data=[mock_data]))
 
     response = auth_client.put(f"/api/blood-pressure-logs/{log_id}", json=payload)
 
     assert response.status_code == status.HTTP_200_OK
     assert response.json()["notes"] == "Feeling good"
 
-@patch('bpl_web_backend.modules.blood_pressure_log.services.supabase')
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
 def test_update_bp_record_not_found(mock_supabase, auth_client: TestClient):
     """Tests updating a non-existent record returns 404."""
-    mock_supabase.table.return_value.update.return_value.eq.return_value.eq.return_value.execute.return_value = MagicMock(data=[])
+    mock_supabase.table.return_value.update.return_value.eq.return_value.eq.return_value.execute = AsyncMock(return_value=MagicMock(data=[]))
 
     response = auth_client.put("/api/blood-pressure-logs/999", json={"systolic": 130})
     
     assert response.status_code == status.HTTP_404_NOT_FOUND
     assert response.json() == {"detail": "Log not found or no changes made"}
 
-@patch('bpl_web_backend.modules.blood_pressure_log.services.supabase')
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
 def test_update_bp_record_empty_payload(mock_supabase, auth_client: TestClient):
     """Tests that an update with an empty payload returns 422."""
     response = auth_client.put("/api/blood-pressure-logs/1", json={})
     assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
     assert response.json() == {"detail": "No fields to update"}
 
-@patch('bpl_web_backend.modules.blood_pressure_log.services.supabase')
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
 def test_delete_bp_record_success(mock_supabase, auth_client: TestClient):
     """Tests successful deletion of a blood pressure record."""
-    mock_supabase.table.return_value.delete.return_value.eq.return_value.eq.return_value.execute.return_value = MagicMock(data=[{"id": 1}])
+    mock_supabase.table.return_value.delete.return_value.eq.return_value.eq.return_value.execute = AsyncMock(return_value=MagicMock(data=[{"id": 1}]))
 
     response = auth_client.delete("/api/blood-pressure-logs/1")
     
     assert response.status_code == status.HTTP_204_NO_CONTENT
 
-@patch('bpl_web_backend.modules.blood_pressure_log.services.supabase')
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
 def test_delete_bp_record_not_found(mock_supabase, auth_client: TestClient, mock_user: MagicMock):
     """Tests deleting a non-existent record fails with 404."""
     log_id = 999
     # Simulate that the record to be deleted was not found
-    mock_supabase.table.return_value.delete.return_value.eq.return_value.eq.return_value.execute.return_value = MagicMock(data=[])
+    mock_supabase.table.return_value.delete.return_value.eq.return_value.eq.return_value.execute = AsyncMock(return_value=MagicMock(data=[]))
 
     response = auth_client.delete(f"/api/blood-pressure-logs/{log_id}")
 
     assert response.status_code == status.HTTP_404_NOT_FOUND
     assert response.json() == {"detail": "Log not found"}
 
-@patch('bpl_web_backend.modules.blood_pressure_log.services.supabase')
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
 def test_export_bp_logs_success(mock_supabase, auth_client: TestClient, mock_user: MagicMock):
     """Tests successful export of blood pressure logs."""
     mock_logs = [
         {"id": 1, "user_id": mock_user.id, "systolic": 120, "diastolic": 80, "heart_rate": 70, "notes": "Test 1", "record_datetime": datetime.now(timezone.utc).isoformat()}
     ]
-    mock_supabase.table.return_value.select.return_value.eq.return_value.order.return_value.execute.return_value = MagicMock(data=mock_logs)
+    mock_supabase.table.return_value.select.return_value.eq.return_value.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=mock_logs))
 
     response = auth_client.get("/api/blood-pressure-logs/export")
 
     assert response.status_code == status.HTTP_200_OK
     assert response.headers['content-type'] == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     assert 'attachment; filename=blood_pressure_logs.xlsx' in response.headers['content-disposition']
+    sheet = zipfile.ZipFile(io.BytesIO(response.content)).read("xl/worksheets/sheet1.xml").decode()
+    assert "record_datetime" in sheet and "Test 1" in sheet
 
-@patch('bpl_web_backend.modules.blood_pressure_log.services.supabase')
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
 def test_export_bp_logs_empty(mock_supabase, auth_client: TestClient):
     """Tests exporting when no logs exist returns an empty Excel file."""
-    mock_supabase.table.return_value.select.return_value.eq.return_value.order.return_value.execute.return_value = MagicMock(data=[])
+    mock_supabase.table.return_value.select.return_value.eq.return_value.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=[]))
 
     response = auth_client.get("/api/blood-pressure-logs/export")
 
@@ -151,22 +160,462 @@ def test_export_bp_logs_empty(mock_supabase, auth_client: TestClient):
     assert response.headers['content-type'] == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     assert 'attachment; filename=blood_pressure_logs.xlsx' in response.headers['content-disposition']
 
-@patch('bpl_web_backend.modules.blood_pressure_log.services.supabase')
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
 def test_api_error_handling(mock_supabase, auth_client: TestClient):
     """Tests that generic APIErrors return 500."""
-    mock_supabase.table.return_value.select.return_value.eq.return_value.order.return_value.range.return_value.execute.side_effect = APIError({"message": "DB connection failed"})
+    mock_supabase.table.return_value.select.return_value.eq.return_value.order.return_value.order.return_value.range.return_value.execute = AsyncMock(side_effect=APIError({"message": "DB connection failed"}))
     
     response = auth_client.get("/api/blood-pressure-logs")
     
     assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
     assert "Database error: DB connection failed" in response.json()["detail"]
 
-@patch('bpl_web_backend.modules.blood_pressure_log.services.supabase')
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
 def test_generic_exception_handling(mock_supabase, auth_client: TestClient):
     """Tests that generic Exceptions return 500."""
-    mock_supabase.table.return_value.select.return_value.eq.return_value.order.return_value.range.return_value.execute.side_effect = Exception("Something broke")
+    mock_supabase.table.return_value.select.return_value.eq.return_value.order.return_value.order.return_value.range.return_value.execute = AsyncMock(side_effect=Exception("Something broke"))
 
     response = auth_client.get("/api/blood-pressure-logs")
 
     assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
-    assert "An unexpected error occurred: Something broke" in response.json()["detail"]
\ No newline at end of file
+    assert "An unexpected error occurred: Something broke" in response.json()["detail"]
+# --- Keyset pagination ---
+
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
+def test_get_bp_logs_returns_next_cursor(mock_supabase, auth_client: TestClient, mock_user: MagicMock):
+    """A full page carries the cursor of the next page and no count is requested."""
+    query = mock_supabase.table.return_value.select.return_value.eq.return_value
+    query.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=make_logs(mock_user.id, 3)))
+
+    response = auth_client.get("/api/blood-pressure-logs?per_page=2")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [log["id"] for log in response.json()] == [100, 99]
+    assert "X-Next-Cursor" in response.headers
+    assert "X-Total-Count" not in response.headers
+    mock_supabase.table.return_value.select.assert_called_with("*", count=None)
+    query.order.return_value.order.return_value.range.assert_called_with(0, 2)
+
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
+def test_get_bp_logs_with_cursor(mock_supabase, auth_client: TestClient, mock_user: MagicMock):
+    """A cursor turns into a keyset filter instead of an offset."""
+    first_page = make_logs(mock_user.id, 3)
+    query = mock_supabase.table.return_value.select.return_value.eq.return_value
+    query.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=first_page))
+    cursor = auth_client.get("/api/blood-pressure-logs?per_page=2").headers["X-Next-Cursor"]
+
+    query.or_.return_value.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=first_page[2:]))
+    response = auth_client.get(f"/api/blood-pressure-logs?per_page=2&cursor={cursor}")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [log["id"] for log in response.json()] == [98]
+    assert "X-Next-Cursor" not in response.headers
+    keyset_filter = query.or_.call_args.args[0]
+    assert 'record_datetime.lt."2024-01-27T08:00:00+00:00"' in keyset_filter
+    assert "id.lt.99" in keyset_filter
+    query.or_.return_value.order.return_value.order.return_value.range.assert_called_with(0, 2)
+
+def test_get_bp_logs_invalid_cursor(auth_client: TestClient):
+    """A cursor that was not issued by the API is rejected."""
+    response = auth_client.get("/api/blood-pressure-logs?cursor=not-a-cursor")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json() == {"detail": "Invalid cursor"}
+
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
+def test_get_bp_logs_conditional(mock_supabase, auth_client: TestClient, mock_user: MagicMock, data_revision):
+    """Pages carry the logs revision as ETag; revalidating an unchanged page reads no records."""
+    data_revision.return_value = Revision(9, datetime(2024, 1, 28, 8, 0, tzinfo=timezone.utc))
+    execute = AsyncMock(return_value=MagicMock(data=make_logs(mock_user.id, 1)))
+    mock_supabase.table.return_value.select.return_value.eq.return_value.order.return_value.order.return_value.range.return_value.execute = execute
+
+    first = auth_client.get("/api/blood-pressure-logs")
+    second = auth_client.get("/api/blood-pressure-logs", headers={"If-None-Match": first.headers["ETag"]})
+
+    assert first.headers["ETag"] == 'W/"9-logs"'
+    assert first.headers["Last-Modified"] == "Sun, 28 Jan 2024 08:00:00 GMT"
+    assert second.status_code == status.HTTP_304_NOT_MODIFIED
+    assert execute.await_count == 1
+
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
+def test_get_bp_logs_include_count(mock_supabase, auth_client: TestClient, mock_user: MagicMock):
+    """The exact count is only requested, and returned, when asked for."""
+    query = mock_supabase.table.return_value.select.return_value.eq.return_value
+    query.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=make_logs(mock_user.id, 1), count=42))
+
+    response = auth_client.get("/api/blood-pressure-logs?include_count=true")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["X-Total-Count"] == "42"
+    mock_supabase.table.return_value.select.assert_called_with("*", count="exact")
+
+# --- Date range and field projection ---
+
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
+def test_get_bp_logs_date_range(mock_supabase, auth_client: TestClient, mock_user: MagicMock):
+    """`from` and `to` become a half-open record_datetime filter in the query."""
+    query = mock_supabase.table.return_value.select.return_value.eq.return_value
+    ranged = query.gte.return_value.lt.return_value
+    ranged.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=make_logs(mock_user.id, 2)))
+
+    response = auth_client.get("/api/blood-pressure-logs?from=2024-01-01T00:00:00Z&to=2024-02-01T00:00:00Z")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [log["id"] for log in response.json()] == [100, 99]
+    query.gte.assert_called_with("record_datetime", "2024-01-01T00:00:00+00:00")
+    query.gte.return_value.lt.assert_called_with("record_datetime", "2024-02-01T00:00:00+00:00")
+
+def test_get_bp_logs_invalid_date_range(auth_client: TestClient):
+    """A window whose start is not before its end is rejected."""
+    response = auth_client.get("/api/blood-pressure-logs?from=2024-02-01T00:00:00Z&to=2024-01-01T00:00:00Z")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
+def test_get_bp_logs_fields(mock_supabase, auth_client: TestClient, mock_user: MagicMock):
+    """Only the requested columns, plus id and record_datetime, are selected and returned."""
+    rows = [{"id": log["id"], "record_datetime": log["record_datetime"], "systolic": log["systolic"]} for log in make_logs(mock_user.id, 2)]
+    query = mock_supabase.table.return_value.select.return_value.eq.return_value
+    query.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=rows))
+
+    response = auth_client.get("/api/blood-pressure-logs?fields=systolic")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()[0] == {"id": 100, "record_datetime": "2024-01-28T08:00:00Z", "systolic": 120}
+    mock_supabase.table.return_value.select.assert_called_with("id,record_datetime,systolic", count=None)
+
+def test_get_bp_logs_unknown_field(auth_client: TestClient):
+    """Requesting a column that is not part of a record is rejected."""
+    response = auth_client.get("/api/blood-pressure-logs?fields=systolic,user_id")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json() == {"detail": "Unknown fields: user_id"}
+
+# --- Summary ---
+
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
+def test_get_bp_summary(mock_supabase, auth_client: TestClient, mock_user: MagicMock):
+    """Readings are fetched with only the needed columns and aggregated per bucket."""
+    query = mock_supabase.table.return_value.select.return_value.eq.return_value
+    query.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=make_logs(mock_user.id, 3)))
+
+    response = auth_client.get("/api/blood-pressure-logs/summary?bucket=month&tz=Asia/Bangkok")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == [{
+        "bucket_start": "2024-01-01T00:00:00+07:00",
+        "count": 3,
+        "systolic": {"mean": 120.0, "min": 120, "max": 120},
+        "diastolic": {"mean": 80.0, "min": 80, "max": 80},
+        "heart_rate": {"mean": 70.0, "min": 70, "max": 70},
+    }]
+    mock_supabase.table.return_value.select.assert_called_with("id,record_datetime,systolic,diastolic,heart_rate", count=None)
+
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
+def test_get_bp_series(mock_supabase, auth_client: TestClient, mock_user: MagicMock):
+    """Each measurement is reduced to `points` readings, oldest first, and only the needed columns are read."""
+    records = make_logs(mock_user.id, 20)
+    records[7]["systolic"] = 180
+    query = mock_supabase.table.return_value.select.return_value.eq.return_value
+    query.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=records))
+
+    response = auth_client.get("/api/blood-pressure-logs/series?points=5")
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["total"] == 20
+    assert len(data["systolic"]["value"]) == len(data["systolic"]["record_datetime"]) == 5
+    assert data["systolic"]["record_datetime"][0].startswith("2024-01-09T08:00:00")
+    assert data["systolic"]["record_datetime"][-1].startswith("2024-01-28T08:00:00")
+    assert 180 in data["systolic"]["value"]
+    mock_supabase.table.return_value.select.assert_called_with("id,record_datetime,systolic,diastolic,heart_rate", count=None)
+
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
+def test_get_bp_series_from_cached_history(mock_supabase, auth_client: TestClient, mock_user: MagicMock, data_revision):
+    """Repeat reads use the cached history, and a new reading is added to it without a refetch."""
+    data_revision.return_value = Revision(3)
+    execute = AsyncMock(return_value=MagicMock(data=make_logs(mock_user.id, 3)))
+    mock_supabase.table.return_value.select.return_value.eq.return_value.order.return_value.order.return_value.range.return_value.execute = execute
+    auth_client.get("/api/blood-pressure-logs/series")
+
+    created = {"id": 101, "user_id": mock_user.id, "record_datetime": "2024-01-29T08:00:00+00:00", "systolic": 150,
+               "diastolic": 95, "heart_rate": 80, "notes": None, "revision": 4}
+    mock_supabase.table.return_value.insert.return_value.execute = AsyncMock(return_value=MagicMock(data=[created]))
+    auth_client.post("/api/blood-pressure-logs", json={"record_datetime": "2024-01-29T08:00:00Z", "systolic": 150, "diastolic": 95, "heart_rate": 80})
+    data_revision.return_value = Revision(4)
+    response = auth_client.get("/api/blood-pressure-logs/series")
+
+    assert execute.await_count == 1
+    assert response.json()["total"] == 4
+    assert response.json()["systolic"]["value"][-1] == 150
+
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
+def test_get_bp_analytics(mock_supabase, auth_client: TestClient, mock_user: MagicMock):
+    """Each reading in the window is classified, flagged and given its rolling statistics."""
+    records = make_logs(mock_user.id, 3)
+    records[0].update(systolic=150, diastolic=95)
+    query = mock_supabase.table.return_value.select.return_value.eq.return_value
+    query.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=records))
+
+    response = auth_client.get("/api/blood-pressure-logs/analytics?from=2024-01-27T00:00:00Z")
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["total"] == 2
+    assert data["id"] == [99, 100]
+    assert data["category"] == ["stage_1", "stage_2"]
+    assert data["categories"]["stage_2"] == 1
+    assert data["jump"] == [False, True]
+    # The first reading of the window still averages over the reading before it.
+    assert data["systolic"]["mean"] == [120.0, 130.0]
+    assert data["systolic"]["arv"] == [0.0, 15.0]
+
+def test_get_bp_series_points_out_of_range(auth_client: TestClient):
+    response = auth_client.get("/api/blood-pressure-logs/series?points=2")
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+def test_get_bp_summary_unknown_timezone(auth_client: TestClient):
+    """An unknown timezone is rejected before any query runs."""
+    response = auth_client.get("/api/blood-pressure-logs/summary?tz=Mars/Olympus")
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_get_bp_summary_invalid_bucket(auth_client: TestClient):
+    """Only day, week and month buckets are supported."""
+    response = auth_client.get("/api/blood-pressure-logs/summary?bucket=hour")
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+# --- Latest reading and daily rollups ---
+
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
+def test_get_latest_bp_log(mock_supabase, auth_client: TestClient, mock_user: MagicMock):
+    """Without rollups the newest record comes from a one-row page."""
+    query = mock_supabase.table.return_value.select.return_value.eq.return_value
+    query.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=make_logs(mock_user.id, 1)))
+
+    response = auth_client.get("/api/blood-pressure-logs/latest")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["id"] == 100
+    query.order.return_value.order.return_value.range.assert_called_with(0, 0)
+
+@patch('bpl_web_backend.modules.blood_pressure_log.services.BP_ROLLUPS_ENABLED', True)
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
+def test_get_latest_bp_log_from_rollups(mock_supabase, auth_client: TestClient):
+    """With rollups enabled the newest reading is a single rollup row."""
+    rollup = {"latest_record_id": 7, "latest_record_datetime": "2024-01-28T08:00:00+00:00",
+              "latest_systolic": 118, "latest_diastolic": 76, "latest_heart_rate": 64}
+    query = mock_supabase.table.return_value.select.return_value.eq.return_value
+    query.order.return_value.limit.return_value.execute = AsyncMock(return_value=MagicMock(data=[rollup]))
+
+    response = auth_client.get("/api/blood-pressure-logs/latest")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"id": 7, "record_datetime": "2024-01-28T08:00:00Z", "systolic": 118, "diastolic": 76, "heart_rate": 64}
+    mock_supabase.table.assert_called_with("blood_pressure_daily_rollups")
+
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
+def test_get_latest_bp_log_none(mock_supabase, auth_client: TestClient):
+    """A user without records gets 404."""
+    query = mock_supabase.table.return_value.select.return_value.eq.return_value
+    query.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=[]))
+
+    response = auth_client.get("/api/blood-pressure-logs/latest")
+
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+@patch('bpl_web_backend.modules.blood_pressure_log.services.BP_ROLLUPS_ENABLED', True)
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
+def test_get_bp_summary_from_rollups(mock_supabase, auth_client: TestClient):
+    """A UTC summary reads daily rollups instead of every record."""
+    rollup = {"day": "2024-01-02", "record_count": 2,
+              "systolic_sum": 250, "systolic_min": 120, "systolic_max": 130,
+              "diastolic_sum": 160, "diastolic_min": 80, "diastolic_max": 80,
+              "heart_rate_sum": 140, "heart_rate_min": 70, "heart_rate_max": 70}
+    query = mock_supabase.table.return_value.select.return_value.eq.return_value
+    query.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=[rollup]))
+
+    response = auth_client.get("/api/blood-pressure-logs/summary?bucket=month")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()[0]["count"] == 2
+    assert response.json()[0]["systolic"] == {"mean": 125.0, "min": 120, "max": 130}
+    mock_supabase.table.assert_called_with("blood_pressure_daily_rollups")
+
+# --- Bulk create ---
+
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
+def test_create_bp_batch(mock_supabase, auth_client: TestClient, mock_user: MagicMock):
+    """Valid readings go out in one upsert; duplicates and invalid items are reported per index."""
+    payload = [
+        {"record_datetime": "2024-01-01T08:00:00Z", "systolic": 120, "diastolic": 80, "heart_rate": 70},
+        {"record_datetime": "2024-01-01T20:00:00Z", "systolic": 125, "diastolic": 82, "heart_rate": 72},
+        {"record_datetime": "2024-01-01T08:00:00+00:00", "systolic": 121, "diastolic": 80, "heart_rate": 70},
+        {"record_datetime": "2024-01-02T08:00:00Z", "systolic": "high"},
+    ]
+    # The second reading was already uploaded, so only the first is inserted.
+    inserted = [{"id": 11, "user_id": mock_user.id, "systolic": 120, "diastolic": 80, "heart_rate": 70, "notes": None,
+                 "record_datetime": "2024-01-01T08:00:00+00:00"}]
+    mock_supabase.table.return_value.upsert.return_value.execute = AsyncMock(return_value=MagicMock(data=inserted))
+
+    response = auth_client.post("/api/blood-pressure-logs/batch", json=payload)
+
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert (body["created"], body["duplicates"], body["invalid"]) == (1, 2, 1)
+    assert [(item["index"], item["status"], item["id"]) for item in body["items"]] == [
+        (0, "created", 11), (1, "duplicate", None), (2, "duplicate", None), (3, "invalid", None),
+    ]
+    assert {error["loc"][0] for error in body["items"][3]["errors"]} == {"systolic", "diastolic", "heart_rate"}
+    rows = mock_supabase.table.return_value.upsert.call_args.args[0]
+    assert len(rows) == 2 and all(row["user_id"] == mock_user.id for row in rows)
+    assert mock_supabase.table.return_value.upsert.call_args.kwargs == {"on_conflict": "user_id,record_datetime", "ignore_duplicates": True}
+
+def test_create_bp_batch_too_large(auth_client: TestClient):
+    """Oversized batches are refused before anything is inserted."""
+    payload = [{"record_datetime": "2024-01-01T08:00:00Z", "systolic": 120, "diastolic": 80, "heart_rate": 70}] * 1001
+
+    response = auth_client.post("/api/blood-pressure-logs/batch", json=payload)
+
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
+def test_create_bp_record_duplicate(mock_supabase, auth_client: TestClient):
+    """A single reading at an already recorded time is a conflict."""
+    mock_supabase.table.return_value.insert.return_value.execute = AsyncMock(side_effect=APIError({"message": "duplicate key", "code": "23505"}))
+
+    response = auth_client.post("/api/blood-pressure-logs", json={"record_datetime": "2024-01-01T08:00:00Z", "systolic": 120, "diastolic": 80, "heart_rate": 70})
+
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+# --- Streaming export ---
+
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.FETCH_CHUNK_SIZE', 2)
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
+def test_export_bp_logs_csv_in_chunks(mock_supabase, auth_client: TestClient, mock_user: MagicMock):
+    """The export pages through the table with keyset cursors and streams CSV rows."""
+    logs = make_logs(mock_user.id, 3)
+    query = mock_supabase.table.return_value.select.return_value.eq.return_value
+    query.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=logs[:2]))
+    query.or_.return_value.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=logs[2:]))
+
+    response = auth_client.get("/api/blood-pressure-logs/export?format=csv")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers['content-type'] == 'text/csv; charset=utf-8'
+    assert 'attachment; filename=blood_pressure_logs.csv' in response.headers['content-disposition']
+    lines = response.content.decode("utf-8-sig").splitlines()
+    assert lines[0] == "id,record_datetime,systolic,diastolic,heart_rate,notes"
+    assert [line.split(",")[0] for line in lines[1:]] == ["100", "99", "98"]
+    assert "id.lt.99" in query.or_.call_args.args[0]
+
+def test_export_bp_logs_unknown_format(auth_client: TestClient):
+    """Only the supported formats are accepted."""
+    response = auth_client.get("/api/blood-pressure-logs/export?format=pdf")
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
+def test_export_bp_logs_ndjson(mock_supabase, auth_client: TestClient, mock_user: MagicMock):
+    """NDJSON carries one record per line."""
+    query = mock_supabase.table.return_value.select.return_value.eq.return_value
+    query.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=make_logs(mock_user.id, 2)))
+
+    response = auth_client.get("/api/blood-pressure-logs/export?format=ndjson")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0] == {"id": 100, "record_datetime": "2024-01-28T08:00:00+00:00", "systolic": 120, "diastolic": 80, "heart_rate": 70, "notes": None}
+    assert len(lines) == 2
+
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
+def test_export_bp_logs_parquet(mock_supabase, auth_client: TestClient, mock_user: MagicMock):
+    """Parquet keeps timestamps and integer vitals typed."""
+    pq = pytest.importorskip("pyarrow.parquet")
+    query = mock_supabase.table.return_value.select.return_value.eq.return_value
+    query.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=make_logs(mock_user.id, 2)))
+
+    response = auth_client.get("/api/blood-pressure-logs/export?format=parquet")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert 'attachment; filename=blood_pressure_logs.parquet' in response.headers['content-disposition']
+    table = pq.read_table(io.BytesIO(response.content))
+    assert str(table.schema.field("record_datetime").type) == "timestamp[us, tz=UTC]"
+    assert str(table.schema.field("systolic").type) == "int32"
+    assert table.column("id").to_pylist() == [100, 99]
+
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
+def test_export_bp_logs_arrow(mock_supabase, auth_client: TestClient, mock_user: MagicMock):
+    """The Arrow IPC stream decodes to the exported records."""
+    pa = pytest.importorskip("pyarrow")
+    query = mock_supabase.table.return_value.select.return_value.eq.return_value
+    query.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=make_logs(mock_user.id, 2)))
+
+    response = auth_client.get("/api/blood-pressure-logs/export?format=arrow")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers['content-type'] == 'application/vnd.apache.arrow.stream'
+    assert pa.ipc.open_stream(response.content).read_all().num_rows == 2
+
+# --- Export cache and ETags ---
+
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
+def test_export_served_from_cache_until_revision_changes(mock_supabase, auth_client: TestClient, mock_user: MagicMock, data_revision):
+    """A repeat export of an unchanged revision does not query the records again."""
+    data_revision.return_value = Revision(5)
+    execute = AsyncMock(return_value=MagicMock(data=make_logs(mock_user.id, 2)))
+    mock_supabase.table.return_value.select.return_value.eq.return_value.order.return_value.order.return_value.range.return_value.execute = execute
+
+    first = auth_client.get("/api/blood-pressure-logs/export?format=csv")
+    second = auth_client.get("/api/blood-pressure-logs/export?format=csv")
+
+    assert first.headers["ETag"] == 'W/"5-csv"'
+    assert second.status_code == status.HTTP_200_OK
+    assert second.content == first.content
+    assert execute.await_count == 1
+
+    data_revision.return_value = Revision(6)
+    third = auth_client.get("/api/blood-pressure-logs/export?format=csv")
+    assert third.headers["ETag"] == 'W/"6-csv"'
+    assert execute.await_count == 2
+
+def test_export_not_modified(auth_client: TestClient, data_revision):
+    """A client holding the current export gets 304 without a rebuild."""
+    data_revision.return_value = Revision(5)
+
+    response = auth_client.get("/api/blood-pressure-logs/export", headers={"If-None-Match": 'W/"5-xlsx"'})
+
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["ETag"] == 'W/"5-xlsx"'
+
+@patch('bpl_web_backend.modules.medications.repository.async_supabase')
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
+def test_get_bp_medication_effects(mock_supabase, mock_medications_supabase, auth_client: TestClient, mock_user: MagicMock):
+    """Each medication change is reported with the readings in the windows before and after it."""
+    records = make_logs(mock_user.id, 10)
+    for record in records[:5]:
+        record.update(systolic=130)
+    query = mock_supabase.table.return_value.select.return_value.eq.return_value
+    query.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=records))
+    periods = [{"medication_id": 7, "medicine_name": "Amlodipine", "dosage_mg": 5, "intake_time": ["08:00"],
+                "valid_from": "2024-01-23T12:00:00+00:00", "valid_to": None}]
+    query = mock_medications_supabase.table.return_value.select.return_value.eq.return_value
+    query.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=periods))
+
+    response = auth_client.get("/api/blood-pressure-logs/medication-effects?window_days=3")
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["window_days"] == 3
+    effect, = data["effects"]
+    assert effect["change"] == "start" and effect["dosage_after"] == 5
+    assert (effect["readings_before"], effect["readings_after"]) == (3, 3)
+    assert effect["systolic"]["before"]["mean"] == 120.0
+    assert effect["systolic"]["after"]["mean"] == 130.0
+    assert effect["systolic"]["mean_difference"] == 10.0
+
+def test_get_bp_medication_effects_window_out_of_range(auth_client: TestClient):
+    response = auth_client.get("/api/blood-pressure-logs/medication-effects?window_days=0")
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
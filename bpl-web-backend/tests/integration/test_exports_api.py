@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock, AsyncMock
+from postgrest.exceptions import APIError
+
+from bpl_web_backend.modules.exports.jobs import export_jobs
+from bpl_web_backend.modules.exports.worker import export_runner
+from conftest import make_logs
+
+# All fixtures (client, auth_client, mock_user) are in conftest.py
+
+
+@pytest.fixture(autouse=True)
+def job_dir(tmp_path):
+    """Write job files to a per-test directory."""
+    with patch.object(export_jobs, "directory", str(tmp_path / "jobs")):
+        yield tmp_path / "jobs"
+
+
+def run_export_worker():
+    """Build every queued job, as the export worker process does."""
+    async def run():
+        await asyncio.gather(*await export_runner.run_pending())
+    asyncio.run(run())
+
+
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
+def test_export_job_completes_and_downloads(mock_supabase, auth_client: TestClient, mock_user: MagicMock):
+    """A queued job reports progress, then hands the file over for download."""
+    query = mock_supabase.table.return_value.select.return_value.eq.return_value
+    query.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=make_logs(mock_user.id, 2), count=2))
+
+    response = auth_client.post("/api/exports", json={"format": "csv"})
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert response.json()["status"] == "queued"
+    run_export_worker()
+    job = auth_client.get(f"/api/exports/{response.json()['id']}").json()
+    assert job["status"] == "completed"
+    assert (job["progress"], job["rows_written"], job["total_rows"]) == (1.0, 2, 2)
+
+    download = auth_client.get(job["download_url"])
+    assert download.status_code == status.HTTP_200_OK
+    assert 'filename="blood_pressure_logs.csv"' in download.headers["content-disposition"]
+    assert download.content.decode("utf-8-sig").splitlines()[0].startswith("id,record_datetime")
+    assert [j["id"] for j in auth_client.get("/api/exports").json()] == [job["id"]]
+
+
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
+def test_export_job_failure_is_reported(mock_supabase, auth_client: TestClient):
+    """A database error fails the job instead of the request."""
+    query = mock_supabase.table.return_value.select.return_value.eq.return_value
+    query.order.return_value.order.return_value.range.return_value.execute = AsyncMock(side_effect=APIError({"message": "DB down"}))
+
+    job_id = auth_client.post("/api/exports", json={"format": "csv"}).json()["id"]
+    run_export_worker()
+    job = auth_client.get(f"/api/exports/{job_id}").json()
+
+    assert job["status"] == "failed"
+    assert job["error"] == "Database error: DB down"
+    assert auth_client.get(f"/api/exports/{job_id}/download").status_code == status.HTTP_409_CONFLICT
+
+
+def test_export_job_not_found(auth_client: TestClient):
+    """Unknown job ids, or other users' jobs, are 404."""
+    assert auth_client.get("/api/exports/missing").status_code == status.HTTP_404_NOT_FOUND
+    assert auth_client.delete("/api/exports/missing").status_code == status.HTTP_404_NOT_FOUND
+
+
+@patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase')
+def test_export_job_can_be_deleted(mock_supabase, auth_client: TestClient, mock_user: MagicMock, job_dir):
+    """Deleting a finished job removes it and its file."""
+    query = mock_supabase.table.return_value.select.return_value.eq.return_value
+    query.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=make_logs(mock_user.id, 1), count=1))
+    job_id = auth_client.post("/api/exports", json={"format": "ndjson"}).json()["id"]
+    run_export_worker()
+
+    assert auth_client.delete(f"/api/exports/{job_id}").status_code == status.HTTP_204_NO_CONTENT
+    assert auth_client.get(f"/api/exports/{job_id}").status_code == status.HTTP_404_NOT_FOUND
+    assert [path.name for path in job_dir.rglob("*") if path.is_file()] == [".lock"]
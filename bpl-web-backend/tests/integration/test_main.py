@@ -1,6 +1,6 @@
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from postgrest.exceptions import APIError
 from fastapi import status, HTTPException
 from gotrue.types import User
@@ -21,15 +21,15 @@ def test_read_root(auth_client: TestClient):
 
 # --- Profile Creation (POST) Tests ---
 
-@patch('bpl_web_backend.modules.profile.services.supabase')
+@patch('bpl_web_backend.modules.profile.repository.async_supabase')
 def test_create_profile_success(mock_supabase, auth_client: TestClient, mock_user):
     """Tests successful creation of a new user profile."""
-    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute.return_value = MagicMock(data=None)
+    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute = AsyncMock(return_value=MagicMock(data=None))
     
     profile_payload = UserProfile(full_name="New User", date_of_birth="2000-01-01", gender="Male")
     # Ensure the mock 'id' is a string to match the UserProfileResponse model
     mock_data = {"id": "a-string-id", "user_id": mock_user.id, **profile_payload.model_dump()}
-    mock_supabase.table.return_value.insert.return_value.execute.return_value = MagicMock(data=[mock_data])
+    mock_supabase.table.return_value.insert.return_value.execute = AsyncMock(return_value=MagicMock(data=[mock_data]))
 
     response = auth_client.post("/api/user-profile", json=profile_payload.model_dump())
 
@@ -37,16 +37,16 @@ def test_create_profile_success(mock_supabase, auth_client: TestClient, mock_use
     assert response.json()["full_name"] == "New User"
     assert response.json()["id"] == "a-string-id"
 
-@patch('bpl_web_backend.modules.profile.services.supabase')
+@patch('bpl_web_backend.modules.profile.repository.async_supabase')
 def test_create_profile_already_exists(mock_supabase, auth_client: TestClient, mock_user):
     """Tests that creating a profile that already exists fails with 409 Conflict."""
     # First check returns None (profile doesn't exist), then insert fails with unique violation
-    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute.return_value = MagicMock(data=None)
-    mock_supabase.table.return_value.insert.return_value.execute.side_effect = APIError({
+    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute = AsyncMock(return_value=MagicMock(data=None))
+    mock_supabase.table.return_value.insert.return_value.execute = AsyncMock(side_effect=APIError({
         "message": "duplicate key value violates unique constraint",
         "details": "(user_id) already exists. (code: 23505)",
         "code": "23505"
-    })
+    }))
 
     profile_payload = UserProfile(full_name="Duplicate User", date_of_birth="2000-01-01", gender="Female")
     response = auth_client.post("/api/user-profile", json=profile_payload.model_dump())
@@ -54,12 +54,12 @@ def test_create_profile_already_exists(mock_supabase, auth_client: TestClient, m
     assert response.status_code == status.HTTP_409_CONFLICT
     assert response.json() == {"detail": "User profile already exists."}
 
-@patch('bpl_web_backend.modules.profile.services.supabase')
+@patch('bpl_web_backend.modules.profile.repository.async_supabase')
 def test_create_profile_api_error(mock_supabase, auth_client: TestClient):
     """Tests that an APIError during profile creation is handled."""
-    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute.return_value = MagicMock(data=None)
+    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute = AsyncMock(return_value=MagicMock(data=None))
     # Correctly mock APIError with a string message
-    mock_supabase.table.return_value.insert.return_value.execute.side_effect = APIError({"message": "DB insert error"})
+    mock_supabase.table.return_value.insert.return_value.execute = AsyncMock(side_effect=APIError({"message": "DB insert error"}))
 
     profile_payload = UserProfile(full_name="Error User", date_of_birth="2000-01-01", gender="Other")
     response = auth_client.post("/api/user-profile", json=profile_payload.model_dump())
@@ -69,7 +69,7 @@ def test_create_profile_api_error(mock_supabase, auth_client: TestClient):
 
 # --- Profile Update (PUT) Tests ---
 
-@patch('bpl_web_backend.modules.profile.services.supabase')
+@patch('bpl_web_backend.modules.profile.repository.async_supabase')
 def test_update_profile_success(mock_supabase, auth_client: TestClient, mock_user):
     """Tests the successful update of a user profile."""
     profile_payload = UpdateUserProfile(nickname="Updated Nick")
@@ -83,18 +83,18 @@ def test_update_profile_success(mock_supabase, auth_client: TestClient, mock_use
         "medical_conditions": "None"
     }
     
-    mock_supabase.table.return_value.update.return_value.eq.return_value.execute.return_value = MagicMock(data=[updated_data])
+    mock_supabase.table.return_value.update.return_value.eq.return_value.execute = AsyncMock(return_value=MagicMock(data=[updated_data]))
 
     response = auth_client.put("/api/user-profile", json=profile_payload.model_dump(exclude_unset=True))
 
     assert response.status_code == status.HTTP_200_OK
     assert response.json()['nickname'] == 'Updated Nick'
 
-@patch('bpl_web_backend.modules.profile.services.supabase')
+@patch('bpl_web_backend.modules.profile.repository.async_supabase')
 def test_update_profile_not_found(mock_supabase, auth_client: TestClient, mock_user):
     """Tests that updating a non-existent profile fails with 404 Not Found."""
     # Mock the response with empty data array
-    mock_supabase.table.return_value.update.return_value.eq.return_value.execute.return_value = MagicMock(data=[])
+    mock_supabase.table.return_value.update.return_value.eq.return_value.execute = AsyncMock(return_value=MagicMock(data=[]))
     
     # Create a custom test client with direct dependency override
     from fastapi import Depends
@@ -133,7 +133,7 @@ def test_update_profile_not_found(mock_supabase, auth_client: TestClient, mock_u
                     route.endpoint = original_handler
                     break
 
-@patch('bpl_web_backend.modules.profile.services.supabase')
+@patch('bpl_web_backend.modules.profile.repository.async_supabase')
 def test_update_profile_empty_payload(mock_supabase, auth_client: TestClient, mock_user):
     """Tests that sending an empty payload for profile update fails with 422 Unprocessable Entity."""
     # Create a custom test client with direct dependency override
@@ -173,10 +173,10 @@ def test_update_profile_empty_payload(mock_supabase, auth_client: TestClient, mo
                     route.endpoint = original_handler
                     break
 
-@patch('bpl_web_backend.modules.profile.services.supabase')
+@patch('bpl_web_backend.modules.profile.repository.async_supabase')
 def test_update_profile_api_error(mock_supabase, auth_client: TestClient):
     """Tests that an APIError during profile update is handled."""
-    mock_supabase.table.return_value.update.return_value.eq.return_value.execute.side_effect = APIError({"message": "DB connection error"})
+    mock_supabase.table.return_value.update.return_value.eq.return_value.execute = AsyncMock(side_effect=APIError({"message": "DB connection error"}))
 
     profile_payload = UpdateUserProfile(nickname="ErrorProne")
     response = auth_client.put("/api/user-profile", json=profile_payload.model_dump(exclude_unset=True))
@@ -184,11 +184,11 @@ def test_update_profile_api_error(mock_supabase, auth_client: TestClient):
     assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
     assert "DB connection error" in response.json()["detail"]
 
-@patch('bpl_web_backend.modules.profile.services.supabase')
+@patch('bpl_web_backend.modules.profile.repository.async_supabase')
 def test_create_profile_generic_exception(mock_supabase, auth_client: TestClient):
     """Tests that a generic Exception during profile creation is handled."""
-    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute.return_value = MagicMock(data=None)
-    mock_supabase.table.return_value.insert.return_value.execute.side_effect = Exception("Something broke")
+    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute = AsyncMock(return_value=MagicMock(data=None))
+    mock_supabase.table.return_value.insert.return_value.execute = AsyncMock(side_effect=Exception("Something broke"))
 
     profile_payload = UserProfile(full_name="Error User", date_of_birth="2000-01-01", gender="Other")
     response = auth_client.post("/api/user-profile", json=profile_payload.model_dump())
@@ -196,10 +196,10 @@ def test_create_profile_generic_exception(mock_supabase, auth_client: TestClient
     assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
     assert "Something broke" in response.json()["detail"]
 
-@patch('bpl_web_backend.modules.profile.services.supabase')
+@patch('bpl_web_backend.modules.profile.repository.async_supabase')
 def test_update_profile_generic_exception(mock_supabase, auth_client: TestClient):
     """Tests that a generic Exception during profile update is handled."""
-    mock_supabase.table.return_value.update.return_value.eq.return_value.execute.side_effect = Exception("Something went wrong")
+    mock_supabase.table.return_value.update.return_value.eq.return_value.execute = AsyncMock(side_effect=Exception("Something went wrong"))
 
     profile_payload = UpdateUserProfile(nickname="Unlucky")
     response = auth_client.put("/api/user-profile", json=profile_payload.model_dump(exclude_unset=True))
@@ -209,21 +209,21 @@ def test_update_profile_generic_exception(mock_supabase, auth_client: TestClient
 
 # --- Profile Get (GET) Tests ---
 
-@patch('bpl_web_backend.modules.profile.services.supabase')
+@patch('bpl_web_backend.modules.profile.repository.async_supabase')
 def test_get_profile_success(mock_supabase, auth_client: TestClient, mock_user):
     """Tests the successful retrieval of a user profile."""
     profile_data = {"id": "profile-123", "user_id": mock_user.id, "full_name": "Test User", "gender": "Other", "date_of_birth": "2000-01-01"}
-    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute.return_value = MagicMock(data=profile_data)
+    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute = AsyncMock(return_value=MagicMock(data=profile_data))
 
     response = auth_client.get("/api/user-profile")
 
     assert response.status_code == status.HTTP_200_OK
     assert response.json()["full_name"] == "Test User"
 
-@patch('bpl_web_backend.modules.profile.services.supabase')
+@patch('bpl_web_backend.modules.profile.repository.async_supabase')
 def test_get_profile_not_found(mock_supabase, auth_client: TestClient):
     """Tests that retrieving a non-existent profile fails with 404 Not Found."""
-    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute.side_effect = APIError({"message": "PGRST116", "details": "Row does not exist", "code": "PGRST116"})
+    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute = AsyncMock(side_effect=APIError({"message": "PGRST116", "details": "Row does not exist", "code": "PGRST116"}))
 
     response = auth_client.get("/api/user-profile")
 
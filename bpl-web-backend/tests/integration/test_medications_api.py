@@ -1,11 +1,13 @@
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from fastapi.testclient import TestClient
 from fastapi import status
 from postgrest.exceptions import APIError
+from datetime import datetime, timezone
 
 from bpl_web_backend.main import app
 from bpl_web_backend.dependencies import get_current_user
+from bpl_web_backend.revisions import Revision
 
 
 @pytest.fixture
@@ -27,7 +29,7 @@ def client(mock_user):
 
 # --- Test Cases for GET /medications ---
 
-@patch('bpl_web_backend.modules.medications.services.supabase')
+@patch('bpl_web_backend.modules.medications.repository.async_supabase')
 def test_get_medications_success(mock_supabase, client, mock_user):
     """Test successful retrieval of medications."""
     mock_data = [
@@ -42,7 +44,7 @@ def test_get_medications_success(mock_supabase, client, mock_user):
             "is_active": True, "notes": None
         }
     ]
-    mock_supabase.table.return_value.select.return_value.eq.return_value.execute.return_value = MagicMock(data=mock_data)
+    mock_supabase.table.return_value.select.return_value.eq.return_value.execute = AsyncMock(return_value=MagicMock(data=mock_data))
 
     response = client.get("/api/medications")
 
@@ -51,10 +53,52 @@ def test_get_medications_success(mock_supabase, client, mock_user):
     assert response.json()[0]["medicine_name"] == "Lisinopril"
 
 
-@patch('bpl_web_backend.modules.medications.services.supabase')
+@patch('bpl_web_backend.modules.medications.repository.async_supabase')
+def test_get_medications_sends_validators(mock_supabase, client, data_revision):
+    """The list carries an ETag and Last-Modified derived from the user's medications revision."""
+    data_revision.return_value = Revision(4, datetime(2024, 5, 1, 8, 30, 15, 250000, tzinfo=timezone.utc))
+    mock_supabase.table.return_value.select.return_value.eq.return_value.execute = AsyncMock(return_value=MagicMock(data=[]))
+
+    response = client.get("/api/medications")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] == 'W/"4-medications"'
+    assert response.headers["Last-Modified"] == "Wed, 01 May 2024 08:30:15 GMT"
+    assert response.headers["Cache-Control"] == "private, no-cache"
+    assert response.headers["Vary"] == "Authorization"
+
+
+@patch('bpl_web_backend.modules.medications.repository.async_supabase')
+def test_get_medications_not_modified(mock_supabase, client, data_revision):
+    """A matching If-None-Match gets 304 without reading the medications."""
+    data_revision.return_value = Revision(4, datetime(2024, 5, 1, 8, 30, tzinfo=timezone.utc))
+
+    response = client.get("/api/medications", headers={"If-None-Match": 'W/"4-medications"'})
+
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+    mock_supabase.table.assert_not_called()
+
+
+@patch('bpl_web_backend.modules.medications.repository.async_supabase')
+def test_get_medications_if_modified_since(mock_supabase, client, data_revision):
+    """If-Modified-Since is compared in whole seconds, and ignored when If-None-Match is sent."""
+    data_revision.return_value = Revision(4, datetime(2024, 5, 1, 8, 30, 15, 250000, tzinfo=timezone.utc))
+    mock_supabase.table.return_value.select.return_value.eq.return_value.execute = AsyncMock(return_value=MagicMock(data=[]))
+
+    current = client.get("/api/medications", headers={"If-Modified-Since": "Wed, 01 May 2024 08:30:15 GMT"})
+    stale = client.get("/api/medications", headers={"If-Modified-Since": "Wed, 01 May 2024 08:30:14 GMT"})
+    etag_wins = client.get("/api/medications", headers={"If-Modified-Since": "Wed, 01 May 2024 08:30:15 GMT", "If-None-Match": 'W/"3-medications"'})
+
+    assert current.status_code == status.HTTP_304_NOT_MODIFIED
+    assert stale.status_code == status.HTTP_200_OK
+    assert etag_wins.status_code == status.HTTP_200_OK
+
+
+@patch('bpl_web_backend.modules.medications.repository.async_supabase')
 def test_get_medications_api_error(mock_supabase, client):
     """Test API error during medication retrieval."""
-    mock_supabase.table.return_value.select.return_value.eq.return_value.execute.side_effect = APIError({"message": "DB Error"})
+    mock_supabase.table.return_value.select.return_value.eq.return_value.execute = AsyncMock(side_effect=APIError({"message": "DB Error"}))
 
     response = client.get("/api/medications")
 
@@ -64,7 +108,7 @@ def test_get_medications_api_error(mock_supabase, client):
 
 # --- Test Cases for POST /medications ---
 
-@patch('bpl_web_backend.modules.medications.services.supabase')
+@patch('bpl_web_backend.modules.medications.repository.async_supabase')
 def test_create_medication_success(mock_supabase, client, mock_user):
     """Test successful creation of a new medication."""
     payload = {
@@ -72,7 +116,7 @@ def test_create_medication_success(mock_supabase, client, mock_user):
         "intake_time": ["Anytime"], "is_active": True, "notes": "For headache"
     }
     mock_data = {"id": 3, "user_id": mock_user.id, **payload}
-    mock_supabase.table.return_value.insert.return_value.execute.return_value = MagicMock(data=[mock_data])
+    mock_supabase.table.return_value.insert.return_value.execute = AsyncMock(return_value=MagicMock(data=[mock_data]))
 
     response = client.post("/api/medications", json=payload)
 
@@ -80,11 +124,11 @@ def test_create_medication_success(mock_supabase, client, mock_user):
     assert response.json()["medicine_name"] == "Ibuprofen"
 
 
-@patch('bpl_web_backend.modules.medications.services.supabase')
+@patch('bpl_web_backend.modules.medications.repository.async_supabase')
 def test_create_medication_no_data_returned(mock_supabase, client):
     """Test server error if Supabase returns no data on creation."""
     payload = {"medicine_name": "Test Med", "quantity": "30", "intake_time": ["Morning"]}
-    mock_supabase.table.return_value.insert.return_value.execute.return_value = MagicMock(data=[])
+    mock_supabase.table.return_value.insert.return_value.execute = AsyncMock(return_value=MagicMock(data=[]))
 
     response = client.post("/api/medications", json=payload)
 
@@ -94,7 +138,7 @@ def test_create_medication_no_data_returned(mock_supabase, client):
 
 # --- Test Cases for PUT /medications/{medication_id} ---
 
-@patch('bpl_web_backend.modules.medications.services.supabase')
+@patch('bpl_web_backend.modules.medications.repository.async_supabase')
 def test_update_medication_success(mock_supabase, client, mock_user):
     """Test successful update of an existing medication."""
     med_id = 1
@@ -109,7 +153,7 @@ def test_update_medication_success(mock_supabase, client, mock_user):
         "is_active": True,
         "notes": "Updated notes"
     }
-    mock_supabase.table.return_value.update.return_value.eq.return_value.eq.return_value.execute.return_value = MagicMock(data=[mock_response_data])
+    mock_supabase.table.return_value.update.return_value.eq.return_value.eq.return_value.execute = AsyncMock(return_value=MagicMock(data=[mock_response_data]))
 
     response = client.put(f"/api/medications/{med_id}", json=update_payload)
 
@@ -117,12 +161,12 @@ def test_update_medication_success(mock_supabase, client, mock_user):
     assert response.json()["notes"] == "Updated notes"
 
 
-@patch('bpl_web_backend.modules.medications.services.supabase')
+@patch('bpl_web_backend.modules.medications.repository.async_supabase')
 def test_update_medication_not_found(mock_supabase, client):
     """Test updating a medication that does not exist."""
     med_id = 999
     payload = {"notes": "This should not exist"}
-    mock_supabase.table.return_value.update.return_value.eq.return_value.eq.return_value.execute.return_value = MagicMock(data=[])
+    mock_supabase.table.return_value.update.return_value.eq.return_value.eq.return_value.execute = AsyncMock(return_value=MagicMock(data=[]))
 
     response = client.put(f"/api/medications/{med_id}", json=payload)
 
@@ -140,36 +184,79 @@ def test_update_medication_empty_payload(client):
 
 # --- Test Cases for DELETE /medications/{medication_id} ---
 
-@patch('bpl_web_backend.modules.medications.services.supabase')
+@patch('bpl_web_backend.modules.medications.repository.async_supabase')
 def test_delete_medication_success(mock_supabase, client, mock_user):
     """Test successful deletion of a medication."""
     med_id = 1
     mock_data = [{"id": med_id, "user_id": mock_user.id, "medication_name": "test"}]
-    mock_supabase.table.return_value.delete.return_value.eq.return_value.eq.return_value.execute.return_value = MagicMock(data=mock_data)
+    mock_supabase.table.return_value.delete.return_value.eq.return_value.eq.return_value.execute = AsyncMock(return_value=MagicMock(data=mock_data))
 
     response = client.delete(f"/api/medications/{med_id}")
 
     assert response.status_code == status.HTTP_204_NO_CONTENT
 
 
-@patch('bpl_web_backend.modules.medications.services.supabase')
+@patch('bpl_web_backend.modules.medications.repository.async_supabase')
 def test_delete_medication_not_found(mock_supabase, client):
     """Test deleting a medication that does not exist."""
     med_id = 999
-    mock_supabase.table.return_value.delete.return_value.eq.return_value.eq.return_value.execute.return_value = MagicMock(data=[])
+    mock_supabase.table.return_value.delete.return_value.eq.return_value.eq.return_value.execute = AsyncMock(return_value=MagicMock(data=[]))
 
     response = client.delete(f"/api/medications/{med_id}")
 
     assert response.status_code == status.HTTP_404_NOT_FOUND
 
 
-@patch('bpl_web_backend.modules.medications.services.supabase')
+@patch('bpl_web_backend.modules.medications.repository.async_supabase')
 def test_delete_medication_api_error(mock_supabase, client):
     """Test API error during medication deletion."""
     med_id = 1
-    mock_supabase.table.return_value.delete.return_value.eq.return_value.eq.return_value.execute.side_effect = APIError({"message": "Deletion failed"})
+    mock_supabase.table.return_value.delete.return_value.eq.return_value.eq.return_value.execute = AsyncMock(side_effect=APIError({"message": "Deletion failed"}))
 
     response = client.delete(f"/api/medications/{med_id}")
 
     assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
     assert response.json()["detail"] == "Deletion failed"
+
+
+# --- Test Cases for medication periods ---
+
+PERIODS = [
+    {"medication_id": 1, "medicine_name": "Lisinopril", "dosage_mg": 10, "intake_time": ["Morning"],
+     "valid_from": "2024-01-01T00:00:00+00:00", "valid_to": "2024-02-01T00:00:00+00:00"},
+    {"medication_id": 1, "medicine_name": "Lisinopril", "dosage_mg": 20, "intake_time": ["Morning"],
+     "valid_from": "2024-02-01T00:00:00+00:00", "valid_to": None},
+]
+
+
+@patch('bpl_web_backend.modules.medications.repository.async_supabase')
+def test_get_medication_history(mock_supabase, client):
+    """Every version of a medication is listed with the time it was active."""
+    mock_supabase.table.return_value.select.return_value.eq.return_value.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=PERIODS))
+
+    response = client.get("/api/medications/history")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [period["dosage_mg"] for period in response.json()] == [10, 20]
+    assert response.json()[1]["valid_to"] is None
+
+
+@patch('bpl_web_backend.modules.medications.repository.async_supabase')
+def test_get_active_medications(mock_supabase, client):
+    """Each timestamp is answered with the indices of the periods active at it."""
+    mock_supabase.table.return_value.select.return_value.eq.return_value.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=PERIODS))
+
+    response = client.post("/api/medications/active-at", json={"timestamps": [
+        "2023-12-01T00:00:00Z", "2024-01-15T08:00:00Z", "2024-02-01T00:00:00Z",
+    ]})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["active"] == [[], [0], [1]]
+    assert len(response.json()["periods"]) == 2
+
+
+def test_get_active_medications_limits_timestamps(client):
+    """Too many timestamps in one call are rejected."""
+    response = client.post("/api/medications/active-at", json={"timestamps": ["2024-01-01T00:00:00Z"] * 10001})
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
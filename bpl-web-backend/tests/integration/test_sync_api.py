@@ -0,0 +1,123 @@
+import base64
+import json
+
+from fastapi import status
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock, AsyncMock
+from postgrest.exceptions import APIError
+
+# All fixtures (client, auth_client, mock_user) are in conftest.py
+
+
+def token(revisions):
+    return base64.urlsafe_b64encode(json.dumps(revisions).encode()).decode().rstrip("=")
+
+
+def decoded(sync_token):
+    return json.loads(base64.urlsafe_b64decode(sync_token + "=" * (-len(sync_token) % 4)))
+
+
+def mock_tables(mock_supabase, rows=None, tombstones=None):
+    """Serve `rows[table]` and `tombstones[table]` through the sync query chains; return the table mocks."""
+    rows, tombstones = rows or {}, tombstones or {}
+    tables = {}
+
+    def table(name):
+        if name not in tables:
+            tables[name] = MagicMock()
+            if name == "sync_tombstones":
+                def by_resource(column, value):
+                    query = MagicMock()
+                    chain = query.gt.return_value.order.return_value.limit.return_value
+                    chain.execute = AsyncMock(return_value=MagicMock(data=tombstones.get(value, [])))
+                    return query
+                tables[name].select.return_value.eq.return_value.eq.side_effect = by_resource
+            else:
+                chain = tables[name].select.return_value.eq.return_value.gt.return_value.order.return_value.limit.return_value
+                chain.execute = AsyncMock(return_value=MagicMock(data=rows.get(name, [])))
+        return tables[name]
+
+    mock_supabase.table.side_effect = table
+    return tables
+
+
+@patch('bpl_web_backend.modules.sync.repository.async_supabase')
+def test_full_sync_returns_every_row(mock_supabase, auth_client: TestClient, mock_user: MagicMock):
+    """Without a token every row is returned, no tombstones are read and the token holds the last revisions."""
+    tables = mock_tables(mock_supabase, rows={
+        "blood_pressure_records": [{"id": 1, "revision": 3}, {"id": 2, "revision": 5}],
+        "medications": [{"id": 7, "revision": 2}],
+    })
+
+    response = auth_client.get("/api/sync")
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["has_more"] is False
+    assert [row["id"] for row in data["changes"]["blood_pressure_records"]["upserts"]] == [1, 2]
+    assert data["changes"]["medications"] == {"upserts": [{"id": 7, "revision": 2}], "deletes": []}
+    assert data["changes"]["user_profiles"] == {"upserts": [], "deletes": []}
+    assert decoded(data["token"]) == {"blood_pressure_records": 5, "medications": 2, "user_profiles": 0}
+    assert "sync_tombstones" not in tables
+    tables["medications"].select.return_value.eq.assert_called_with("user_id", mock_user.id)
+    tables["medications"].select.return_value.eq.return_value.gt.assert_called_with("revision", 0)
+
+
+@patch('bpl_web_backend.modules.sync.repository.async_supabase')
+def test_delta_sync_returns_changes_and_deletes(mock_supabase, auth_client: TestClient):
+    """With a token only later changes are read, and deleted rows come back as ids."""
+    tables = mock_tables(
+        mock_supabase,
+        rows={"blood_pressure_records": [{"id": 3, "revision": 12}]},
+        tombstones={"blood_pressure_records": [{"revision": 11, "record_id": "2"}], "medications": [{"revision": 4, "record_id": "7"}]},
+    )
+
+    response = auth_client.get(f"/api/sync?since={token({'blood_pressure_records': 10, 'medications': 3})}")
+
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["changes"]["blood_pressure_records"] == {"upserts": [{"id": 3, "revision": 12}], "deletes": ["2"]}
+    assert data["changes"]["medications"] == {"upserts": [], "deletes": ["7"]}
+    assert decoded(data["token"]) == {"blood_pressure_records": 12, "medications": 4, "user_profiles": 0}
+    tables["blood_pressure_records"].select.return_value.eq.return_value.gt.assert_called_with("revision", 10)
+
+
+@patch('bpl_web_backend.modules.sync.services.SYNC_PAGE_SIZE', 2)
+@patch('bpl_web_backend.modules.sync.repository.async_supabase')
+def test_sync_pages_in_revision_order(mock_supabase, auth_client: TestClient):
+    """Changes beyond the page size are cut in revision order and the token resumes after the last one sent."""
+    mock_tables(
+        mock_supabase,
+        rows={"medications": [{"id": 1, "revision": 21}, {"id": 2, "revision": 23}]},
+        tombstones={"medications": [{"revision": 22, "record_id": "9"}]},
+    )
+
+    response = auth_client.get(f"/api/sync?since={token({'medications': 20})}")
+
+    data = response.json()
+    assert data["has_more"] is True
+    assert data["changes"]["medications"] == {"upserts": [{"id": 1, "revision": 21}], "deletes": ["9"]}
+    assert decoded(data["token"])["medications"] == 22
+
+
+def test_sync_invalid_token(auth_client: TestClient):
+    """A token that was not issued by the API is rejected."""
+    response = auth_client.get("/api/sync?since=not-a-token")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == "Invalid sync token"
+
+
+@patch('bpl_web_backend.modules.sync.repository.async_supabase')
+def test_sync_db_error(mock_supabase, auth_client: TestClient):
+    """Database errors surface as 500s."""
+    mock_supabase.table.return_value.select.return_value.eq.return_value.gt.return_value.order.return_value.limit.return_value.execute = AsyncMock(
+        side_effect=APIError({"message": "DB error", "code": "123", "details": "", "hint": ""})
+    )
+    response = auth_client.get("/api/sync")
+    assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+    assert "Database error: DB error" in response.json()["detail"]
+
+
+def test_sync_unauthorized(client: TestClient):
+    response = client.get("/api/sync")
+    assert response.status_code == status.HTTP_403_FORBIDDEN
@@ -1,11 +1,12 @@
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from fastapi.testclient import TestClient
 from fastapi import status
 from postgrest.exceptions import APIError
 
 from bpl_web_backend.main import app
 from bpl_web_backend.dependencies import get_current_user
+from bpl_web_backend.revisions import Revision
 
 @pytest.fixture
 def mock_user():
@@ -22,7 +23,7 @@ def client(mock_user):
         yield c
     app.dependency_overrides.clear()
 
-@patch('bpl_web_backend.modules.profile.services.supabase')
+@patch('bpl_web_backend.modules.profile.repository.async_supabase')
 def test_get_user_profile_success(mock_supabase, client, mock_user):
     """Test successful retrieval of a user profile."""
     mock_data = {
@@ -34,7 +35,7 @@ def test_get_user_profile_success(mock_supabase, client, mock_user):
         "gender": "Other",
         "medical_conditions": "None"
     }
-    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute.return_value = MagicMock(data=mock_data)
+    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute = AsyncMock(return_value=MagicMock(data=mock_data))
 
     response = client.get("/api/user-profile")
 
@@ -42,30 +43,41 @@ def test_get_user_profile_success(mock_supabase, client, mock_user):
     assert response.json()["full_name"] == "Test User"
     assert response.json()["id"] == "profile-123"
 
-@patch('bpl_web_backend.modules.profile.services.supabase')
+@patch('bpl_web_backend.modules.profile.repository.async_supabase')
+def test_get_user_profile_not_modified(mock_supabase, client, data_revision):
+    """A client holding the current profile gets 304 without the profile being read."""
+    data_revision.return_value = Revision(2)
+
+    response = client.get("/api/user-profile", headers={"If-None-Match": 'W/"2-profile"'})
+
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["ETag"] == 'W/"2-profile"'
+    mock_supabase.table.assert_not_called()
+
+@patch('bpl_web_backend.modules.profile.repository.async_supabase')
 def test_get_user_profile_not_found(mock_supabase, client):
     """Test profile not found (PGRST116)."""
-    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute.side_effect = APIError({"message": "PGRST116"})
+    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute = AsyncMock(side_effect=APIError({"message": "PGRST116"}))
 
     response = client.get("/api/user-profile")
 
     assert response.status_code == status.HTTP_404_NOT_FOUND
     assert response.json() == {"detail": "Profile not found"}
 
-@patch('bpl_web_backend.modules.profile.services.supabase')
+@patch('bpl_web_backend.modules.profile.repository.async_supabase')
 def test_get_user_profile_api_error(mock_supabase, client):
     """Test other API errors during profile retrieval."""
-    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute.side_effect = APIError({"message": "Some other error"})
+    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute = AsyncMock(side_effect=APIError({"message": "Some other error"}))
 
     response = client.get("/api/user-profile")
 
     assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
     assert response.json() == {"detail": "Database error: Some other error"}
 
-@patch('bpl_web_backend.modules.profile.services.supabase')
+@patch('bpl_web_backend.modules.profile.repository.async_supabase')
 def test_get_user_profile_generic_exception(mock_supabase, client):
     """Test generic exceptions during profile retrieval."""
-    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute.side_effect = Exception("Something broke")
+    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute = AsyncMock(side_effect=Exception("Something broke"))
 
     response = client.get("/api/user-profile")
 
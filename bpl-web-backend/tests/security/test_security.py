@@ -1,8 +1,8 @@
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 
 from fastapi import status
 
-@patch('bpl_web_backend.modules.profile.services.supabase')
+@patch('bpl_web_backend.modules.profile.repository.async_supabase')
 def test_sql_injection_attempt_in_profile(mock_supabase, auth_client, mock_user):
     """Tests how the API handles a potential SQL injection string.
 
@@ -18,7 +18,7 @@ def test_sql_injection_attempt_in_profile(mock_supabase, auth_client, mock_user)
     }
 
     # 1. Mock the initial check to show the profile does not exist
-    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute.return_value = MagicMock(data=None)
+    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute = AsyncMock(return_value=MagicMock(data=None))
 
     # 2. Mock the insert call to succeed with the literal string
     mock_response_data = {
@@ -26,7 +26,7 @@ def test_sql_injection_attempt_in_profile(mock_supabase, auth_client, mock_user)
         "user_id": mock_user.id, 
         **profile_data
     }
-    mock_supabase.table.return_value.insert.return_value.execute.return_value = MagicMock(data=[mock_response_data])
+    mock_supabase.table.return_value.insert.return_value.execute = AsyncMock(return_value=MagicMock(data=[mock_response_data]))
 
     # 3. Make the API Call using the authenticated client
     response = auth_client.post("/api/user-profile", json=profile_data)
@@ -0,0 +1,46 @@
+from datetime import date
+
+from bpl_web_backend.modules.adherence.bitmaps import BITMAP_BYTES, count_days, day_index, summarize_adherence, year_ranges
+
+
+def bitmap(*days):
+    """A bitmap with the bits of `days` set the way PostgreSQL's set_bit() sets them, as PostgREST sends it."""
+    data = bytearray(BITMAP_BYTES)
+    for day in days:
+        data[day_index(day) // 8] |= 1 << (day_index(day) % 8)
+    return "\\x" + data.hex()
+
+
+def test_count_days_is_inclusive():
+    assert count_days(0b101110, 1, 3) == 3
+    assert count_days(0b101110, 4, 5) == 1
+
+
+def test_year_ranges_split_at_new_year():
+    assert list(year_ranges(date(2023, 12, 30), date(2024, 1, 2))) == [(2023, 363, 364), (2024, 0, 1)]
+    assert list(year_ranges(date(2024, 12, 31), date(2024, 12, 31))) == [(2024, 365, 365)]
+
+
+def test_summarize_counts_each_slot_and_window():
+    today = date(2024, 1, 3)
+    rows = [
+        # Morning slot: taken on 3 January and 30 December, missed on 1 January.
+        {"medication_id": 1, "year": 2024, "taken": bitmap(date(2024, 1, 3)), "missed": bitmap(date(2024, 1, 1))},
+        {"medication_id": 1, "year": 2023, "taken": bitmap(date(2023, 12, 30)), "missed": bitmap()},
+        # Evening slot: taken on 2 January and long ago.
+        {"medication_id": 1, "year": 2024, "taken": bitmap(date(2024, 1, 2)), "missed": bitmap()},
+        {"medication_id": 2, "year": 2023, "taken": bitmap(date(2023, 6, 1)), "missed": bitmap(date(2023, 12, 31))},
+    ]
+
+    summary = summarize_adherence(rows, today, (7, 90))
+
+    assert summary == [
+        {"medication_id": 1, "windows": [
+            {"days": 7, "taken": 3, "missed": 1, "adherence": 0.75},
+            {"days": 90, "taken": 3, "missed": 1, "adherence": 0.75},
+        ]},
+        {"medication_id": 2, "windows": [
+            {"days": 7, "taken": 0, "missed": 1, "adherence": 0.0},
+            {"days": 90, "taken": 0, "missed": 1, "adherence": 0.0},
+        ]},
+    ]
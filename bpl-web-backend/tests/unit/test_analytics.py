@@ -0,0 +1,42 @@
+import numpy as np
+
+from bpl_web_backend.modules.blood_pressure_log.analytics import CATEGORIES, analyze, classify, rolling_statistics
+
+HOUR = 3600 * 10**6
+
+
+def test_classify_uses_the_higher_category_of_the_two_pressures():
+    systolic = np.array([115, 125, 125, 135, 145, 185, 110])
+    diastolic = np.array([75, 75, 85, 70, 70, 90, 125])
+
+    assert [CATEGORIES[code] for code in classify(systolic, diastolic)] == [
+        "normal", "elevated", "stage_1", "stage_1", "stage_2", "crisis", "crisis",
+    ]
+
+
+def test_rolling_statistics_cover_the_window_ending_at_each_reading():
+    times = np.array([0, 1, 2, 10]) * HOUR
+    values = np.array([120, 130, 110, 140])
+
+    stats = rolling_statistics(times, values, window=3 * HOUR)
+
+    assert stats["mean"].tolist() == [120, 125, 120, 140]
+    assert np.isnan(stats["sd"][0]) and np.isclose(stats["sd"][2], 10)
+    assert np.isnan(stats["arv"][0]) and stats["arv"][2] == 15
+    assert np.isnan(stats["arv"][3])
+
+
+def test_analyze_recomputes_only_from_the_changed_reading():
+    rng = np.random.default_rng(0)
+    times = np.sort(rng.integers(0, 60 * 24 * HOUR, 300))
+    metrics = {metric: rng.integers(60, 200, 300) for metric in ("systolic", "diastolic", "heart_rate")}
+    full = analyze(times, metrics)
+
+    stale = {name: column.copy() for name, column in full.items()}
+    for column in stale.values():
+        column[200:] = 0
+    incremental = analyze(times, metrics, stale, start=200)
+
+    for name, column in full.items():
+        assert np.array_equal(incremental[name], column, equal_nan=True), name
+    assert not full["jump"][0]
@@ -0,0 +1,181 @@
+import time
+from unittest.mock import patch, MagicMock, AsyncMock
+
+import jwt
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from bpl_web_backend.main import app
+from bpl_web_backend.auth import LocalTokenVerifier, SigningKeyCache, LocalVerificationUnavailable
+from bpl_web_backend.token_cache import token_cache
+
+SECRET = "super-secret-jwt-token-with-at-least-32-characters"
+
+
+def make_token(key=SECRET, kid=None, **overrides):
+    """Build a Supabase-style access token."""
+    claims = {
+        "sub": "user-123",
+        "aud": "authenticated",
+        "role": "authenticated",
+        "email": "test@example.com",
+        "exp": int(time.time()) + 3600,
+    }
+    claims.update(overrides)
+    headers = {"kid": kid} if kid else None
+    return jwt.encode(claims, key, algorithm="HS256", headers=headers)
+
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    """Keep cached tokens from leaking between tests."""
+    token_cache.clear()
+    yield
+    token_cache.clear()
+
+
+# --- LocalTokenVerifier ---
+
+def test_verify_valid_token():
+    """A correctly signed token yields a user with the `sub` as id."""
+    verifier = LocalTokenVerifier(SECRET, "authenticated")
+    user = verifier.verify(make_token())
+    assert user.id == "user-123"
+    assert user.email == "test@example.com"
+
+
+def test_verify_expired_token():
+    """An expired token is rejected."""
+    verifier = LocalTokenVerifier(SECRET, "authenticated")
+    with pytest.raises(jwt.ExpiredSignatureError):
+        verifier.verify(make_token(exp=int(time.time()) - 10))
+
+
+def test_verify_wrong_audience():
+    """A token issued for another audience is rejected."""
+    verifier = LocalTokenVerifier(SECRET, "authenticated")
+    with pytest.raises(jwt.InvalidAudienceError):
+        verifier.verify(make_token(aud="anon"))
+
+
+def test_verify_bad_signature():
+    """A token signed with another secret is rejected."""
+    verifier = LocalTokenVerifier(SECRET, "authenticated")
+    with pytest.raises(jwt.InvalidSignatureError):
+        verifier.verify(make_token(key="another-secret-that-is-also-32-characters-long"))
+
+
+def test_verify_without_keys_is_unavailable():
+    """Without a secret or JWKS the token cannot be checked locally."""
+    verifier = LocalTokenVerifier(None, "authenticated")
+    with pytest.raises(LocalVerificationUnavailable):
+        verifier.verify(make_token())
+
+
+@patch('bpl_web_backend.auth.httpx.get')
+def test_verify_with_jwks(mock_get):
+    """Keys are looked up by kid in the JWKS document and cached between calls."""
+    jwks = {"keys": [{"kty": "oct", "kid": "key-1", "alg": "HS256", "k": jwt.utils.base64url_encode(SECRET.encode()).decode()}]}
+    mock_get.return_value = MagicMock(json=MagicMock(return_value=jwks))
+    verifier = LocalTokenVerifier(None, "authenticated", SigningKeyCache("https://example.test/jwks.json"))
+
+    assert verifier.verify(make_token(kid="key-1")).id == "user-123"
+    assert verifier.verify(make_token(kid="key-1")).id == "user-123"
+    assert mock_get.call_count == 1
+
+
+@patch('bpl_web_backend.auth.httpx.get')
+def test_verify_rejects_algorithm_of_another_key(mock_get):
+    """A token whose `alg` does not match its signing key is rejected before decoding."""
+    jwks = {"keys": [{"kty": "oct", "kid": "key-1", "alg": "HS512", "k": jwt.utils.base64url_encode(SECRET.encode()).decode()}]}
+    mock_get.return_value = MagicMock(json=MagicMock(return_value=jwks))
+    verifier = LocalTokenVerifier(None, "authenticated", SigningKeyCache("https://example.test/jwks.json"))
+
+    with pytest.raises(jwt.InvalidAlgorithmError):
+        verifier.verify(make_token(kid="key-1"))
+
+
+# --- get_current_user in local mode ---
+
+@patch('bpl_web_backend.dependencies.AUTH_MODE', "local")
+@patch('bpl_web_backend.dependencies.local_verifier', LocalTokenVerifier(SECRET, "authenticated"))
+@patch('bpl_web_backend.dependencies.supabase')
+@patch('bpl_web_backend.modules.profile.repository.async_supabase')
+def test_local_mode_skips_auth_server(mock_db, mock_auth):
+    """A valid token is accepted without calling the auth server."""
+    app.dependency_overrides.clear()
+    profile_data = {"id": "profile-123", "user_id": "user-123", "full_name": "Test User", "gender": "Other", "date_of_birth": "2000-01-01"}
+    mock_db.table.return_value.select.return_value.eq.return_value.single.return_value.execute = AsyncMock(return_value=MagicMock(data=profile_data))
+
+    with TestClient(app) as c:
+        response = c.get("/api/user-profile", headers={"Authorization": f"Bearer {make_token()}"})
+
+    assert response.status_code == status.HTTP_200_OK
+    mock_auth.auth.get_user.assert_not_called()
+    mock_db.table.return_value.select.return_value.eq.assert_called_with("user_id", "user-123")
+
+
+@patch('bpl_web_backend.dependencies.AUTH_MODE', "local")
+@patch('bpl_web_backend.dependencies.local_verifier', LocalTokenVerifier(SECRET, "authenticated"))
+@patch('bpl_web_backend.dependencies.supabase')
+def test_local_mode_rejects_invalid_token(mock_auth):
+    """An invalid token is rejected locally, without a remote retry."""
+    app.dependency_overrides.clear()
+    with TestClient(app) as c:
+        response = c.get("/api/user-profile", headers={"Authorization": f"Bearer {make_token(exp=1)}"})
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    mock_auth.auth.get_user.assert_not_called()
+
+
+@patch('bpl_web_backend.dependencies.AUTH_MODE', "local")
+@patch('bpl_web_backend.dependencies.local_verifier')
+@patch('bpl_web_backend.dependencies.supabase')
+def test_local_mode_rejects_token_its_key_cannot_check(mock_auth, mock_verifier):
+    """Key errors raised while decoding are a 401, not a server error."""
+    app.dependency_overrides.clear()
+    mock_verifier.verify.side_effect = TypeError("Expected a string or bytes value")
+    with TestClient(app) as c:
+        response = c.get("/api/user-profile", headers={"Authorization": f"Bearer {make_token()}"})
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    mock_auth.auth.get_user.assert_not_called()
+
+
+@patch('bpl_web_backend.dependencies.AUTH_MODE', "local")
+@patch('bpl_web_backend.dependencies.local_verifier', LocalTokenVerifier(None, "authenticated"))
+@patch('bpl_web_backend.dependencies.supabase')
+def test_local_mode_falls_back_to_auth_server(mock_auth):
+    """Tokens that cannot be checked locally are sent to the auth server."""
+    app.dependency_overrides.clear()
+    mock_auth.auth.get_user.side_effect = Exception("Invalid token")
+    with TestClient(app) as c:
+        response = c.get("/api/user-profile", headers={"Authorization": f"Bearer {make_token()}"})
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    mock_auth.auth.get_user.assert_called_once()
+
+
+# --- Token cache in front of get_current_user ---
+
+@patch('bpl_web_backend.dependencies.supabase')
+@patch('bpl_web_backend.modules.profile.repository.async_supabase')
+def test_repeat_requests_skip_auth_server(mock_db, mock_auth):
+    """The auth server is asked once per token, and again after logout."""
+    app.dependency_overrides.clear()
+    remote_user = MagicMock()
+    remote_user.id = "user-123"
+    mock_auth.auth.get_user.return_value = MagicMock(user=remote_user)
+    profile_data = {"id": "profile-123", "user_id": "user-123", "full_name": "Test User", "gender": "Other", "date_of_birth": "2000-01-01"}
+    mock_db.table.return_value.select.return_value.eq.return_value.single.return_value.execute = AsyncMock(return_value=MagicMock(data=profile_data))
+    headers = {"Authorization": f"Bearer {make_token()}"}
+
+    with TestClient(app) as c:
+        assert c.get("/api/user-profile", headers=headers).status_code == status.HTTP_200_OK
+        assert c.get("/api/user-profile", headers=headers).status_code == status.HTTP_200_OK
+        assert mock_auth.auth.get_user.call_count == 1
+
+        assert c.post("/api/auth/logout", headers=headers).status_code == status.HTTP_204_NO_CONTENT
+        assert c.get("/api/user-profile", headers=headers).status_code == status.HTTP_200_OK
+        assert mock_auth.auth.get_user.call_count == 2
@@ -0,0 +1,94 @@
+import gzip
+import zlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from bpl_web_backend.compression import CompressionMiddleware, choose_encoding
+
+BODY = "systolic,diastolic,heart_rate\n" + "120,80,70\n" * 500
+
+
+@pytest.fixture
+def app():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100, encodings=["zstd", "br", "gzip"])
+
+    @app.get("/text")
+    def text():
+        return PlainTextResponse(BODY)
+
+    @app.get("/small")
+    def small():
+        return PlainTextResponse("ok")
+
+    @app.get("/binary")
+    def binary():
+        return Response(b"\0" * 1000, media_type="application/vnd.apache.parquet")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((BODY for _ in range(3)), media_type="text/csv")
+
+    return app
+
+
+def raw_get(app, path, accept_encoding):
+    """GET `path` and return the response with its body still encoded."""
+    with TestClient(app) as client:
+        with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding}) as response:
+            return response, b"".join(response.iter_raw())
+
+
+def test_choose_encoding_honours_q_values_and_preference():
+    preference = ["zstd", "br", "gzip"]
+    assert choose_encoding("gzip, br", preference) == "br"
+    assert choose_encoding("gzip;q=1.0, br;q=0.5", preference) == "gzip"
+    assert choose_encoding("zstd;q=0, gzip", preference) == "gzip"
+    assert choose_encoding("*", preference) == "zstd"
+    assert choose_encoding("identity", preference) is None
+    assert choose_encoding(None, preference) is None
+
+
+def test_gzip_response(app):
+    response, raw = raw_get(app, "/text", "gzip")
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-length"] == str(len(raw))
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert gzip.decompress(raw).decode() == BODY
+
+
+def test_small_and_binary_responses_are_not_compressed(app):
+    small, _ = raw_get(app, "/small", "gzip")
+    binary, raw = raw_get(app, "/binary", "gzip")
+
+    assert "content-encoding" not in small.headers
+    assert "content-encoding" not in binary.headers
+    assert raw == b"\0" * 1000
+
+
+def test_streaming_response_is_compressed_per_chunk(app):
+    response, raw = raw_get(app, "/stream", "gzip")
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert zlib.decompress(raw, 16 + zlib.MAX_WBITS).decode() == BODY * 3
+
+
+def test_brotli_response(app):
+    brotli = pytest.importorskip("brotli")
+    response, raw = raw_get(app, "/text", "gzip, br")
+
+    assert response.headers["content-encoding"] == "br"
+    assert brotli.decompress(raw).decode() == BODY
+
+
+def test_zstd_streaming_response(app):
+    zstandard = pytest.importorskip("zstandard")
+    response, raw = raw_get(app, "/stream", "zstd, gzip")
+
+    assert response.headers["content-encoding"] == "zstd"
+    assert zstandard.ZstdDecompressor().decompressobj().decompress(raw).decode() == BODY * 3
@@ -0,0 +1,31 @@
+import asyncio
+
+import httpx
+import pytest
+
+from bpl_web_backend.config import SUPABASE_POOL_MAX_CONNECTIONS
+from bpl_web_backend.database import AsyncSupabase
+
+
+def test_async_supabase_requires_open():
+    """Queries fail loudly when the lifespan has not opened the client."""
+    db = AsyncSupabase()
+    with pytest.raises(RuntimeError):
+        db.table("medications")
+
+
+def test_async_supabase_shares_pooled_session():
+    """All tables are queried through one tuned keep-alive connection pool."""
+    async def scenario():
+        db = AsyncSupabase()
+        await db.open()
+        try:
+            session = db.client.session
+            assert isinstance(session, httpx.AsyncClient)
+            assert session._transport._pool._max_connections == SUPABASE_POOL_MAX_CONNECTIONS
+            assert db.table("medications").session is session
+            assert db.table("blood_pressure_records").session is session
+        finally:
+            await db.close()
+
+    asyncio.run(scenario())
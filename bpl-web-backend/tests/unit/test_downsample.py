@@ -0,0 +1,48 @@
+import datetime
+
+import numpy as np
+
+from bpl_web_backend.modules.blood_pressure_log.downsample import downsample_records, lttb_indices
+
+
+def test_lttb_keeps_ends_and_count():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50)
+    kept = lttb_indices(x, y, 100)
+
+    assert len(kept) == 100
+    assert kept[0] == 0 and kept[-1] == 999
+    assert np.all(np.diff(kept) > 0)
+
+
+def test_lttb_keeps_a_spike():
+    """A single outlier forms the largest triangle of its bucket and survives."""
+    x = np.arange(500, dtype=float)
+    y = np.full(500, 120.0)
+    y[237] = 190.0
+
+    assert 237 in lttb_indices(x, y, 20)
+
+
+def test_lttb_short_series_unchanged():
+    x = np.arange(5, dtype=float)
+    assert list(lttb_indices(x, x, 10)) == [0, 1, 2, 3, 4]
+
+
+def test_downsample_records_sorts_and_converts_to_utc():
+    records = [
+        {"record_datetime": "2024-01-02T08:00:00+00:00", "systolic": 130, "diastolic": 85, "heart_rate": 72},
+        {"record_datetime": "2024-01-02T08:00:00+07:00", "systolic": 120, "diastolic": 80, "heart_rate": 70},
+    ]
+    series = downsample_records(records, 10)
+
+    assert series["systolic"]["record_datetime"] == [
+        datetime.datetime(2024, 1, 2, 1, 0, tzinfo=datetime.timezone.utc),
+        datetime.datetime(2024, 1, 2, 8, 0, tzinfo=datetime.timezone.utc),
+    ]
+    assert series["systolic"]["value"] == [120, 130]
+    assert series["heart_rate"]["value"] == [70, 72]
+
+
+def test_downsample_records_empty():
+    assert downsample_records([], 10)["diastolic"] == {"record_datetime": [], "value": []}
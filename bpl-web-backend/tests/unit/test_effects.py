@@ -0,0 +1,36 @@
+import numpy as np
+
+from bpl_web_backend.modules.blood_pressure_log.effects import medication_effects, window_statistics
+from bpl_web_backend.modules.blood_pressure_log.summary import METRICS
+
+HOUR = 3600 * 10**6
+
+
+def test_window_statistics_match_a_direct_computation():
+    rng = np.random.default_rng(0)
+    values = rng.integers(90, 180, size=200)
+    lows = rng.integers(0, 200, size=50)
+    highs = np.minimum(lows + rng.integers(0, 20, size=50), 200)
+
+    stats = window_statistics(values, lows, highs)
+
+    for i, (low, high) in enumerate(zip(lows, highs)):
+        window = values[low:high].astype(float)
+        assert np.isnan(stats["mean"][i]) if len(window) == 0 else np.isclose(stats["mean"][i], window.mean())
+        assert np.isnan(stats["sd"][i]) if len(window) < 2 else np.isclose(stats["sd"][i], window.std(ddof=1))
+        assert np.isnan(stats["arv"][i]) if len(window) < 2 else np.isclose(stats["arv"][i], np.abs(np.diff(window)).mean())
+
+
+def test_medication_effects_split_readings_at_each_change():
+    times = np.array([0, 1, 2, 3, 4, 5]) * HOUR
+    systolic = np.array([150, 146, 139, 130, 126, 122])
+    metrics = {metric: systolic for metric in METRICS}
+
+    effects = medication_effects(times, metrics, np.array([3 * HOUR, 10 * HOUR]), window=3 * HOUR)
+
+    assert effects["before_count"].tolist() == [3, 0]
+    assert effects["after_count"].tolist() == [3, 0]
+    assert effects["systolic_before_mean"][0] == 145 and effects["systolic_after_mean"][0] == 126
+    assert effects["systolic_difference"][0] == -19
+    assert effects["systolic_after_arv"][0] == 4
+    assert np.isnan(effects["systolic_difference"][1])
@@ -0,0 +1,119 @@
+import asyncio
+import os
+
+import pytest
+
+from bpl_web_backend.export_cache import ExportCache
+from bpl_web_backend.revisions import etag_matches
+
+
+async def blocks(*parts, fail=False):
+    for part in parts:
+        yield part
+    if fail:
+        raise RuntimeError("client went away")
+
+
+def consume(stream):
+    async def run():
+        return b"".join([block async for block in stream])
+    return asyncio.run(run())
+
+
+def test_store_passes_bytes_through_and_caches(tmp_path):
+    """The stream reaches the caller unchanged and the file is cached once complete."""
+    cache = ExportCache(str(tmp_path), max_bytes=1024)
+    key = ("user-1", 3, "csv")
+
+    assert consume(cache.store(key, blocks(b"a,b\n", b"1,2\n"))) == b"a,b\n1,2\n"
+    with open(cache.get(key), "rb") as cached:
+        assert cached.read() == b"a,b\n1,2\n"
+    assert cache.stats()["hits"] == 1
+
+
+def test_interrupted_stream_is_not_cached(tmp_path):
+    """A failed build leaves neither an entry nor a partial file."""
+    cache = ExportCache(str(tmp_path), max_bytes=1024)
+    key = ("user-1", 3, "csv")
+
+    with pytest.raises(RuntimeError):
+        consume(cache.store(key, blocks(b"a,b\n", fail=True)))
+    assert cache.get(key) is None
+    assert list((tmp_path / str(os.getpid())).iterdir()) == []
+
+
+def exited_pid():
+    """A pid no process has."""
+    pid = 4194303
+    while True:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return pid
+        except PermissionError:
+            pass
+        pid -= 1
+
+
+def test_files_of_other_processes_are_left_alone(tmp_path):
+    """Only the process's own subdirectory is cleared, so other workers' files and partials survive."""
+    other = tmp_path / str(os.getppid())
+    other.mkdir()
+    (other / "cached.export").write_bytes(b"x")
+    (other / "cached.export.1.part").write_bytes(b"x")
+    stale = tmp_path / str(os.getpid())
+    stale.mkdir()
+    (stale / "left.export").write_bytes(b"x")
+    cache = ExportCache(str(tmp_path), max_bytes=1024)
+
+    consume(cache.store(("user-1", 3, "csv"), blocks(b"a,b\n")))
+
+    assert sorted(path.name for path in other.iterdir()) == ["cached.export", "cached.export.1.part"]
+    assert not (stale / "left.export").exists()
+
+
+def test_directories_of_exited_processes_are_swept(tmp_path):
+    """Files left by workers that are gone are removed on first use."""
+    exited = tmp_path / str(exited_pid())
+    exited.mkdir()
+    (exited / "cached.export").write_bytes(b"x")
+    cache = ExportCache(str(tmp_path), max_bytes=1024)
+
+    consume(cache.store(("user-1", 3, "csv"), blocks(b"a,b\n")))
+
+    assert not exited.exists()
+    assert [path.name for path in tmp_path.iterdir()] == [str(os.getpid())]
+
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    """The total size stays within the bound, dropping the least recently used file."""
+    cache = ExportCache(str(tmp_path), max_bytes=10)
+    consume(cache.store(("user-1", 1, "csv"), blocks(b"12345")))
+    consume(cache.store(("user-2", 1, "csv"), blocks(b"12345")))
+    cache.get(("user-1", 1, "csv"))
+    consume(cache.store(("user-3", 1, "csv"), blocks(b"12345")))
+
+    assert cache.get(("user-2", 1, "csv")) is None
+    assert cache.get(("user-1", 1, "csv")) is not None
+    assert cache.stats()["bytes"] == 10
+
+
+def test_new_revision_replaces_older_files(tmp_path):
+    """Files of a user's older revisions are dropped as soon as a newer one is cached."""
+    cache = ExportCache(str(tmp_path), max_bytes=1024)
+    consume(cache.store(("user-1", 1, "csv"), blocks(b"old")))
+    consume(cache.store(("user-1", 1, "xlsx"), blocks(b"old")))
+    consume(cache.store(("user-1", 2, "csv"), blocks(b"new")))
+
+    assert cache.get(("user-1", 1, "csv")) is None
+    assert cache.get(("user-1", 1, "xlsx")) is not None
+    assert cache.stats()["files"] == 2
+
+
+def test_etag_matches_weak_and_lists():
+    """If-None-Match is compared weakly and may list several tags."""
+    assert etag_matches('W/"3-csv"', 'W/"3-csv"')
+    assert etag_matches('"1-csv", "3-csv"', 'W/"3-csv"')
+    assert etag_matches("*", 'W/"3-csv"')
+    assert not etag_matches('W/"2-csv"', 'W/"3-csv"')
+    assert not etag_matches(None, 'W/"3-csv"')
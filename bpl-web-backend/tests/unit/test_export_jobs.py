@@ -0,0 +1,133 @@
+import asyncio
+import os
+
+import pytest
+
+from bpl_web_backend.modules.exports.jobs import ExportJobRunner, ExportJobStore, TooManyJobsError
+
+
+def make_store(directory, **options):
+    return ExportJobStore(str(directory), **{"max_per_user": 5, "ttl_seconds": 60, **options})
+
+
+def test_workers_bound_concurrency_and_cancel_stops_job(tmp_path):
+    """Only `workers` jobs build at once; a cancelled queued job never starts."""
+    store = make_store(tmp_path)
+    release = asyncio.Event()
+    started = []
+
+    async def build(job):
+        started.append(job.id)
+        await release.wait()
+        yield b"data"
+
+    runner = ExportJobRunner(store, build, workers=1, poll_seconds=0)
+
+    async def scenario():
+        first = store.submit("user-1", "csv")
+        second = store.submit("user-1", "csv")
+        tasks = await runner.run_pending()
+        await asyncio.sleep(0.01)
+        assert (store.get("user-1", first.id).status, store.get("user-1", second.id).status) == ("running", "queued")
+        store.cancel(second)
+        release.set()
+        await asyncio.gather(*tasks)
+        assert await runner.run_pending() == []
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    first, second = store.get("user-1", first.id), store.get("user-1", second.id)
+    assert started == [first.id]
+    assert (first.status, second.status) == ("completed", "cancelled")
+    assert open(first.path, "rb").read() == b"data"
+
+
+def test_jobs_are_shared_through_the_directory(tmp_path):
+    """A job queued by one process is seen by another, and cancelling it there stops the build."""
+    worker, api = make_store(tmp_path), make_store(tmp_path)
+    cancelled = asyncio.Event()
+
+    async def build(job):
+        job.total_rows = 2
+        job.rows_written = 1
+        yield b"first"
+        await cancelled.wait()
+        yield b"second"
+
+    runner = ExportJobRunner(worker, build, workers=1, poll_seconds=0)
+
+    async def scenario():
+        job = api.submit("user-1", "csv")
+        tasks = await runner.run_pending()
+        await asyncio.sleep(0.01)
+        assert (api.get("user-1", job.id).status, api.get("user-1", job.id).progress) == ("running", 0.5)
+        api.cancel(api.get("user-1", job.id))
+        cancelled.set()
+        await asyncio.gather(*tasks)
+        return job
+
+    job = asyncio.run(scenario())
+    assert api.get("user-1", job.id).status == "cancelled"
+    assert api.get("user-2", job.id) is None
+    assert api.get("user-1", "../../etc/passwd") is None
+    assert sorted(path.name for path in tmp_path.rglob("*") if path.is_file()) == [".lock", f"{job.id}.json"]
+
+
+def test_active_jobs_per_user_are_limited(tmp_path):
+    """A user cannot queue more than `max_per_user` jobs at once."""
+    store = make_store(tmp_path, max_per_user=1)
+
+    store.submit("user-1", "csv")
+    with pytest.raises(TooManyJobsError):
+        store.submit("user-1", "csv")
+    store.submit("user-2", "csv")
+
+
+def test_jobs_left_running_are_queued_again(tmp_path):
+    """Jobs a stopped worker was building start over on the next worker."""
+    store = make_store(tmp_path)
+    job = store.submit("user-1", "csv")
+    store.claim()
+    open(store.partial_path(job), "wb").close()
+
+    store.requeue_running()
+
+    assert store.get("user-1", job.id).status == "queued"
+    assert not os.path.exists(store.partial_path(job))
+
+
+def test_finished_jobs_expire_with_their_files(tmp_path):
+    """After the TTL a job and its file are gone."""
+    now = [1000.0]
+    store = make_store(tmp_path, clock=lambda: now[0])
+
+    async def data(job):
+        yield b"data"
+
+    async def scenario():
+        job = store.submit("user-1", "csv")
+        await asyncio.gather(*await ExportJobRunner(store, data, workers=1, poll_seconds=0).run_pending())
+        return job
+
+    job = asyncio.run(scenario())
+    assert store.get("user-1", job.id).status == "completed"
+    now[0] += 61
+    assert store.get("user-1", job.id) is None
+    assert store.list("user-1") == []
+    store.expire()
+    assert [path.name for path in tmp_path.rglob("*") if path.is_file()] == [".lock"]
+
+
+def test_unreadable_job_files_are_skipped(tmp_path):
+    """A truncated or foreign sidecar is ignored instead of failing every request of the user."""
+    store = make_store(tmp_path)
+    job = store.submit("user-1", "csv")
+    directory = os.path.dirname(store.file_path(job))
+    with open(os.path.join(directory, f"{'0' * 32}.json"), "w") as sidecar:
+        sidecar.write('{"id": "trunc')
+    with open(os.path.join(directory, f"{'1' * 32}.json"), "w") as sidecar:
+        sidecar.write('{"unrelated": true}')
+
+    assert [listed.id for listed in store.list("user-1")] == [job.id]
+    assert store.get("user-1", "0" * 32) is None
+    store.submit("user-1", "csv")
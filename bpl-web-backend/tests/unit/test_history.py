@@ -0,0 +1,76 @@
+import datetime
+
+from bpl_web_backend.modules.blood_pressure_log.history import History, HistoryCache
+
+
+def reading(log_id, day, systolic=120, revision=None):
+    row = {"id": log_id, "record_datetime": f"2024-01-{day:02d}T08:00:00+00:00", "systolic": systolic, "diastolic": 80, "heart_rate": 70}
+    if revision is not None:
+        row["revision"] = revision
+    return row
+
+
+def test_history_sorted_by_time_and_windowed():
+    history = History.from_records([reading(3, 3), reading(1, 1), reading(2, 2)], revision=7)
+
+    assert history.ids.tolist() == [1, 2, 3]
+    window = history.window(datetime.datetime(2024, 1, 2, tzinfo=datetime.timezone.utc), datetime.datetime(2024, 1, 3, 8, tzinfo=datetime.timezone.utc))
+    assert window.ids.tolist() == [2]
+    assert window.to_frame()["record_datetime"].tolist() == [datetime.datetime(2024, 1, 2, 8, tzinfo=datetime.timezone.utc)]
+
+
+def test_history_upserts_replace_and_reorder():
+    history = History.from_records([reading(1, 1), reading(2, 2)], revision=1)
+
+    moved = history.with_upserts([reading(1, 5, systolic=150), reading(3, 3)], revision=3)
+
+    assert moved.ids.tolist() == [2, 3, 1]
+    assert moved.systolic.tolist() == [120, 120, 150]
+    assert moved.revision == 3
+    assert history.ids.tolist() == [1, 2]
+    assert moved.without(3, revision=4).ids.tolist() == [2, 1]
+
+
+def test_cache_serves_only_the_current_revision():
+    cache = HistoryCache(max_bytes=1024 * 1024)
+    cache.put("user", History.from_records([reading(1, 1)], revision=4))
+
+    assert cache.get("user", 4) is not None
+    assert cache.get("user", 5) is None
+    assert cache.get("user", 4) is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_cache_applies_writes_that_follow_its_revision():
+    cache = HistoryCache(max_bytes=1024 * 1024)
+    cache.put("user", History.from_records([reading(1, 1)], revision=4))
+
+    cache.apply_upserts("user", [reading(2, 2, revision=5), reading(3, 3, revision=6)])
+    cache.apply_delete("user", 1)
+
+    history = cache.get("user", 7)
+    assert history is not None
+    assert history.ids.tolist() == [2, 3]
+
+
+def test_cache_drops_history_when_a_write_was_missed():
+    cache = HistoryCache(max_bytes=1024 * 1024)
+    cache.put("user", History.from_records([reading(1, 1)], revision=4))
+
+    # Revision 5 was written elsewhere, e.g. by another worker process.
+    cache.apply_upserts("user", [reading(2, 2, revision=6)])
+
+    assert cache.stats()["users"] == 0
+
+
+def test_cache_evicts_least_recently_used_by_bytes():
+    one = History.from_records([reading(1, 1)], revision=1)
+    cache = HistoryCache(max_bytes=2 * one.nbytes)
+    cache.put("a", one)
+    cache.put("b", History.from_records([reading(1, 1)], revision=1))
+    cache.get("a", 1)
+    cache.put("c", History.from_records([reading(1, 1)], revision=1))
+
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1) is not None
+    assert cache.stats()["evictions"] == 1
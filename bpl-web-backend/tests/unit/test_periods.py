@@ -0,0 +1,49 @@
+from datetime import datetime, timezone
+
+from bpl_web_backend.modules.medications.periods import PeriodIndex, medication_changes, microseconds
+
+
+def period(valid_from, valid_to=None, medication_id=1):
+    return {"medication_id": medication_id, "valid_from": valid_from, "valid_to": valid_to}
+
+
+def test_active_at_resolves_overlapping_half_open_and_open_periods():
+    index = PeriodIndex([
+        period("2024-01-01T00:00:00+00:00", "2024-02-01T00:00:00+00:00"),
+        # Dose change: the next version starts where the previous one ends.
+        period("2024-02-01T00:00:00+00:00", None),
+        period("2024-01-15T00:00:00+00:00", "2024-03-01T00:00:00+00:00", medication_id=2),
+    ])
+    times = microseconds([
+        "2023-12-31T23:59:59+00:00",
+        "2024-01-01T00:00:00+00:00",
+        "2024-01-20T00:00:00+00:00",
+        "2024-02-01T00:00:00+00:00",
+        datetime(2024, 3, 1, tzinfo=timezone.utc),
+        "2030-01-01T00:00:00+00:00",
+    ])
+
+    assert index.active_at(times) == [(), (0,), (0, 2), (1, 2), (1,), (1,)]
+
+
+def test_empty_periods_are_never_active():
+    index = PeriodIndex([period("2024-01-01T00:00:00+00:00", "2024-01-01T00:00:00+00:00")])
+
+    assert index.active_at(microseconds(["2024-01-01T00:00:00+00:00"])) == [()]
+    assert PeriodIndex([]).active_at(microseconds(["2024-01-01T00:00:00+00:00"])) == [()]
+
+
+def test_medication_changes_tell_starts_dose_changes_and_stops_apart():
+    changes = medication_changes([
+        {**period("2024-01-01T00:00:00+00:00", "2024-02-01T00:00:00+00:00"), "medicine_name": "A", "dosage_mg": 10},
+        {**period("2024-02-01T00:00:00+00:00", "2024-03-01T00:00:00+00:00"), "medicine_name": "A", "dosage_mg": 20},
+        # Same dose, e.g. new intake times: not a change.
+        {**period("2024-03-01T00:00:00+00:00", "2024-04-01T00:00:00+00:00"), "medicine_name": "A", "dosage_mg": 20},
+        {**period("2024-01-15T00:00:00+00:00", None, medication_id=2), "medicine_name": "B", "dosage_mg": None},
+    ])
+
+    assert changes["change"].tolist() == ["start", "start", "dose_change", "stop"]
+    assert changes["medication_id"].tolist() == [1, 2, 1, 1]
+    assert changes["dosage_before"].tolist() == [None, None, 10, 20]
+    assert changes["dosage_after"].tolist() == [10, None, 20, None]
+    assert changes["at"][3] == microseconds(["2024-04-01T00:00:00+00:00"])[0]
@@ -0,0 +1,93 @@
+import asyncio
+from datetime import datetime, time, timedelta, timezone
+
+from fastapi.testclient import TestClient
+
+from bpl_web_backend.modules.medications.scheduler import Dose, DoseScheduler
+from bpl_web_backend.modules.reminders.dispatcher import ReminderDispatcher
+from bpl_web_backend.modules.reminders.sinks import MemorySink
+from bpl_web_backend.modules.reminders.worker import app
+
+NOW = datetime(2024, 3, 1, 1, 0, tzinfo=timezone.utc)
+
+
+def dispatcher(sink, scheduler=None, **options):
+    settings = dict(batch_size=2, rate_per_second=1000, max_attempts=3, retry_base_seconds=0, poll_seconds=0.01, max_queue=100)
+    settings.update(options)
+    return ReminderDispatcher(scheduler or DoseScheduler("UTC"), sink, clock=lambda: NOW, **settings)
+
+
+def dose(user_id, medication_id, minutes=0):
+    return Dose(NOW - timedelta(minutes=minutes), user_id, medication_id, time(1))
+
+
+def test_doses_of_a_user_due_together_become_one_reminder():
+    sink = MemorySink()
+    reminders = dispatcher(sink)
+
+    reminders.enqueue([dose("alice", 1), dose("alice", 2), dose("bob", 3), dose("alice", 1)])
+    asyncio.run(reminders.deliver())
+
+    assert [(r.user_id, r.medication_ids) for r in sink.delivered] == [("alice", [1, 2]), ("bob", [3])]
+    # Delivered doses are not queued again.
+    reminders.enqueue([dose("alice", 2)])
+    assert reminders.depth == 0
+    assert reminders.stats()["deduplicated"] == 2
+
+
+def test_batches_are_bounded_and_failures_retried_until_the_limit():
+    sink = MemorySink(fail=lambda reminder: reminder.user_id == "flaky")
+    reminders = dispatcher(sink)
+    reminders.enqueue([dose("flaky", 1), dose("alice", 2), dose("bob", 3, minutes=5)])
+
+    async def drain():
+        while reminders.depth:
+            await reminders.deliver()
+            await asyncio.sleep(0)
+
+    asyncio.run(drain())
+
+    stats = reminders.stats()
+    assert sink.batches == 3
+    assert {r.user_id for r in sink.delivered} == {"alice", "bob"}
+    assert (stats["delivered"], stats["retried"], stats["failed"]) == (2, 2, 1)
+    assert stats["last_delivery_lag_seconds"] == 0
+
+
+def test_poll_takes_due_doses_up_to_the_queue_limit():
+    scheduler = DoseScheduler("UTC", clock=lambda: NOW - timedelta(hours=2))
+    scheduler.load([{"id": i, "user_id": f"user-{i}", "intake_time": ["00:30"]} for i in range(5)])
+    reminders = dispatcher(MemorySink(), scheduler, max_queue=3)
+
+    taken = asyncio.run(reminders.poll())
+
+    stats = reminders.stats()
+    assert taken == 3
+    assert stats["queued"] == 3
+    assert stats["lag_seconds"] == stats["scheduler_lag_seconds"] == 1800
+
+
+def test_background_tasks_deliver_due_reminders():
+    sink = MemorySink()
+    scheduler = DoseScheduler("UTC", clock=lambda: NOW - timedelta(hours=2))
+    scheduler.load([{"id": 1, "user_id": "alice", "intake_time": ["00:30"]}])
+    reminders = dispatcher(sink, scheduler)
+
+    async def scenario():
+        reminders.start()
+        for _ in range(100):
+            if sink.delivered:
+                break
+            await asyncio.sleep(0.01)
+        await reminders.close()
+
+    asyncio.run(scenario())
+    assert [r.medication_ids for r in sink.delivered] == [[1]]
+
+
+def test_worker_serves_metrics():
+    """The worker process serves its own metrics; the API does not."""
+    response = TestClient(app).get("/metrics")
+
+    assert response.status_code == 200
+    assert {"medications", "sync_lag_seconds", "queued", "lag_seconds"} <= response.json().keys()
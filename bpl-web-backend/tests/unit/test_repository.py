@@ -0,0 +1,157 @@
+import asyncio
+import datetime
+import json
+import uuid
+from contextlib import asynccontextmanager
+from unittest.mock import patch, MagicMock, AsyncMock
+
+import asyncpg
+import pytest
+from postgrest.exceptions import APIError
+
+from bpl_web_backend.database import PostgresPool
+from bpl_web_backend.repository import record_to_dict
+from bpl_web_backend.modules.blood_pressure_log.repository import PostgresBloodPressureLogRepository, SupabaseBloodPressureLogRepository
+from bpl_web_backend.modules.profile.repository import PostgresProfileRepository
+
+
+def make_pool(connection):
+    """Build a PostgresPool whose asyncpg pool hands out `connection`."""
+    @asynccontextmanager
+    async def acquire():
+        yield connection
+
+    @asynccontextmanager
+    async def transaction():
+        yield
+
+    connection.transaction = transaction
+    pool = PostgresPool()
+    pool._pool = MagicMock(acquire=acquire)
+    return pool
+
+
+def test_transaction_sets_rls_user_context():
+    """Every transaction runs as `authenticated` with the caller's claims."""
+    connection = MagicMock(execute=AsyncMock())
+    pool = make_pool(connection)
+
+    async def scenario():
+        async with pool.transaction("user-123"):
+            pass
+
+    asyncio.run(scenario())
+    sql, claims = connection.execute.call_args.args
+    assert "request.jwt.claims" in sql
+    assert json.loads(claims) == {"sub": "user-123", "role": "authenticated"}
+
+
+def test_transaction_raises_database_errors_as_api_errors():
+    """Driver errors surface as APIError so services handle both backends alike."""
+    connection = MagicMock(execute=AsyncMock())
+    pool = make_pool(connection)
+
+    async def scenario():
+        async with pool.transaction("user-123"):
+            raise asyncpg.UniqueViolationError("duplicate key value violates unique constraint")
+
+    with pytest.raises(APIError) as exc_info:
+        asyncio.run(scenario())
+    assert exc_info.value.code == "23505"
+
+
+def test_record_to_dict_matches_postgrest_shape():
+    """UUIDs and dates come back as strings, timestamps stay datetimes."""
+    user_id = uuid.uuid4()
+    now = datetime.datetime.now(datetime.timezone.utc)
+    row = record_to_dict({"user_id": user_id, "date_of_birth": datetime.date(2000, 1, 1), "created_at": now})
+    assert row == {"user_id": str(user_id), "date_of_birth": "2000-01-01", "created_at": now}
+
+
+def test_postgres_update_scopes_statement_to_user():
+    """Updates are parameterized and filtered by both id and user."""
+    connection = MagicMock(execute=AsyncMock(), fetchrow=AsyncMock(return_value={"id": 1, "notes": "x"}))
+    with patch('bpl_web_backend.modules.blood_pressure_log.repository.pg_pool', make_pool(connection)):
+        row = asyncio.run(PostgresBloodPressureLogRepository().update_log("user-123", 1, {"notes": "x"}))
+
+    assert row == {"id": 1, "notes": "x"}
+    sql, *params = connection.fetchrow.call_args.args
+    assert sql == 'UPDATE blood_pressure_records SET "notes" = $3 WHERE id = $1 AND user_id = $2 RETURNING *'
+    assert params == [1, "user-123", "x"]
+
+
+def test_supabase_count_after_cursor_covers_the_whole_window():
+    """With a cursor the page is read without a count and the window is counted on its own."""
+    after = (datetime.datetime(2024, 1, 2, tzinfo=datetime.timezone.utc), 5)
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    with patch('bpl_web_backend.modules.blood_pressure_log.repository.async_supabase') as supabase:
+        query = supabase.table.return_value.select.return_value.eq.return_value.gte.return_value
+        query.or_.return_value.order.return_value.order.return_value.range.return_value.execute = AsyncMock(return_value=MagicMock(data=[{"id": 4}], count=None))
+        query.limit.return_value.execute = AsyncMock(return_value=MagicMock(count=7))
+        rows, total = asyncio.run(SupabaseBloodPressureLogRepository().list_logs("user-123", 2, after=after, include_count=True, start=start))
+
+    assert (rows, total) == ([{"id": 4}], 7)
+    assert [c.kwargs["count"] for c in supabase.table.return_value.select.call_args_list] == [None, "exact"]
+    query.or_.assert_called_once()
+    query.limit.assert_called_once_with(0)
+
+
+def test_postgres_count_after_cursor_covers_the_whole_window():
+    """The count ignores the keyset, so every page reports the size of the whole window."""
+    after = (datetime.datetime(2024, 1, 2, tzinfo=datetime.timezone.utc), 5)
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    connection = MagicMock(execute=AsyncMock(), fetch=AsyncMock(return_value=[]), fetchval=AsyncMock(return_value=7))
+    with patch('bpl_web_backend.modules.blood_pressure_log.repository.pg_pool', make_pool(connection)):
+        _, total = asyncio.run(PostgresBloodPressureLogRepository().list_logs("user-123", 2, after=after, include_count=True, start=start))
+
+    assert total == 7
+    assert "(record_datetime, id) <" in connection.fetch.call_args.args[0]
+    assert connection.fetchval.call_args.args == ("SELECT count(*) FROM blood_pressure_records WHERE user_id = $1 AND record_datetime >= $2", "user-123", start)
+
+
+def test_postgres_profile_converts_date_of_birth():
+    """The `date` column is written from the model's ISO string."""
+    connection = MagicMock(execute=AsyncMock(), fetchrow=AsyncMock(return_value={"user_id": "user-123"}))
+    with patch('bpl_web_backend.modules.profile.repository.pg_pool', make_pool(connection)):
+        asyncio.run(PostgresProfileRepository().create_profile("user-123", {"full_name": "A", "date_of_birth": "2000-01-01"}))
+
+    params = connection.fetchrow.call_args.args[1:]
+    assert params == ("user-123", "A", datetime.date(2000, 1, 1))
+
+
+def test_postgres_summary_groups_in_local_time():
+    """Buckets are truncated in the requested timezone and filtered by the window."""
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    bucket_start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone(datetime.timedelta(hours=7)))
+    row = {"bucket_start": bucket_start, "count": 2}
+    for metric in ("systolic", "diastolic", "heart_rate"):
+        row.update({f"{metric}_mean": 120.5, f"{metric}_min": 120, f"{metric}_max": 121})
+    connection = MagicMock(execute=AsyncMock(), fetch=AsyncMock(return_value=[row]))
+    with patch('bpl_web_backend.modules.blood_pressure_log.repository.pg_pool', make_pool(connection)):
+        buckets = asyncio.run(PostgresBloodPressureLogRepository().summarize_logs("user-123", "week", "Asia/Bangkok", start=start))
+
+    sql, *params = connection.fetch.call_args.args
+    assert "date_trunc($2, record_datetime AT TIME ZONE $3) AT TIME ZONE $3" in sql
+    assert "record_datetime >= $4" in sql
+    assert params == ["user-123", "week", "Asia/Bangkok", start]
+    assert buckets == [{
+        "bucket_start": bucket_start,
+        "count": 2,
+        "systolic": {"mean": 120.5, "min": 120, "max": 121},
+        "diastolic": {"mean": 120.5, "min": 120, "max": 121},
+        "heart_rate": {"mean": 120.5, "min": 120, "max": 121},
+    }]
+
+
+def test_postgres_bulk_insert_sends_column_arrays():
+    """A chunk of readings is one INSERT ... SELECT FROM unnest, skipping duplicates."""
+    when = datetime.datetime(2024, 1, 1, 8, tzinfo=datetime.timezone.utc)
+    connection = MagicMock(execute=AsyncMock(), fetch=AsyncMock(return_value=[{"id": 1, "record_datetime": when}]))
+    rows = [{"record_datetime": when, "systolic": 120, "diastolic": 80, "heart_rate": 70, "notes": None}]
+    with patch('bpl_web_backend.modules.blood_pressure_log.repository.pg_pool', make_pool(connection)):
+        created = asyncio.run(PostgresBloodPressureLogRepository().create_logs("user-123", rows))
+
+    assert created == [{"id": 1, "record_datetime": when}]
+    sql, *params = connection.fetch.call_args.args
+    assert "unnest(" in sql and "ON CONFLICT (user_id, record_datetime) DO NOTHING" in sql
+    assert params == ["user-123", [when], [120], [80], [70], [None]]
@@ -0,0 +1,121 @@
+import asyncio
+from datetime import datetime, time, timedelta, timezone
+
+from bpl_web_backend.modules.medications.scheduler import DoseScheduler, ScheduleFeed, intake_slots, parse_intake_time
+
+# 07:00 in Bangkok (UTC+7).
+NOW = datetime(2024, 3, 1, 0, 0, tzinfo=timezone.utc)
+
+
+def medication(medication_id, intake_time, user_id="user", is_active=True):
+    return {"id": medication_id, "user_id": user_id, "intake_time": intake_time, "is_active": is_active}
+
+
+def test_parse_intake_time_reads_clock_and_named_times():
+    assert parse_intake_time("08:00") == time(8)
+    assert parse_intake_time(" 8.30 ") == time(8, 30)
+    assert parse_intake_time("8 pm") == time(20)
+    assert parse_intake_time("12:15 AM") == time(0, 15)
+    assert parse_intake_time("Morning") == time(8)
+    assert parse_intake_time("ก่อนนอน") == time(22)
+    assert parse_intake_time("Anytime") is None
+    assert parse_intake_time("25:00") is None
+    assert parse_intake_time("8") is None
+    assert intake_slots(["18:00", "Evening", "08:00", "Anytime"]) == (time(8), time(18))
+
+
+def test_upcoming_doses_in_time_order_across_users():
+    scheduler = DoseScheduler("Asia/Bangkok", clock=lambda: NOW)
+    scheduler.load([medication(1, ["18:00", "08:00"], "alice"), medication(2, ["Morning"], "bob"), medication(3, ["Anytime"])])
+
+    doses = scheduler.upcoming(NOW + timedelta(hours=12))
+
+    assert [(dose.medication_id, dose.due_at.hour) for dose in doses] == [(1, 1), (2, 1), (1, 11)]
+    assert doses[0].user_id == "alice"
+    # Looking does not consume.
+    assert len(scheduler.upcoming(NOW + timedelta(hours=12))) == 3
+
+
+def test_take_due_schedules_the_next_day():
+    scheduler = DoseScheduler("Asia/Bangkok", clock=lambda: NOW)
+    scheduler.load([medication(1, ["08:00"])])
+
+    assert [dose.due_at for dose in scheduler.take_due(NOW + timedelta(hours=2))] == [datetime(2024, 3, 1, 1, tzinfo=timezone.utc)]
+    assert scheduler.take_due(NOW + timedelta(hours=2)) == []
+    assert scheduler.upcoming(NOW + timedelta(days=1, hours=2))[0].due_at == datetime(2024, 3, 2, 1, tzinfo=timezone.utc)
+
+
+def test_changes_replace_earlier_schedules():
+    scheduler = DoseScheduler("Asia/Bangkok", clock=lambda: NOW)
+    scheduler.load([medication(1, ["08:00"]), medication(2, ["09:00"])])
+
+    scheduler.schedule("user", medication(1, ["10:00"]))
+    scheduler.schedule("user", medication(2, ["09:00"], is_active=False))
+
+    doses = scheduler.upcoming(NOW + timedelta(days=1))
+    assert [(dose.medication_id, dose.slot) for dose in doses] == [(1, time(10))]
+    scheduler.remove(1)
+    assert scheduler.upcoming(NOW + timedelta(days=1)) == []
+    assert scheduler.stats()["medications"] == 0
+
+
+class Source:
+    """In-memory stand-in for the medications repository, as the feed sees it."""
+
+    def __init__(self, active=(), changes=(), deletions=()):
+        self.active, self.changes, self.deletions = list(active), list(changes), list(deletions)
+        self.since = []
+
+    async def iter_active_medications(self):
+        yield self.active
+
+    async def iter_changes(self, since):
+        self.since.append(since)
+        yield self.changes
+
+    async def iter_deletions(self, since):
+        yield self.deletions
+
+
+def feed(source, scheduler, clock):
+    return ScheduleFeed(scheduler, source, poll_seconds=1, overlap=timedelta(minutes=2), reconcile_seconds=60, clock=clock)
+
+
+def test_feed_applies_changes_written_by_any_process():
+    now = [NOW]
+    scheduler = DoseScheduler("Asia/Bangkok", clock=lambda: now[0])
+    source = Source(active=[medication(1, ["08:00"]), medication(2, ["09:00"])])
+    changes = feed(source, scheduler, lambda: now[0])
+    asyncio.run(changes.load())
+
+    now[0] += timedelta(seconds=5)
+    source.changes = [medication(3, ["10:00"], "bob"), medication(2, ["09:00"], is_active=False)]
+    source.deletions = [1]
+    assert asyncio.run(changes.poll()) == 3
+
+    # Each poll re-reads the overlap before the previous one; re-applying changes nothing.
+    assert source.since == [NOW - timedelta(minutes=2)]
+    asyncio.run(changes.poll())
+    assert source.since[-1] == NOW + timedelta(seconds=5) - timedelta(minutes=2)
+    assert [(dose.user_id, dose.medication_id) for dose in scheduler.upcoming(NOW + timedelta(days=1))] == [("bob", 3)]
+
+
+def test_reconcile_drops_medications_missing_from_the_database():
+    scheduler = DoseScheduler("Asia/Bangkok", clock=lambda: NOW)
+    source = Source(active=[medication(1, ["08:00"]), medication(2, ["09:00"])])
+    changes = feed(source, scheduler, lambda: NOW)
+    asyncio.run(changes.load())
+
+    source.active = [medication(1, ["08:00"])]
+    assert asyncio.run(changes.reconcile()) == 1
+    assert scheduler.stats()["medications"] == 1
+
+
+def test_retain_keeps_schedules_set_after_the_reconcile_began():
+    scheduler = DoseScheduler("Asia/Bangkok", clock=lambda: NOW)
+    scheduler.load([medication(1, ["08:00"])])
+    version = scheduler.version
+    scheduler.schedule("user", medication(2, ["09:00"]))
+
+    assert scheduler.retain(set(), version) == 1
+    assert [dose.medication_id for dose in scheduler.upcoming(NOW + timedelta(days=1))] == [2]
@@ -0,0 +1,73 @@
+import datetime
+from zoneinfo import ZoneInfo
+
+from bpl_web_backend.modules.blood_pressure_log.summary import rollups_cover, summarize_records, summarize_rollups
+
+
+def reading(when, systolic, diastolic=80, heart_rate=70):
+    return {"record_datetime": when, "systolic": systolic, "diastolic": diastolic, "heart_rate": heart_rate}
+
+
+def test_daily_buckets_follow_local_midnight():
+    """A reading late in the UTC evening belongs to the next local day east of UTC."""
+    records = [
+        reading("2024-01-01T10:00:00+00:00", 120),
+        reading("2024-01-01T18:00:00+00:00", 140),  # 01:00 on Jan 2 in Bangkok
+        reading("2024-01-01T20:00:00+00:00", 130),
+    ]
+    buckets = summarize_records(records, "day", "Asia/Bangkok")
+
+    tz = ZoneInfo("Asia/Bangkok")
+    assert [b["bucket_start"] for b in buckets] == [
+        datetime.datetime(2024, 1, 1, tzinfo=tz),
+        datetime.datetime(2024, 1, 2, tzinfo=tz),
+    ]
+    assert [b["count"] for b in buckets] == [1, 2]
+    assert buckets[1]["systolic"] == {"mean": 135.0, "min": 130, "max": 140}
+
+
+def test_weekly_buckets_start_on_monday():
+    """Weeks match Postgres date_trunc('week'), which starts on Monday."""
+    records = [reading("2024-01-07T12:00:00Z", 120), reading("2024-01-08T12:00:00Z", 130)]  # Sunday, Monday
+    buckets = summarize_records(records, "week", "UTC")
+
+    assert [b["bucket_start"].date() for b in buckets] == [datetime.date(2024, 1, 1), datetime.date(2024, 1, 8)]
+
+
+def test_monthly_buckets_and_empty_input():
+    """Months group by calendar month; no readings means no buckets."""
+    records = [reading("2024-01-31T12:00:00Z", 120, heart_rate=60), reading("2024-01-02T12:00:00Z", 110, heart_rate=80)]
+    buckets = summarize_records(records, "month", "UTC")
+
+    assert len(buckets) == 1
+    assert buckets[0]["heart_rate"] == {"mean": 70.0, "min": 60, "max": 80}
+    assert summarize_records([], "month", "UTC") == []
+
+
+def rollup(day, count, systolic_sum, systolic_min, systolic_max):
+    row = {"day": day, "record_count": count}
+    for metric in ("diastolic", "heart_rate"):
+        row.update({f"{metric}_sum": 80 * count, f"{metric}_min": 80, f"{metric}_max": 80})
+    row.update({"systolic_sum": systolic_sum, "systolic_min": systolic_min, "systolic_max": systolic_max})
+    return row
+
+
+def test_rollups_combine_into_weighted_buckets():
+    """Means are weighted by each day's count, extremes taken across days."""
+    rows = [rollup("2024-01-01", 1, 120, 120, 120), rollup("2024-01-03", 3, 390, 110, 150)]
+    buckets = summarize_rollups(rows, "week")
+
+    assert len(buckets) == 1
+    assert buckets[0]["bucket_start"] == datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    assert buckets[0]["count"] == 4
+    assert buckets[0]["systolic"] == {"mean": 127.5, "min": 110, "max": 150}
+
+
+def test_rollups_cover_only_utc_days():
+    """Rollups are per UTC day, so they answer only UTC-aligned requests."""
+    utc = datetime.timezone.utc
+    assert rollups_cover("UTC")
+    assert rollups_cover("UTC", datetime.datetime(2024, 1, 1, tzinfo=utc), datetime.datetime(2024, 2, 1, tzinfo=utc))
+    assert not rollups_cover("UTC", datetime.datetime(2024, 1, 1, 12, tzinfo=utc))
+    assert not rollups_cover("Asia/Bangkok")
+    assert not rollups_cover("Europe/London")
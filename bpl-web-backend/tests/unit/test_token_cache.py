@@ -0,0 +1,79 @@
+from unittest.mock import MagicMock
+
+from bpl_web_backend.token_cache import TokenCache
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_user(user_id="user-123"):
+    user = MagicMock()
+    user.id = user_id
+    return user
+
+
+def test_get_returns_cached_user():
+    """A cached token is returned and counted as a hit."""
+    cache = TokenCache(max_size=10, ttl_seconds=60, clock=FakeClock())
+    user = make_user()
+    assert cache.get("token-a") is None
+    cache.put("token-a", user, token_expires_at=5000)
+    assert cache.get("token-a") is user
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_entry_never_outlives_token_expiry():
+    """The TTL is cut short by the token's own `exp`."""
+    clock = FakeClock()
+    cache = TokenCache(max_size=10, ttl_seconds=60, clock=clock)
+    cache.put("token-a", make_user(), token_expires_at=clock.now + 5)
+    clock.now += 6
+    assert cache.get("token-a") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_entry_expires_after_ttl():
+    """Entries expire after the cache TTL even if the token is still valid."""
+    clock = FakeClock()
+    cache = TokenCache(max_size=10, ttl_seconds=60, clock=clock)
+    cache.put("token-a", make_user(), token_expires_at=clock.now + 3600)
+    clock.now += 61
+    assert cache.get("token-a") is None
+
+
+def test_tokens_without_expiry_are_not_cached():
+    """Without an `exp` claim there is no safe upper bound, so nothing is cached."""
+    cache = TokenCache(max_size=10, ttl_seconds=60, clock=FakeClock())
+    cache.put("token-a", make_user(), token_expires_at=None)
+    assert cache.get("token-a") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    """The cache holds at most `max_size` entries."""
+    cache = TokenCache(max_size=2, ttl_seconds=60, clock=FakeClock())
+    cache.put("token-a", make_user("a"), token_expires_at=5000)
+    cache.put("token-b", make_user("b"), token_expires_at=5000)
+    cache.get("token-a")
+    cache.put("token-c", make_user("c"), token_expires_at=5000)
+
+    assert cache.get("token-b") is None
+    assert cache.get("token-a") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_token_and_user():
+    """Single tokens and all tokens of a user can be dropped explicitly."""
+    cache = TokenCache(max_size=10, ttl_seconds=60, clock=FakeClock())
+    cache.put("token-a", make_user("a"), token_expires_at=5000)
+    cache.put("token-a2", make_user("a"), token_expires_at=5000)
+    cache.put("token-b", make_user("b"), token_expires_at=5000)
+
+    assert cache.invalidate_token("token-b") is True
+    assert cache.invalidate_user("a") == 2
+    assert cache.stats()["size"] == 0
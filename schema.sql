@@ -11,7 +11,8 @@ CREATE TABLE public.user_profiles (
     medical_conditions text,
     gender          text,
     created_at      timestamptz DEFAULT now() NOT NULL,
-    updated_at      timestamptz DEFAULT now() NOT NULL
+    updated_at      timestamptz DEFAULT now() NOT NULL,
+    revision        bigint DEFAULT 0 NOT NULL -- set by stamp_user_data_revision()
 );
 
 -- Comment on user_profiles table
@@ -20,7 +21,7 @@ COMMENT ON TABLE public.user_profiles IS 'Stores public user profile information
 -- 2. Table for Medication Logs
 -- This table stores medication details for each user.
 CREATE TABLE public.medications (
-    medication_id   uuid DEFAULT gen_random_uuid() NOT NULL PRIMARY KEY,
+    id              bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
     user_id         uuid NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
     medicine_name   text NOT NULL,
     dosage_mg       integer,
@@ -29,7 +30,8 @@ CREATE TABLE public.medications (
     is_active       boolean DEFAULT true NOT NULL,
     notes           text,
     created_at      timestamptz DEFAULT now() NOT NULL,
-    updated_at      timestamptz DEFAULT now() NOT NULL
+    updated_at      timestamptz DEFAULT now() NOT NULL,
+    revision        bigint DEFAULT 0 NOT NULL -- set by stamp_user_data_revision()
 );
 
 -- Comment on medications table
@@ -38,19 +40,31 @@ COMMENT ON TABLE public.medications IS 'Stores medication logs for users.';
 -- 3. Table for Blood Pressure Records
 -- This table stores daily blood pressure readings for each user.
 CREATE TABLE public.blood_pressure_records (
-    record_id       uuid DEFAULT gen_random_uuid() NOT NULL PRIMARY KEY,
+    id              bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
     user_id         uuid NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
     record_datetime timestamptz NOT NULL,
     systolic        integer NOT NULL,
     diastolic       integer NOT NULL,
     heart_rate      integer NOT NULL,
     notes           text,
-    created_at      timestamptz DEFAULT now() NOT NULL
+    created_at      timestamptz DEFAULT now() NOT NULL,
+    updated_at      timestamptz DEFAULT now() NOT NULL,
+    revision        bigint DEFAULT 0 NOT NULL -- set by stamp_user_data_revision()
 );
 
 -- Comment on blood_pressure_records table
 COMMENT ON TABLE public.blood_pressure_records IS 'Stores blood pressure measurement records.';
 
+-- Keyset pagination walks this index newest-first: (record_datetime, id) < cursor.
+CREATE INDEX blood_pressure_records_user_datetime_idx
+    ON public.blood_pressure_records (user_id, record_datetime DESC, id DESC);
+
+-- A device reading is identified by its timestamp: bulk sync skips readings
+-- that were already uploaded (ON CONFLICT DO NOTHING on this index).
+-- Remove existing duplicates before creating it on a populated table.
+CREATE UNIQUE INDEX blood_pressure_records_user_datetime_key
+    ON public.blood_pressure_records (user_id, record_datetime);
+
 -- 4. Enable Row Level Security (RLS) for all tables
 -- Important for data privacy: Users should only access their own data.
 ALTER TABLE public.user_profiles ENABLE ROW LEVEL SECURITY;
@@ -105,6 +119,11 @@ CREATE POLICY "Users can delete their own blood pressure records."
     ON public.blood_pressure_records FOR DELETE
     USING (auth.uid() = user_id);
 
+CREATE POLICY "Users can update their own blood pressure records."
+    ON public.blood_pressure_records FOR UPDATE
+    USING (auth.uid() = user_id)
+    WITH CHECK (auth.uid() = user_id);
+
 -- Function to automatically update the `updated_at` timestamp
 CREATE OR REPLACE FUNCTION public.handle_updated_at()
 RETURNS TRIGGER AS $$
@@ -122,3 +141,414 @@ CREATE TRIGGER on_profile_update
 CREATE TRIGGER on_medication_update
     BEFORE UPDATE ON public.medications
     FOR EACH ROW EXECUTE PROCEDURE public.handle_updated_at();
+
+CREATE TRIGGER on_blood_pressure_record_updated_at
+    BEFORE UPDATE ON public.blood_pressure_records
+    FOR EACH ROW EXECUTE PROCEDURE public.handle_updated_at();
+
+-- 6. Daily rollups of blood pressure records
+-- One row per user and UTC day with the count, sums and extremes of each metric
+-- plus the day's latest reading. Triggers keep it in step with
+-- blood_pressure_records, so summaries read O(days) rows and the latest reading
+-- is a single-row lookup.
+CREATE TABLE public.blood_pressure_daily_rollups (
+    user_id               uuid NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    day                   date NOT NULL,
+    record_count          integer NOT NULL,
+    systolic_sum          bigint NOT NULL,
+    systolic_min          integer NOT NULL,
+    systolic_max          integer NOT NULL,
+    diastolic_sum         bigint NOT NULL,
+    diastolic_min         integer NOT NULL,
+    diastolic_max         integer NOT NULL,
+    heart_rate_sum        bigint NOT NULL,
+    heart_rate_min        integer NOT NULL,
+    heart_rate_max        integer NOT NULL,
+    latest_record_id      bigint NOT NULL,
+    latest_record_datetime timestamptz NOT NULL,
+    latest_systolic       integer NOT NULL,
+    latest_diastolic      integer NOT NULL,
+    latest_heart_rate     integer NOT NULL,
+    PRIMARY KEY (user_id, day)
+);
+
+COMMENT ON TABLE public.blood_pressure_daily_rollups IS 'Per-user, per-UTC-day aggregates of blood_pressure_records, maintained by triggers.';
+
+ALTER TABLE public.blood_pressure_daily_rollups ENABLE ROW LEVEL SECURITY;
+
+-- Users read their own rollups; only the triggers below write them.
+CREATE POLICY "Users can view their own blood pressure rollups."
+    ON public.blood_pressure_daily_rollups FOR SELECT
+    USING (auth.uid() = user_id);
+
+-- Recompute one user's rollup for one UTC day from the records of that day.
+CREATE OR REPLACE FUNCTION public.refresh_blood_pressure_daily_rollup(p_user_id uuid, p_day date)
+RETURNS void AS $$
+DECLARE
+    day_start timestamptz := p_day::timestamp AT TIME ZONE 'UTC';
+BEGIN
+    WITH day_records AS (
+        SELECT * FROM public.blood_pressure_records
+        WHERE user_id = p_user_id AND record_datetime >= day_start AND record_datetime < day_start + interval '1 day'
+    ), latest AS (
+        SELECT * FROM day_records ORDER BY record_datetime DESC, id DESC LIMIT 1
+    )
+    INSERT INTO public.blood_pressure_daily_rollups
+    SELECT p_user_id, p_day, a.*, latest.id, latest.record_datetime, latest.systolic, latest.diastolic, latest.heart_rate
+    FROM (
+        SELECT count(*), sum(systolic), min(systolic), max(systolic),
+               sum(diastolic), min(diastolic), max(diastolic),
+               sum(heart_rate), min(heart_rate), max(heart_rate)
+        FROM day_records
+    ) a, latest
+    ON CONFLICT (user_id, day) DO UPDATE SET
+        record_count = EXCLUDED.record_count,
+        systolic_sum = EXCLUDED.systolic_sum, systolic_min = EXCLUDED.systolic_min, systolic_max = EXCLUDED.systolic_max,
+        diastolic_sum = EXCLUDED.diastolic_sum, diastolic_min = EXCLUDED.diastolic_min, diastolic_max = EXCLUDED.diastolic_max,
+        heart_rate_sum = EXCLUDED.heart_rate_sum, heart_rate_min = EXCLUDED.heart_rate_min, heart_rate_max = EXCLUDED.heart_rate_max,
+        latest_record_id = EXCLUDED.latest_record_id,
+        latest_record_datetime = EXCLUDED.latest_record_datetime,
+        latest_systolic = EXCLUDED.latest_systolic,
+        latest_diastolic = EXCLUDED.latest_diastolic,
+        latest_heart_rate = EXCLUDED.latest_heart_rate;
+
+    -- `latest` is empty once the last record of the day is gone, so nothing was upserted.
+    IF NOT FOUND THEN
+        DELETE FROM public.blood_pressure_daily_rollups WHERE user_id = p_user_id AND day = p_day;
+    END IF;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Statement-level trigger: refresh every (user, day) touched by the statement once,
+-- so a bulk insert costs one refresh per day rather than one per row.
+CREATE OR REPLACE FUNCTION public.handle_blood_pressure_rollup()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM public.refresh_blood_pressure_daily_rollup(t.user_id, t.day)
+        FROM (SELECT DISTINCT user_id, (record_datetime AT TIME ZONE 'UTC')::date AS day FROM new_rows) t;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM public.refresh_blood_pressure_daily_rollup(t.user_id, t.day)
+        FROM (SELECT DISTINCT user_id, (record_datetime AT TIME ZONE 'UTC')::date AS day FROM old_rows) t;
+    ELSE
+        PERFORM public.refresh_blood_pressure_daily_rollup(t.user_id, t.day)
+        FROM (
+            SELECT user_id, (record_datetime AT TIME ZONE 'UTC')::date AS day FROM old_rows
+            UNION
+            SELECT user_id, (record_datetime AT TIME ZONE 'UTC')::date AS day FROM new_rows
+        ) t;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE TRIGGER on_blood_pressure_record_insert
+    AFTER INSERT ON public.blood_pressure_records
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE public.handle_blood_pressure_rollup();
+
+CREATE TRIGGER on_blood_pressure_record_update
+    AFTER UPDATE ON public.blood_pressure_records
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE public.handle_blood_pressure_rollup();
+
+CREATE TRIGGER on_blood_pressure_record_delete
+    AFTER DELETE ON public.blood_pressure_records
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE PROCEDURE public.handle_blood_pressure_rollup();
+
+-- Backfill / repair: rebuild the rollups of one user, or of everyone when p_user_id is NULL.
+-- Run once after creating the table, and whenever the rollups are suspected to have drifted.
+CREATE OR REPLACE FUNCTION public.rebuild_blood_pressure_daily_rollups(p_user_id uuid DEFAULT NULL)
+RETURNS integer AS $$
+DECLARE
+    rebuilt integer;
+BEGIN
+    DELETE FROM public.blood_pressure_daily_rollups WHERE p_user_id IS NULL OR user_id = p_user_id;
+
+    INSERT INTO public.blood_pressure_daily_rollups
+    SELECT a.user_id, a.day, a.record_count,
+           a.systolic_sum, a.systolic_min, a.systolic_max,
+           a.diastolic_sum, a.diastolic_min, a.diastolic_max,
+           a.heart_rate_sum, a.heart_rate_min, a.heart_rate_max,
+           l.id, l.record_datetime, l.systolic, l.diastolic, l.heart_rate
+    FROM (
+        SELECT user_id, (record_datetime AT TIME ZONE 'UTC')::date AS day, count(*) AS record_count,
+               sum(systolic) AS systolic_sum, min(systolic) AS systolic_min, max(systolic) AS systolic_max,
+               sum(diastolic) AS diastolic_sum, min(diastolic) AS diastolic_min, max(diastolic) AS diastolic_max,
+               sum(heart_rate) AS heart_rate_sum, min(heart_rate) AS heart_rate_min, max(heart_rate) AS heart_rate_max
+        FROM public.blood_pressure_records
+        WHERE p_user_id IS NULL OR user_id = p_user_id
+        GROUP BY 1, 2
+    ) a
+    JOIN LATERAL (
+        SELECT id, record_datetime, systolic, diastolic, heart_rate
+        FROM public.blood_pressure_records r
+        WHERE r.user_id = a.user_id
+          AND r.record_datetime >= a.day::timestamp AT TIME ZONE 'UTC'
+          AND r.record_datetime < (a.day + 1)::timestamp AT TIME ZONE 'UTC'
+        ORDER BY r.record_datetime DESC, r.id DESC
+        LIMIT 1
+    ) l ON true;
+
+    GET DIAGNOSTICS rebuilt = ROW_COUNT;
+    RETURN rebuilt;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Only the service role may rebuild rollups for arbitrary users.
+REVOKE EXECUTE ON FUNCTION public.rebuild_blood_pressure_daily_rollups(uuid) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.refresh_blood_pressure_daily_rollup(uuid, date) FROM PUBLIC, anon, authenticated;
+
+-- 7. Per-user data revisions and delta sync
+-- A counter per user and resource (table name) that increases with every row
+-- the user inserts, updates or deletes there. Each changed row is stamped with
+-- the new value in its `revision` column, and each deleted row leaves a
+-- tombstone carrying it. Caches and HTTP validators (ETags) key on the counter,
+-- and /api/sync returns what changed after a given revision.
+--
+-- Bumping takes a row lock on the user's counter until commit, so a user's
+-- writes commit in revision order: a reader never sees revision n+1 while n
+-- is still uncommitted, which is what makes "everything after n" exact.
+CREATE TABLE public.user_data_revisions (
+    user_id         uuid NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    resource        text NOT NULL,
+    revision        bigint NOT NULL DEFAULT 1,
+    updated_at      timestamptz DEFAULT now() NOT NULL,
+    PRIMARY KEY (user_id, resource)
+);
+
+COMMENT ON TABLE public.user_data_revisions IS 'Per-user change counters of each table, maintained by triggers.';
+
+CREATE TABLE public.sync_tombstones (
+    user_id         uuid NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    resource        text NOT NULL,
+    revision        bigint NOT NULL,
+    record_id       text NOT NULL,
+    deleted_at      timestamptz DEFAULT now() NOT NULL,
+    PRIMARY KEY (user_id, resource, revision)
+);
+
+COMMENT ON TABLE public.sync_tombstones IS 'Deleted rows, kept so sync clients can drop them from their replicas.';
+
+ALTER TABLE public.user_data_revisions ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.sync_tombstones ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their own data revisions."
+    ON public.user_data_revisions FOR SELECT
+    USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can view their own tombstones."
+    ON public.sync_tombstones FOR SELECT
+    USING (auth.uid() = user_id);
+
+-- Row trigger: bump the user's revision of the table and stamp it on the row,
+-- or on the tombstone of a deleted row. TG_ARGV[0] is the primary key column.
+--
+-- Further arguments name a unique key that inserts may skip on with ON
+-- CONFLICT DO NOTHING. A BEFORE trigger runs before the conflict is found, so
+-- an insert whose key already exists leaves the revision alone: a retried
+-- batch of duplicates changes no data and must not change ETags or caches.
+-- The key is checked while holding the counter's row lock, so every earlier
+-- write of the user is visible to it.
+CREATE OR REPLACE FUNCTION public.stamp_user_data_revision()
+RETURNS TRIGGER AS $$
+DECLARE
+    row_user_id uuid;
+    next_revision bigint;
+    key_condition text;
+    duplicate boolean;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        row_user_id := OLD.user_id;
+    ELSE
+        row_user_id := NEW.user_id;
+    END IF;
+
+    -- Rows removed by deleting the user need neither a revision nor a tombstone.
+    IF NOT EXISTS (SELECT 1 FROM auth.users WHERE id = row_user_id) THEN
+        RETURN COALESCE(NEW, OLD);
+    END IF;
+
+    PERFORM 1 FROM public.user_data_revisions
+    WHERE user_id = row_user_id AND resource = TG_TABLE_NAME
+    FOR UPDATE;
+
+    IF FOUND AND TG_OP = 'INSERT' AND TG_NARGS > 1 THEN
+        SELECT string_agg(format('%I = ($1).%I', key_column, key_column), ' AND ')
+        INTO key_condition
+        FROM unnest(TG_ARGV[1:TG_NARGS - 1]) AS key_column;
+        EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I.%I WHERE %s)', TG_TABLE_SCHEMA, TG_TABLE_NAME, key_condition)
+        INTO duplicate
+        USING NEW;
+        IF duplicate THEN
+            RETURN NEW;
+        END IF;
+    END IF;
+
+    INSERT INTO public.user_data_revisions (user_id, resource)
+    VALUES (row_user_id, TG_TABLE_NAME)
+    ON CONFLICT (user_id, resource) DO UPDATE
+        SET revision = user_data_revisions.revision + 1, updated_at = now()
+    RETURNING revision INTO next_revision;
+
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO public.sync_tombstones (user_id, resource, revision, record_id)
+        VALUES (row_user_id, TG_TABLE_NAME, next_revision, to_jsonb(OLD) ->> TG_ARGV[0]);
+        RETURN OLD;
+    END IF;
+    NEW.revision := next_revision;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE TRIGGER on_profile_change_revision
+    BEFORE INSERT OR UPDATE OR DELETE ON public.user_profiles
+    FOR EACH ROW EXECUTE PROCEDURE public.stamp_user_data_revision('user_id');
+
+CREATE TRIGGER on_medication_change_revision
+    BEFORE INSERT OR UPDATE OR DELETE ON public.medications
+    FOR EACH ROW EXECUTE PROCEDURE public.stamp_user_data_revision('id');
+
+CREATE TRIGGER on_blood_pressure_record_change_revision
+    BEFORE INSERT OR UPDATE OR DELETE ON public.blood_pressure_records
+    FOR EACH ROW EXECUTE PROCEDURE public.stamp_user_data_revision('id', 'user_id', 'record_datetime');
+
+-- Rows that predate these triggers keep revision 0, which sync never returns;
+-- stamp them once with e.g. `UPDATE public.medications SET revision = 0;`.
+-- Delta sync reads each table, and the tombstones, in revision order.
+CREATE INDEX user_profiles_user_revision_idx ON public.user_profiles (user_id, revision);
+CREATE INDEX medications_user_revision_idx ON public.medications (user_id, revision);
+CREATE INDEX blood_pressure_records_user_revision_idx ON public.blood_pressure_records (user_id, revision);
+
+-- 8. Dose adherence bitmaps
+-- One row per medication, intake slot and calendar year instead of one row per
+-- dose: bit d of `taken` and `missed` stands for day d of the year (0 = 1
+-- January), bits numbered as set_bit() does, 8 per byte from the lowest. A
+-- year of a twice-daily medication is two rows of 2 x 46 bytes, and the
+-- adherence of any window is a popcount over at most a few rows.
+CREATE TABLE public.medication_adherence (
+    user_id         uuid NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    medication_id   bigint NOT NULL REFERENCES public.medications(id) ON DELETE CASCADE,
+    slot            time NOT NULL,
+    year            smallint NOT NULL,
+    taken           bytea NOT NULL,
+    missed          bytea NOT NULL,
+    updated_at      timestamptz DEFAULT now() NOT NULL,
+    PRIMARY KEY (medication_id, slot, year),
+    CHECK (length(taken) = 46 AND length(missed) = 46)
+);
+
+COMMENT ON TABLE public.medication_adherence IS 'Per-day taken/missed bitmaps of each medication intake slot and year.';
+
+CREATE INDEX medication_adherence_user_year_idx ON public.medication_adherence (user_id, year);
+
+ALTER TABLE public.medication_adherence ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their own adherence."
+    ON public.medication_adherence FOR SELECT
+    USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can insert their own adherence."
+    ON public.medication_adherence FOR INSERT
+    WITH CHECK (auth.uid() = user_id);
+
+CREATE POLICY "Users can update their own adherence."
+    ON public.medication_adherence FOR UPDATE
+    USING (auth.uid() = user_id)
+    WITH CHECK (auth.uid() = user_id);
+
+-- Mark one dose of the user's medication as taken or missed, creating the
+-- year's row on first use; flipping both bits in one statement keeps them
+-- exclusive. Returns no row if the user has no such medication.
+CREATE OR REPLACE FUNCTION public.mark_medication_dose(
+    p_user_id uuid, p_medication_id bigint, p_slot time, p_day date, p_taken boolean
+)
+RETURNS SETOF public.medication_adherence AS $$
+    INSERT INTO public.medication_adherence AS a (user_id, medication_id, slot, year, taken, missed)
+    SELECT m.user_id, m.id, p_slot, extract(year FROM p_day)::smallint,
+           set_bit(zero, extract(doy FROM p_day)::integer - 1, p_taken::integer),
+           set_bit(zero, extract(doy FROM p_day)::integer - 1, (NOT p_taken)::integer)
+    FROM public.medications m, (SELECT decode(repeat('00', 46), 'hex') AS zero) z
+    WHERE m.id = p_medication_id AND m.user_id = p_user_id
+    ON CONFLICT (medication_id, slot, year) DO UPDATE
+        SET taken = set_bit(a.taken, extract(doy FROM p_day)::integer - 1, p_taken::integer),
+            missed = set_bit(a.missed, extract(doy FROM p_day)::integer - 1, (NOT p_taken)::integer),
+            updated_at = now()
+    RETURNING *;
+$$ LANGUAGE sql SECURITY INVOKER SET search_path = public;
+
+-- 9. Medication history
+-- Updating a medication overwrites it in place, so what a patient took when
+-- is kept here: each period is one version of an active medication, valid
+-- from `valid_from` (included) to `valid_to` (excluded, NULL while current).
+-- A trigger closes the open period of a medication whenever its name, dose,
+-- intake times or active flag change, or it is deleted, and opens a new one
+-- while it is active. Periods outlive deleted medications, so medication_id
+-- has no foreign key.
+CREATE TABLE public.medication_periods (
+    id              bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    user_id         uuid NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+    medication_id   bigint NOT NULL,
+    medicine_name   text NOT NULL,
+    dosage_mg       integer,
+    intake_time     text[] NOT NULL,
+    valid_from      timestamptz NOT NULL,
+    valid_to        timestamptz,
+    CHECK (valid_to IS NULL OR valid_to >= valid_from)
+);
+
+COMMENT ON TABLE public.medication_periods IS 'Versions of each medication with the time range they were active, maintained by a trigger.';
+
+CREATE INDEX medication_periods_user_from_idx ON public.medication_periods (user_id, valid_from);
+-- At most one open period per medication.
+CREATE UNIQUE INDEX medication_periods_open_key ON public.medication_periods (medication_id) WHERE valid_to IS NULL;
+
+ALTER TABLE public.medication_periods ENABLE ROW LEVEL SECURITY;
+
+-- Users read their own history; only the trigger below writes it.
+CREATE POLICY "Users can view their own medication history."
+    ON public.medication_periods FOR SELECT
+    USING (auth.uid() = user_id);
+
+CREATE OR REPLACE FUNCTION public.track_medication_period()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND NEW.medicine_name IS NOT DISTINCT FROM OLD.medicine_name
+       AND NEW.dosage_mg IS NOT DISTINCT FROM OLD.dosage_mg
+       AND NEW.intake_time IS NOT DISTINCT FROM OLD.intake_time
+       AND NEW.is_active IS NOT DISTINCT FROM OLD.is_active THEN
+        RETURN NEW;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE public.medication_periods SET valid_to = now()
+        WHERE medication_id = OLD.id AND valid_to IS NULL;
+    END IF;
+    IF TG_OP = 'DELETE' THEN
+        RETURN OLD;
+    END IF;
+
+    IF NEW.is_active THEN
+        INSERT INTO public.medication_periods (user_id, medication_id, medicine_name, dosage_mg, intake_time, valid_from)
+        VALUES (NEW.user_id, NEW.id, NEW.medicine_name, NEW.dosage_mg, NEW.intake_time, now());
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+CREATE TRIGGER on_medication_change_period
+    AFTER INSERT OR UPDATE OR DELETE ON public.medications
+    FOR EACH ROW EXECUTE PROCEDURE public.track_medication_period();
+
+-- Medications that predate the trigger get their first period once with:
+-- INSERT INTO public.medication_periods (user_id, medication_id, medicine_name, dosage_mg, intake_time, valid_from)
+-- SELECT user_id, id, medicine_name, dosage_mg, intake_time, created_at FROM public.medications WHERE is_active;
+
+-- 10. Medication change feed of the reminder worker
+-- The reminder worker keeps its due-dose index of all users current by reading
+-- the medications updated, and the tombstones of those deleted, since its
+-- previous read (see modules/medications/scheduler.py).
+CREATE INDEX medications_updated_at_idx ON public.medications (updated_at);
+CREATE INDEX sync_tombstones_resource_deleted_at_idx ON public.sync_tombstones (resource, deleted_at);